@@ -0,0 +1,348 @@
+# benchmarks/perf_suite.py
+# Micro- and macro-benchmarks for the DGM evaluation hot paths.
+#
+#   python -m benchmarks.perf_suite                         # run everything, print a report
+#   python -m benchmarks.perf_suite --quick --only verifier # smaller corpora, one benchmark
+#   python -m benchmarks.perf_suite --save-baseline benchmarks/baselines/local.json
+#   python -m benchmarks.perf_suite --compare benchmarks/baselines/local.json --tolerance 0.25
+#
+# Every benchmark runs against throwaway caches in a temporary directory, so results are
+# not skewed by (and do not pollute) the project's dgm_cache/.
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import platform
+import tracemalloc
+from statistics import median
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+
+CORPUS_SIZES = [1, 10, 100, 1000]
+QUICK_CORPUS_SIZES = [1, 10, 100]
+
+
+# --- Synthetic corpora ---
+
+_FUNCTION_TEMPLATES = [
+    "def {name}(items):\n    total = 0\n    for i in range(len(items)):\n        total += items[i]\n    return total\n",
+    "def {name}(items):\n    pairs = []\n    for i in range(len(items) - 1):\n        pairs.append(items[i] + items[i + 1])\n    return pairs\n",
+    "def {name}(text):\n    cleaned = [c.lower() for c in text if c.isalnum()]\n    return cleaned == cleaned[::-1]\n",
+    "def {name}(n):\n    if n <= 1:\n        return 1\n    return n * {name}(n - 1)\n",
+    "def {name}(grid):\n    best = 0\n    for row in grid:\n        for value in row:\n            if value > best:\n                best = value\n    return best\n",
+    "class {cls}:\n    def __init__(self, size):\n        self.size = size\n\n    def {name}(self, items):\n        return [x for x in items if x < self.size]\n",
+]
+
+
+def generate_solution(n_functions: int, seed: int = 0) -> str:
+    """Generates a syntactically valid module with `n_functions` varied definitions."""
+    rng = random.Random(seed)
+    parts = []
+    for i in range(n_functions):
+        template = rng.choice(_FUNCTION_TEMPLATES)
+        parts.append(template.format(name=f"func_{i}", cls=f"Helper{i}"))
+    return "\n\n".join(parts)
+
+
+def unique_variant(code: str, i: int) -> str:
+    """Appends a distinct statement so content-addressed caches always miss."""
+    # Warmup passes negative indices, which are not valid in an identifier.
+    return f"{code}\n_variant_{abs(i)}{'_w' if i < 0 else ''} = {i}\n"
+
+
+SIMPLE_SOLUTION = "def solve(x):\n    return x * 2\n"
+SIMPLE_TEST = "assert solve(2) == 4\nassert solve(0) == 0\n"
+
+
+# --- Measurement ---
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def measure(fn, iterations: int, warmup: int = 1) -> dict:
+    """Runs fn(i) `iterations` times and reports latency percentiles, throughput and peak memory."""
+    for i in range(warmup):
+        fn(-1 - i)
+    latencies = []
+    tracemalloc.start()
+    wall_start = time.perf_counter()
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - start)
+    wall = time.perf_counter() - wall_start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "throughput_per_s": iterations / wall if wall else float('inf'),
+        "p50_ms": median(latencies) * 1000,
+        "p90_ms": _percentile(latencies, 0.90) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "peak_memory_kb": peak / 1024,
+    }
+
+
+def _iterations_for(size: int, quick: bool) -> int:
+    base = 20 if quick else 50
+    return max(3, base // max(1, size // 10))
+
+
+# --- Benchmarks ---
+
+def bench_verifier(sizes, quick):
+    from dgm_core.verifier import Verifier
+    verifier = Verifier()
+    results = {}
+    for size in sizes:
+        code = generate_solution(size, seed=size)
+        results[f"verifier.analyze[{size}]"] = measure(lambda i: verifier.analyze(code), _iterations_for(size, quick))
+    return results
+
+
+def bench_fitness(sizes, quick):
+    from dgm_core.fitness import Fitness
+    fitness = Fitness()
+    test_cases = [{"input": [1], "expected_output": 1}]
+    results = {}
+    for size in sizes:
+        code = generate_solution(size, seed=size)
+        results[f"fitness.calculate.cold[{size}]"] = measure(
+            lambda i: fitness.calculate(unique_variant(code, i), [1], 0.01, test_cases), _iterations_for(size, quick))
+        results[f"fitness.calculate.warm[{size}]"] = measure(
+            lambda i: fitness.calculate(code, [1], 0.01, test_cases), _iterations_for(size, quick))
+    return results
+
+
+def bench_evaluate_fitness(sizes, quick):
+    from utils.tools import evaluate_fitness
+    iterations = 10 if quick else 30
+    return {
+        "tools.evaluate_fitness.cold": measure(
+            lambda i: evaluate_fitness(unique_variant(SIMPLE_SOLUTION, i), SIMPLE_TEST), iterations),
+        "tools.evaluate_fitness.warm": measure(
+            lambda i: evaluate_fitness(SIMPLE_SOLUTION, SIMPLE_TEST), iterations),
+    }
+
+
+def bench_signature(sizes, quick):
+    from utils.tools import get_behavioral_signature
+    iterations = 10 if quick else 30
+    return {
+        "tools.get_behavioral_signature": measure(
+            lambda i: get_behavioral_signature(SIMPLE_SOLUTION, SIMPLE_TEST), iterations),
+    }
+
+
+def bench_knowledge(sizes, quick):
+    try:
+        from dgm_core.knowledge_manager import KnowledgeManager
+        manager = KnowledgeManager(settings.DOCUMENT_SOURCES)
+        manager.initialize()
+    except Exception as e:
+        print(f"  skipping knowledge benchmarks: {e}")
+        return {}
+    queries = ["How should the mutator choose a model?", "Strategy pattern for solvers",
+               "Ollama deployment with Docker", "persistent memory for RAG"]
+    return {
+        "knowledge.query": measure(lambda i: manager.query(queries[i % len(queries)]), 10 if quick else 40),
+    }
+
+
+def _start_standin():
+    """Starts the Ollama stand-in with instant responses and points settings at it."""
+    from utils.ollama_standin import OllamaStandIn, ResponseBook, StandInConfig
+    with open(os.path.join(settings.PROJECT_ROOT, "config", "ollama_standin_fixtures.json"), 'r') as f:
+        fixtures = json.load(f)
+    fixtures["timing"] = {"tokens_per_second": 0}
+    server = OllamaStandIn(ResponseBook(fixtures), StandInConfig.from_fixtures(fixtures, seed=0)).start_in_thread()
+    settings.OLLAMA_HOST_URL = server.url
+    return server
+
+
+def bench_orchestrator_cycle(sizes, quick):
+    server = _start_standin()
+
+    import contextlib
+    import io
+    from dgm_orchestrator import Orchestrator
+    workdir = tempfile.mkdtemp(prefix="dgm_bench_cycle_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            orchestrator = Orchestrator()
+
+        def cycle(i):
+            with contextlib.redirect_stdout(io.StringIO()):
+                orchestrator.run_evolutionary_cycle()
+
+        return {"orchestrator.cycle": measure(cycle, 3 if quick else 10)}
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+
+
+def bench_async(sizes, quick):
+    """
+    Drives the async solve and mutation paths against the stand-in, one event loop per
+    iteration, and checks that every loop's pooled AsyncClient is closed with it.
+    """
+    server = _start_standin()
+
+    import asyncio
+    import contextlib
+    import io
+    from dgm_core.dgm_genome import Genome
+    from dgm_core.evolutionary_solver import EvolutionarySolver
+    from dgm_core.self_mutator import SelfMutator
+    from dgm_core.ollama_client import get_ollama_client
+    with open(settings.BENCHMARK_FILE, 'r') as f:
+        tasks = [task["description"] for task in json.load(f)]
+    genome = Genome()
+    client = get_ollama_client(settings.OLLAMA_HOST_URL)
+    async_clients = []
+
+    async def solve_all(solver, mutator):
+        async_clients.append((await client._loop_state())[0])
+        solutions = await asyncio.gather(*(solver.asolve(task) for task in tasks))
+        proposal = await mutator.apropose_mutation()
+        return solutions, proposal
+
+    def run(i):
+        with contextlib.redirect_stdout(io.StringIO()):
+            solver = EvolutionarySolver(genome, settings.OLLAMA_HOST_URL)
+            mutator = SelfMutator(genome, settings.OLLAMA_HOST_URL)
+            solutions, (mutant, _) = asyncio.run(solve_all(solver, mutator))
+        if not all(solutions) or mutant is None:
+            raise RuntimeError("async path returned an empty solution or mutation")
+
+    try:
+        results = {"async.solve_and_mutate": measure(run, 3 if quick else 10)}
+    finally:
+        server.shutdown()
+    if not all(async_client.is_closed for async_client in async_clients):
+        raise RuntimeError("an event loop finished without closing its AsyncClient")
+    return results
+
+
+def bench_startup(sizes, quick):
+    from utils.startup_profiler import ENTRY_POINTS, measure_startup
+    runs = 3 if quick else 7
+    results = {}
+    for entry, module in ENTRY_POINTS.items():
+        startup_ms = measure_startup(module, runs)
+        # Each sample is a fresh interpreter, so report the median for every percentile.
+        results[f"startup.{entry}"] = {
+            "iterations": runs, "throughput_per_s": 1000 / startup_ms if startup_ms else float('inf'),
+            "p50_ms": startup_ms, "p90_ms": startup_ms, "p99_ms": startup_ms, "max_ms": startup_ms,
+            "peak_memory_kb": 0.0,
+        }
+    return results
+
+
+BENCHMARKS = {
+    "verifier": bench_verifier,
+    "fitness": bench_fitness,
+    "evaluate_fitness": bench_evaluate_fitness,
+    "signature": bench_signature,
+    "knowledge": bench_knowledge,
+    "cycle": bench_orchestrator_cycle,
+    "async": bench_async,
+    "startup": bench_startup,
+}
+
+
+# --- Baselines ---
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Returns a description of every benchmark whose p50 latency regressed beyond `tolerance`."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or not previous.get("p50_ms"):
+            continue
+        ratio = current["p50_ms"] / previous["p50_ms"]
+        if ratio > 1 + tolerance:
+            regressions.append(f"{name}: p50 {previous['p50_ms']:.3f} ms -> {current['p50_ms']:.3f} ms ({ratio:.2f}x)")
+    return regressions
+
+
+def _isolate_caches():
+    """Points every on-disk cache at a scratch directory for this run."""
+    scratch = tempfile.mkdtemp(prefix="dgm_bench_")
+    settings.CACHE_DIR = scratch
+    settings.SIGNATURE_INDEX_PATH = os.path.join(scratch, "signature_index.sqlite")
+    settings.FITNESS_CACHE_PATH = os.path.join(scratch, "fitness_cache.sqlite")
+    settings.TASK_RESULT_CACHE_PATH = os.path.join(scratch, "task_results.sqlite")
+    settings.LLM_CACHE_PATH = os.path.join(scratch, "llm_cache.sqlite")
+    settings.MODEL_COST_STORE_PATH = os.path.join(scratch, "model_costs.sqlite")
+    settings.COMPLEXITY_ESTIMATOR_PATH = os.path.join(scratch, "complexity_estimator.json")
+    settings.LINEAGE_ARCHIVE_PATH = os.path.join(scratch, "dgm_lineage.sqlite")
+    settings.VENV_CACHE_DIR = os.path.join(scratch, "venvs")
+    settings.TRACE_DIR = os.path.join(scratch, "traces")
+    settings.TRACE_JSONL_PATH = os.path.join(settings.TRACE_DIR, "spans.jsonl")
+    settings.TRACE_PROMETHEUS_PATH = os.path.join(settings.TRACE_DIR, "dgm.prom")
+    settings.WORK_QUEUE_URL = ""
+    return scratch
+
+
+def print_report(results: dict):
+    print(f"\n{'benchmark':<42}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'ops/s':>12}{'peak KB':>12}")
+    for name, r in results.items():
+        print(f"{name:<42}{r['p50_ms']:>10.3f}{r['p90_ms']:>10.3f}{r['p99_ms']:>10.3f}"
+              f"{r['throughput_per_s']:>12.1f}{r['peak_memory_kb']:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DGM performance benchmark suite.")
+    parser.add_argument('--only', action='append', choices=sorted(BENCHMARKS), help='Run only these benchmarks.')
+    parser.add_argument('--quick', action='store_true', help='Use smaller corpora and fewer iterations.')
+    parser.add_argument('--save-baseline', type=str, help='Write results to this JSON baseline file.')
+    parser.add_argument('--compare', type=str, help='Compare against this JSON baseline and fail on regressions.')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p50 slowdown before flagging (0.2 = 20%%).')
+    args = parser.parse_args()
+
+    _isolate_caches()
+    sizes = QUICK_CORPUS_SIZES if args.quick else CORPUS_SIZES
+    results = {}
+    for name in args.only or BENCHMARKS:
+        print(f"Running {name} benchmarks...")
+        results.update(BENCHMARKS[name](sizes, args.quick))
+    print_report(results)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, 'w') as f:
+            json.dump({
+                "dgm_version": open(settings.DGM_VERSION_FILE).read().strip(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "created_at": time.time(),
+                "results": results,
+            }, f, indent=4)
+        print(f"\nSaved baseline to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nREGRESSIONS against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.compare} (tolerance {args.tolerance:.0%}).")
+
+if __name__ == "__main__":
+    main()
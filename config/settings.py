@@ -6,6 +6,14 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 # --- Service Configuration ---
 OLLAMA_HOST_URL = os.getenv("DGM_OLLAMA_HOST_URL", "http://ollama:11434")
+OLLAMA_MAX_IN_FLIGHT = int(os.getenv("DGM_OLLAMA_MAX_IN_FLIGHT", 8))
+OLLAMA_MAX_IN_FLIGHT_PER_MODEL = int(os.getenv("DGM_OLLAMA_MAX_IN_FLIGHT_PER_MODEL", 2))
+# Model residency: how long Ollama keeps a model loaded, and how much memory loaded models may use.
+OLLAMA_KEEP_ALIVE = os.getenv("DGM_OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_MODEL_MEMORY_BUDGET_MB = float(os.getenv("DGM_OLLAMA_MODEL_MEMORY_BUDGET_MB", 16384))
+OLLAMA_DEFAULT_MODEL_SIZE_MB = 5120
+OLLAMA_MODEL_SWITCH_WAIT = 30
+OLLAMA_LOAD_DETECT_SECONDS = 0.2
 
 # --- Mutation Target ---
 MUTATION_TARGET_FILE = os.path.join(PROJECT_ROOT, "dgm_core", "evolutionary_solver.py")
@@ -29,6 +37,9 @@ POPULATION_SIZE = 5
 ELITISM_COUNT = 1
 TOURNAMENT_SIZE = 3
 MUTATION_RATE = 0.1
+# Stream solver responses and stop generation once a complete code block has arrived.
+SOLVER_STREAMING = True
+GENERATION_WORKERS = int(os.getenv("DGM_GENERATION_WORKERS", POPULATION_SIZE))
 
 # --- Fitness Evaluation Settings ---
 FITNESS_WEIGHTS = {
@@ -57,11 +68,97 @@ DOCUMENT_SOURCES = [
     "Rumsfeld's Logic in Tech Projects_.txt",
     "Strategic Plan_ DGM v9.txt"
 ]
+KNOWLEDGE_CHUNK_SIZE = 1200  # Characters per indexed chunk
+KNOWLEDGE_CHUNK_OVERLAP = 200  # Characters repeated between consecutive chunks
+KNOWLEDGE_EMBEDDING_BATCH_SIZE = 64
+KNOWLEDGE_QUERY_CACHE_SIZE = 256  # Query embeddings and results kept in memory (LRU)
+# Vector store behind the knowledge base: "chroma", or "numpy" for the memory-mapped index.
+KNOWLEDGE_VECTOR_BACKEND = os.getenv("DGM_KNOWLEDGE_BACKEND", "chroma")
+NUMPY_INDEX_PATH = os.path.join(PROJECT_ROOT, "vector_index")
+NUMPY_INDEX_DTYPE = "float32"  # "float32", "float16" or "int8" (quantized)
 
 # --- Orchestrator Settings ---
+# Every evaluated genome, the current population and the adopted genome.
+LINEAGE_ARCHIVE_PATH = os.path.join(PROJECT_ROOT, "dgm_lineage.sqlite")
 BENCHMARK_FILE = os.path.join(PROJECT_ROOT, "config", "benchmark_suite.json")
 MAX_META_CYCLES = 10
+EVALUATOR_WORKERS = int(os.getenv("DGM_EVALUATOR_WORKERS", 4))
+EVALUATOR_TASK_TIMEOUT = 600
 STAGNATION_THRESHOLD = 3
+# Import-time budget per entry point, checked by `python -m utils.startup_profiler --check`.
+STARTUP_IMPORT_BUDGET_MS = float(os.getenv("DGM_STARTUP_IMPORT_BUDGET_MS", 150))
 
 # --- Mutant Execution Settings ---
 MUTANT_EXECUTION_TIMEOUT = 600
+# Virtualenvs for environment mutations, keyed on their resolved requirements.
+VENV_CACHE_DIR = os.getenv("DGM_VENV_CACHE_DIR", os.path.join(PROJECT_ROOT, "dgm_cache", "venvs"))
+VENV_CACHE_MAX_BYTES = int(os.getenv("DGM_VENV_CACHE_MAX_BYTES", 8 * 1024 * 1024 * 1024))
+# Local wheels that mutant environments are installed from; pip never touches the network.
+WHEELHOUSE_DIR = os.getenv("DGM_WHEELHOUSE_DIR", os.path.join(PROJECT_ROOT, "wheelhouse"))
+
+# --- Sandbox Execution Settings ---
+SANDBOX_POOL_SIZE = int(os.getenv("DGM_SANDBOX_POOL_SIZE", os.cpu_count() or 2))
+SANDBOX_MAX_JOBS_PER_WORKER = 200
+SANDBOX_MEMORY_LIMIT_MB = 512
+
+# --- Resource Monitoring & Admission Control ---
+RESOURCE_SAMPLE_INTERVAL = 1.0
+RESOURCE_GPU_SAMPLE_INTERVAL = 5.0
+RESOURCE_HISTORY_SIZE = 600
+# New evaluations and LLM requests wait while any of these limits is exceeded.
+ADMISSION_CONTROL = os.getenv("DGM_ADMISSION_CONTROL", "1") != "0"
+ADMISSION_BUDGETS = {
+    "cpu_percent": float(os.getenv("DGM_ADMISSION_MAX_CPU_PERCENT", 90)),
+    "load_per_cpu": float(os.getenv("DGM_ADMISSION_MAX_LOAD_PER_CPU", 2.0)),
+    "ram_percent": float(os.getenv("DGM_ADMISSION_MAX_RAM_PERCENT", 85)),
+    "swap_in_mb_per_s": float(os.getenv("DGM_ADMISSION_MAX_SWAP_IN_MB_PER_S", 1.0)),
+    "vram_percent": float(os.getenv("DGM_ADMISSION_MAX_VRAM_PERCENT", 95)),
+}
+ADMISSION_WINDOW_SAMPLES = 3
+ADMISSION_BURST = 2
+ADMISSION_MAX_WAIT_SECONDS = 120
+
+# --- Tracing ---
+# Spans for each cycle, proposal, LLM call, evaluation and selection, exported as JSONL and
+# as a Prometheus text file (for node_exporter's textfile collector).
+TRACING_ENABLED = os.getenv("DGM_TRACING", "1") != "0"
+TRACE_DIR = os.getenv("DGM_TRACE_DIR", os.path.join(PROJECT_ROOT, "dgm_traces"))
+TRACE_JSONL_PATH = os.path.join(TRACE_DIR, "spans.jsonl")
+TRACE_JSONL_MAX_BYTES = 64 * 1024 * 1024
+TRACE_PROMETHEUS_PATH = os.getenv("DGM_TRACE_PROMETHEUS_PATH", os.path.join(TRACE_DIR, "dgm.prom"))
+TRACE_EXPORT_INTERVAL_SECONDS = 15
+TRACE_HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+TRACE_HISTOGRAM_WINDOW = 1000
+
+# --- Evaluation Cache Settings ---
+CACHE_DIR = os.path.join(PROJECT_ROOT, "dgm_cache")
+SIGNATURE_INDEX_PATH = os.path.join(CACHE_DIR, "signature_index.sqlite")
+FITNESS_CACHE_PATH = os.path.join(CACHE_DIR, "fitness_cache.sqlite")
+FITNESS_CACHE_MAX_ENTRIES = 50000
+# Per-task results of genome evaluations, keyed on the routed model and the prompt.
+TASK_RESULT_CACHE_PATH = os.path.join(CACHE_DIR, "task_results.sqlite")
+LLM_CACHE_PATH = os.path.join(CACHE_DIR, "llm_cache.sqlite")
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600
+LLM_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# --- Model Cost Settings ---
+# Measured latency, load time and tokens of recent Ollama calls, behind the model_cost fitness score.
+MODEL_COST_STORE_PATH = os.path.join(CACHE_DIR, "model_costs.sqlite")
+MODEL_COST_WINDOW = 200 # Calls kept per model.
+MODEL_COST_MIN_SAMPLES = 3 # Token-generating calls needed before a model is scored on its own measurements.
+MODEL_COST_DEFAULT_SCORE = 0.5 # Score of a model that has not been measured yet.
+MODEL_COST_REFRESH_SECONDS = 60
+
+# --- Complexity Estimator Settings ---
+COMPLEXITY_ESTIMATOR_PATH = os.path.join(CACHE_DIR, "complexity_estimator.json")
+COMPLEXITY_ESTIMATOR_MIN_SAMPLES = 20
+COMPLEXITY_ESTIMATOR_MARGIN = 0.05
+COMPLEXITY_ESTIMATOR_SAVE_INTERVAL = 30 # Seconds between state writes; also written at exit.
+
+# --- Distributed Evaluation Settings ---
+# When set (sqlite:///path or tcp://host:port), mutants are evaluated by dgm_worker.py processes.
+WORK_QUEUE_URL = os.getenv("DGM_WORK_QUEUE_URL", "")
+WORK_QUEUE_DB_PATH = os.path.join(CACHE_DIR, "work_queue.sqlite")
+WORK_QUEUE_PORT = 5555
+WORK_QUEUE_LEASE_SECONDS = 120
+WORK_QUEUE_MAX_ATTEMPTS = 3
@@ -0,0 +1,93 @@
+# dgm_core/code_artifact.py
+# A candidate solution parsed at most once, with memoized facts for every scorer.
+
+import ast
+from functools import cached_property, lru_cache
+
+
+class CodeArtifact:
+    """
+    Wraps a piece of source code and lazily derives the facts the scorers need from a
+    single parse: the AST, line count, function names, radon cyclomatic complexity and the
+    normalized hash used by the fitness cache. A syntax error is remembered and re-raised
+    on every access to `tree`, so failing code is not re-parsed either.
+
+    An artifact is meant to be created per evaluation and passed down to the scorers,
+    which also accept plain strings and wrap them via CodeArtifact.of().
+    """
+    def __init__(self, source: str):
+        self.source = source
+        self._tree = None
+        self._parse_error = None
+
+    @classmethod
+    def of(cls, code: "str | CodeArtifact") -> "CodeArtifact":
+        return code if isinstance(code, cls) else cls(code)
+
+    @property
+    def tree(self) -> ast.Module:
+        """The parsed module. Raises the original SyntaxError if the source does not parse."""
+        if self._tree is None and self._parse_error is None:
+            try:
+                self._tree = ast.parse(self.source)
+            except (SyntaxError, ValueError) as e:
+                self._parse_error = e
+        if self._parse_error is not None:
+            raise self._parse_error
+        return self._tree
+
+    @property
+    def parses(self) -> bool:
+        try:
+            self.tree
+            return True
+        except (SyntaxError, ValueError):
+            return False
+
+    @cached_property
+    def line_count(self) -> int:
+        return self.source.count('\n') + 1
+
+    @cached_property
+    def function_names(self) -> list[str]:
+        """Names of every function and method defined in the code, in source order."""
+        return [node.name for node in ast.walk(self.tree)
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))]
+
+    @cached_property
+    def called_names(self) -> list[str]:
+        """Names of plain-name calls such as f(x), in traversal order."""
+        return [node.func.id for node in ast.walk(self.tree)
+                if isinstance(node, ast.Call) and isinstance(node.func, ast.Name)]
+
+    @cached_property
+    def complexity_blocks(self) -> list:
+        """Radon's cyclomatic complexity blocks, computed from the shared tree."""
+        from radon.complexity import cc_visit_ast
+        return cc_visit_ast(self.tree)
+
+    @cached_property
+    def average_complexity(self) -> float:
+        blocks = self.complexity_blocks
+        return sum(block.complexity for block in blocks) / len(blocks) if blocks else 1
+
+    @cached_property
+    def normalized_hash(self) -> str:
+        """Same value as fitness_cache.normalized_ast_hash(source), without re-parsing."""
+        from .fitness_cache import normalized_tree_hash, unparsed_hash
+        if not self.parses:
+            return unparsed_hash(self.source)
+        return normalized_tree_hash(self.tree)
+
+
+@lru_cache(maxsize=256)
+def first_called_name(code: str) -> str | None:
+    """
+    Returns the first function called by plain name in `code`. Test code is shared by
+    every candidate for a task, so the result is memoized on the text.
+    """
+    try:
+        names = CodeArtifact(code).called_names
+    except (SyntaxError, ValueError):
+        return None
+    return names[0] if names else None
@@ -0,0 +1,77 @@
+# dgm_core/code_extraction.py
+# Helpers for pulling Python source out of (possibly partial) LLM responses.
+
+import ast
+import re
+
+CODE_BLOCK_RE = re.compile(r"```[ \t]*(?:python|py)?[^\n]*\n(.*?)```", re.DOTALL)
+
+
+def extract_code(response_text: str) -> str:
+    """
+    Extracts Python source from an LLM response. Prefers the first fenced block that
+    parses; falls back to the first fenced block, then to the raw text.
+    """
+    blocks = CODE_BLOCK_RE.findall(response_text)
+    for block in blocks:
+        try:
+            ast.parse(block)
+            return block
+        except SyntaxError:
+            continue
+    return blocks[0] if blocks else response_text
+
+
+class CodeBlockWatcher:
+    """
+    Finds the first closed, parseable fenced code block in a response as it streams in.
+    Call it with the accumulated text after each token: it resumes scanning where the
+    previous call stopped and only parses a block when its closing fence arrives, so a
+    whole stream costs time linear in its length. Blocks are delimited as CODE_BLOCK_RE
+    delimits them. Use one watcher per stream.
+    """
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._pos = 0               # where the next search starts
+        self._in_fence_line = False  # an opening fence whose line has not ended yet
+        self._body_start = None     # start of the open block's body
+
+    def __call__(self, partial_text: str) -> str | None:
+        if len(partial_text) < self._pos:
+            self._reset()  # A different (restarted) stream.
+        while True:
+            if self._in_fence_line:
+                newline = partial_text.find("\n", self._pos)
+                if newline < 0:
+                    self._pos = len(partial_text)
+                    return None
+                self._in_fence_line = False
+                self._body_start = self._pos = newline + 1
+            fence = partial_text.find("```", self._pos)
+            if fence < 0:
+                # A fence may be split across tokens, so keep its first two backticks in view.
+                self._pos = max(self._pos, len(partial_text) - 2)
+                return None
+            self._pos = fence + 3
+            if self._body_start is None:
+                self._in_fence_line = True
+                continue
+            block, self._body_start = partial_text[self._body_start:fence], None
+            if not block.strip():
+                continue
+            try:
+                ast.parse(block)
+                return block
+            except SyntaxError:
+                continue
+
+
+def first_complete_code_block(partial_text: str) -> str | None:
+    """
+    Returns the first closed, parseable fenced code block in a partially streamed
+    response, or None if no such block has arrived yet. When polling a growing stream,
+    use a CodeBlockWatcher instead.
+    """
+    return CodeBlockWatcher()(partial_text)
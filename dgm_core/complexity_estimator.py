@@ -0,0 +1,208 @@
+# dgm_core/complexity_estimator.py
+# A local, CPU-only task complexity estimator that learns from past LLM ratings.
+
+import os
+import re
+import json
+import time
+import atexit
+import hashlib
+import threading
+from config import settings
+
+# Vocabulary hints that usually indicate algorithmic difficulty, and ones that indicate trivial tasks.
+# Terms match whole words (or their plural in -s); a trailing '*' marks a stem that matches
+# any word it begins, e.g. "optimi*" matches "optimize" and "optimisation".
+HARD_TERMS = (
+    "dynamic programming", "recursion", "recursive", "graph", "tree", "optimi*", "parse", "parser",
+    "parsing", "concurren*", "thread", "async", "regex", "subsequence", "permutation", "backtrack*",
+    "matrix", "matrices", "shortest path", "complexity", "efficient", "cache", "schedul*",
+    "interpreter", "compiler",
+)
+EASY_TERMS = (
+    "sum", "reverse", "palindrome", "maximum", "minimum", "largest", "smallest", "count",
+    "even", "odd", "list of numbers", "string", "print",
+)
+CONSTRAINT_TERMS = ("without", "must", "should", "ignore", "only", "case-insensitive", "in-place", "o(")
+
+_WORD_RE = re.compile(r"\w+")
+_SENTENCE_RE = re.compile(r"[.!?]+")
+
+
+def _compile_terms(terms: tuple[str, ...]) -> tuple[tuple[tuple[str, ...], bool], ...]:
+    """Splits each term into its words, as _WORD_RE tokenizes text, and notes whether it is a stem."""
+    return tuple((tuple(_WORD_RE.findall(term)), term.endswith("*")) for term in terms)
+
+
+_HARD_PATTERNS = _compile_terms(HARD_TERMS)
+_EASY_PATTERNS = _compile_terms(EASY_TERMS)
+_CONSTRAINT_PATTERNS = _compile_terms(CONSTRAINT_TERMS)
+
+
+def _count_terms(words: list[str], patterns) -> int:
+    """Counts the occurrences of every term in a list of lower-case word tokens."""
+    count = 0
+    for parts, stem in patterns:
+        last = len(parts) - 1
+        for start in range(len(words) - last):
+            for offset, part in enumerate(parts):
+                word = words[start + offset]
+                if stem and offset == last:
+                    matched = word.startswith(part)
+                else:
+                    matched = word == part or word == part + "s"
+                if not matched:
+                    break
+            else:
+                count += 1
+    return count
+
+
+class ComplexityEstimator:
+    """
+    Estimates task complexity from lexical and structural features with an online linear
+    model. The model is trained on the complexity ratings the LLM returns whenever the
+    estimator was not confident enough to answer on its own, and on routing outcomes.
+
+    Confidence is judged relative to the genome's complexity_threshold: an estimate far
+    from the threshold (compared to the model's running error) routes unambiguously even
+    if it is imprecise.
+
+    Only LLM ratings are remembered per task. Routing outcomes depend on the threshold of
+    the genome that produced them, so they train the model but are never replayed to
+    other genomes as a known rating. State is written at most every `save_interval`
+    seconds, and on flush() or interpreter exit.
+    """
+    FEATURES = ("bias", "words", "sentences", "hard_terms", "easy_terms", "constraints", "identifiers", "numbers")
+
+    def __init__(self, state_path: str = None, learning_rate: float = 0.05,
+                 min_samples: int = None, margin: float = None, save_interval: float = None):
+        self.state_path = state_path or settings.COMPLEXITY_ESTIMATOR_PATH
+        self.learning_rate = learning_rate
+        self.min_samples = min_samples or settings.COMPLEXITY_ESTIMATOR_MIN_SAMPLES
+        self.margin = margin if margin is not None else settings.COMPLEXITY_ESTIMATOR_MARGIN
+        self.weights = [0.5] + [0.0] * (len(self.FEATURES) - 1)
+        self.samples = 0
+        self.mean_abs_error = 0.5
+        self.known_tasks = {}
+        self.save_interval = settings.COMPLEXITY_ESTIMATOR_SAVE_INTERVAL if save_interval is None else save_interval
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def _task_key(task_description: str) -> str:
+        return hashlib.sha256(task_description.strip().lower().encode('utf-8')).hexdigest()
+
+    def features(self, task_description: str) -> list[float]:
+        """Extracts a small, scaled feature vector from the task description."""
+        text = task_description.lower()
+        words = _WORD_RE.findall(text)
+        return [
+            1.0,
+            min(len(words) / 100.0, 2.0),
+            min(len(_SENTENCE_RE.findall(text)) / 5.0, 2.0),
+            min(_count_terms(words, _HARD_PATTERNS) / 3.0, 2.0),
+            min(_count_terms(words, _EASY_PATTERNS) / 3.0, 2.0),
+            min(_count_terms(words, _CONSTRAINT_PATTERNS) / 3.0, 2.0),
+            min(task_description.count("'") / 4.0 + task_description.count('_') / 4.0, 2.0),
+            min(len(re.findall(r"\d+", text)) / 5.0, 2.0),
+        ]
+
+    def predict(self, task_description: str) -> float:
+        """Returns the model's raw complexity estimate, clamped to [0, 1]."""
+        x = self.features(task_description)
+        return max(0.0, min(1.0, sum(w * xi for w, xi in zip(self.weights, x))))
+
+    def estimate(self, task_description: str, threshold: float) -> tuple[float, bool]:
+        """
+        Returns (complexity, confident). A task rated before is answered from memory;
+        otherwise the estimate is confident once enough samples have been seen and the
+        prediction clears the routing threshold by more than the model's typical error.
+        """
+        with self._lock:
+            known = self.known_tasks.get(self._task_key(task_description))
+            if known is not None:
+                return known, True
+            complexity = self.predict(task_description)
+            confident = (self.samples >= self.min_samples and
+                         abs(complexity - threshold) > self.mean_abs_error + self.margin)
+        return complexity, confident
+
+    def _train(self, task_description: str, complexity: float):
+        x = self.features(task_description)
+        error = complexity - self.predict(task_description)
+        self.weights = [w + self.learning_rate * error * xi for w, xi in zip(self.weights, x)]
+        self.mean_abs_error = 0.9 * self.mean_abs_error + 0.1 * abs(error)
+        self.samples += 1
+        self._dirty = True
+
+    def observe(self, task_description: str, complexity: float):
+        """Trains the model on the LLM's rating of a task and remembers the rating."""
+        complexity = max(0.0, min(1.0, complexity))
+        with self._lock:
+            self._train(task_description, complexity)
+            self.known_tasks[self._task_key(task_description)] = complexity
+            self._save_if_due()
+
+    def record_routing_outcome(self, task_description: str, complexity: float, threshold: float, solved: bool):
+        """
+        Feeds back whether the routed model solved the task. An easy-routed failure means
+        the task was harder than rated; a hard-routed success by a small margin is left alone.
+        The outcome only trains the model: the task's remembered rating is unchanged.
+        """
+        if complexity < threshold and not solved:
+            with self._lock:
+                self._train(task_description, min(1.0, threshold + self.margin))
+                self._save_if_due()
+
+    def _load(self):
+        try:
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if len(state.get('weights', [])) == len(self.FEATURES):
+            self.weights = state['weights']
+            self.samples = state.get('samples', 0)
+            self.mean_abs_error = state.get('mean_abs_error', 0.5)
+            self.known_tasks = state.get('known_tasks', {})
+
+    def _save_if_due(self):
+        if time.monotonic() - self._last_save >= self.save_interval:
+            self._save()
+
+    def flush(self):
+        """Writes any unsaved state now."""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def _save(self):
+        self._dirty = False
+        self._last_save = time.monotonic()
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'weights': self.weights,
+                'samples': self.samples,
+                'mean_abs_error': self.mean_abs_error,
+                'known_tasks': self.known_tasks,
+            }, f)
+        os.replace(tmp_path, self.state_path)
+
+
+_shared_estimator = None
+_shared_estimator_lock = threading.Lock()
+
+
+def get_complexity_estimator() -> ComplexityEstimator:
+    """Returns the process-wide complexity estimator, loading its state on first use."""
+    global _shared_estimator
+    with _shared_estimator_lock:
+        if _shared_estimator is None:
+            _shared_estimator = ComplexityEstimator()
+            atexit.register(_shared_estimator.flush)
+        return _shared_estimator
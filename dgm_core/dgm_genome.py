@@ -8,7 +8,8 @@ from dataclasses import dataclass, field, asdict
 class Genome:
     """
     Defines the evolvable traits of a DGM instance.
-    This structure is serialized to dgm_genome.json.
+    Genomes are recorded in the lineage archive (dgm_lineage_archive.py); to_json and
+    from_json read and write standalone genome files.
     """
     # Strategy 1: Resource-Aware Model-Switching Policy
     solver_policy: dict = field(default_factory=lambda: {
@@ -1,9 +1,13 @@
 # dgm_core/evolutionary_solver.py
 # The component responsible for solving tasks based on the current genome by calling a live Ollama service.
 
-import requests
-import json
+import time
 from dgm_core.dgm_genome import Genome
+from dgm_core.ollama_client import OllamaRequestError, get_ollama_client
+from dgm_core.complexity_estimator import get_complexity_estimator
+from dgm_core.code_extraction import CodeBlockWatcher
+from config import settings
+from utils.tracing import get_tracer
 
 class EvolutionarySolver:
     """
@@ -12,43 +16,106 @@ class EvolutionarySolver:
     def __init__(self, genome: Genome, ollama_base_url: str = "http://ollama:11434"):
         self.genome = genome
         self.ollama_base_url = ollama_base_url
+        self.client = get_ollama_client(ollama_base_url)
         self.easy_model_name = self.genome.solver_policy.get('easy_model', 'gemma:2b')
         self.hard_model_name = self.genome.solver_policy.get('hard_model', 'llama3:8b')
         self.complexity_threshold = self.genome.solver_policy.get('complexity_threshold', 0.7)
+        self.complexity_estimator = get_complexity_estimator()
+        self.stream_solutions = settings.SOLVER_STREAMING
         print(f"Solver initialized with LIVE policy: Easy='{self.easy_model_name}', Hard='{self.hard_model_name}', Threshold='{self.complexity_threshold}'")
 
-    def _make_ollama_request(self, model: str, prompt: str, stream: bool = False):
-        """Helper function to make requests to the Ollama API."""
-        api_url = f"{self.ollama_base_url}/api/generate"
-        payload = {"model": model, "prompt": prompt, "stream": stream}
+    @staticmethod
+    def _request_limits(deadline: float | None):
+        """
+        Returns the request timeout (5 minutes, or whatever is left before `deadline`, a
+        time.monotonic() value) and the streaming stop condition, which also ends the
+        stream once the deadline passes.
+        """
+        watcher = CodeBlockWatcher()
+        if deadline is None:
+            return 300, watcher
+        return min(300, deadline - time.monotonic()), lambda text: watcher(text) or time.monotonic() >= deadline
+
+    def _make_ollama_request(self, model: str, prompt: str, stream: bool = False, options: dict = None, use_cache: bool = None,
+                             deadline: float = None):
+        """
+        Helper function to make requests to the Ollama API through the shared pooled client.
+        Deterministic calls (temperature 0) are served from the shared response cache;
+        `use_cache` forces or bypasses the cache for a single call.
+        With `stream`, generation is cut off as soon as a complete, parseable code block
+        has arrived. A `deadline` bounds the request's timeout and stream.
+        """
+        timeout, stop_when = self._request_limits(deadline)
+        if timeout <= 0:
+            print(f"ERROR: Deadline passed before requesting model '{model}'.")
+            return None
         try:
             print(f"Sending request to Ollama for model '{model}'...")
-            response = requests.post(api_url, json=payload, timeout=300) # 5-minute timeout
-            response.raise_for_status()
+            if stream:
+                response_data = self.client.generate_stream(model, prompt, options=options, stop_when=stop_when,
+                                                            timeout=timeout, use_cache=use_cache)
+                self._record_stream_metrics(response_data)
+            else:
+                response_data = self.client.generate(model, prompt, options=options, timeout=timeout, use_cache=use_cache)
             print("Ollama request successful.")
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            return response_data
+        except OllamaRequestError as e:
             print(f"ERROR: Ollama API request failed for model '{model}': {e}")
             return None
 
-    def _analyze_task_complexity(self, task_description: str) -> float:
+    async def _amake_ollama_request(self, model: str, prompt: str, stream: bool = False, options: dict = None, use_cache: bool = None,
+                                    deadline: float = None):
+        """Async variant of _make_ollama_request()."""
+        timeout, stop_when = self._request_limits(deadline)
+        if timeout <= 0:
+            print(f"ERROR: Deadline passed before requesting model '{model}'.")
+            return None
+        try:
+            print(f"Sending async request to Ollama for model '{model}'...")
+            if stream:
+                response_data = await self.client.agenerate_stream(model, prompt, options=options, stop_when=stop_when,
+                                                                   timeout=timeout, use_cache=use_cache)
+                self._record_stream_metrics(response_data)
+            else:
+                response_data = await self.client.agenerate(model, prompt, options=options, timeout=timeout, use_cache=use_cache)
+            print("Ollama request successful.")
+            return response_data
+        except OllamaRequestError as e:
+            print(f"ERROR: Ollama API request failed for model '{model}': {e}")
+            return None
+
+    @staticmethod
+    def _record_stream_metrics(response_data: dict):
         """
-        Uses the 'easy_model' to perform a heuristic analysis of the task's complexity.
+        Reports a streamed solve's timing, which travels with its response, and adds it
+        to the current span (e.g. the task being solved). Nothing is kept on the solver,
+        which evaluation threads share.
         """
-        print(f"Analyzing task complexity using model: {self.easy_model_name}...")
-        prompt = f"""
+        metrics = {key: response_data.get(key) for key in ("time_to_first_token", "total_time", "stopped_early")}
+        span = get_tracer().current()
+        if span is not None:
+            span.set(**metrics)
+        ttft = metrics["time_to_first_token"]
+        if ttft is not None:
+            print(f"Time to first token: {ttft:.2f}s, total: {metrics['total_time']:.2f}s"
+                  f"{' (stopped after code block)' if metrics['stopped_early'] else ''}")
+
+    def _complexity_prompt(self, task_description: str) -> str:
+        return f"""
         Analyze the following software development task and rate its complexity on a scale from 0.0 (trivial) to 1.0 (extremely complex). 
         Provide only a single floating-point number in your response and nothing else.
         TASK: "{task_description}"
         COMPLEXITY:
         """
-        response_data = self._make_ollama_request(self.easy_model_name, prompt)
-        
+
+    def _parse_complexity(self, task_description: str, response_data) -> float:
+        """Extracts the complexity rating from the easy model's response and trains the estimator on it."""
         if response_data and 'response' in response_data:
             try:
                 complexity = float(response_data['response'].strip())
                 complexity = max(0.0, min(1.0, complexity)) # Clamp value
                 print(f"Analyzed task complexity: {complexity:.2f}")
+                self.complexity_estimator.observe(task_description, complexity)
                 return complexity
             except (ValueError, TypeError):
                 print(f"Warning: Could not parse complexity score from model response: '{response_data['response']}'. Defaulting to 0.5.")
@@ -57,24 +124,93 @@ class EvolutionarySolver:
         print("Warning: Complexity analysis failed. Defaulting to 0.5.")
         return 0.5
 
-    def solve(self, task_description: str) -> str:
+    def _local_complexity(self, task_description: str):
+        """Returns the local estimate if it is confident enough to route on, otherwise None."""
+        estimate, confident = self.complexity_estimator.estimate(task_description, self.complexity_threshold)
+        if confident:
+            print(f"Estimated task complexity locally: {estimate:.2f}")
+            return estimate
+        print(f"Analyzing task complexity using model: {self.easy_model_name}...")
+        return None
+
+    def _analyze_task_complexity(self, task_description: str, deadline: float = None) -> tuple[float, str | None]:
         """
-        Solves a task using the policy-selected live LLM.
+        Rates the task's complexity with the local estimator, falling back to the
+        'easy_model' when the estimate is too close to the routing threshold to trust.
+        Returns the rating and the model asked for it (None if rated locally).
         """
-        task_complexity = self._analyze_task_complexity(task_description)
+        local = self._local_complexity(task_description)
+        if local is not None:
+            return local, None
+        # Rated greedily so the answer for a given task is stable and can be cached.
+        response_data = self._make_ollama_request(self.easy_model_name, self._complexity_prompt(task_description), options={"temperature": 0},
+                                                  deadline=deadline)
+        return self._parse_complexity(task_description, response_data), self.easy_model_name
+
+    async def _aanalyze_task_complexity(self, task_description: str, deadline: float = None) -> tuple[float, str | None]:
+        """Async variant of _analyze_task_complexity()."""
+        local = self._local_complexity(task_description)
+        if local is not None:
+            return local, None
+        response_data = await self._amake_ollama_request(self.easy_model_name, self._complexity_prompt(task_description), options={"temperature": 0},
+                                                         deadline=deadline)
+        return self._parse_complexity(task_description, response_data), self.easy_model_name
 
+    def _select_model(self, task_complexity: float) -> str:
+        """Applies the genome's routing policy to a complexity rating."""
         if task_complexity < self.complexity_threshold:
             selected_model_name = self.easy_model_name
             print(f"Complexity ({task_complexity:.2f}) is below threshold ({self.complexity_threshold}). Using easy model: {selected_model_name}")
         else:
             selected_model_name = self.hard_model_name
             print(f"Complexity ({task_complexity:.2f}) is above or equal to threshold ({self.complexity_threshold}). Using hard model: {selected_model_name}")
-
         print(f"Solving task with live model {selected_model_name}...")
-        prompt = f"Provide a complete code solution for the following task:\n\n{task_description}"
-        response_data = self._make_ollama_request(selected_model_name, prompt)
+        return selected_model_name
+
+    @staticmethod
+    def solve_prompt(task_description: str) -> str:
+        return f"Provide a complete code solution for the following task:\n\n{task_description}"
 
+    @staticmethod
+    def _extract_solution(response_data, selected_model_name: str) -> str:
         if response_data and 'response' in response_data:
             return response_data['response']
         
         return f"// Failed to get solution from model {selected_model_name}"
+
+    def route(self, task_description: str, deadline: float = None) -> tuple[float, str, str | None]:
+        """
+        Rates a task and applies the routing policy. Returns (complexity, model name, the
+        model that rated the task or None if it was rated locally).
+        """
+        task_complexity, rating_model = self._analyze_task_complexity(task_description, deadline)
+        return task_complexity, self._select_model(task_complexity), rating_model
+
+    def generate_solution(self, model: str, task_description: str, deadline: float = None) -> str | None:
+        """Asks `model` for a solution to the task. Returns None if the request failed."""
+        response_data = self._make_ollama_request(model, self.solve_prompt(task_description), stream=self.stream_solutions,
+                                                  deadline=deadline)
+        if response_data and 'response' in response_data:
+            return response_data['response']
+        return None
+
+    def solve(self, task_description: str, deadline: float = None) -> str:
+        """
+        Solves a task using the policy-selected live LLM. With a `deadline` (a
+        time.monotonic() value), no request runs past it.
+        """
+        _, selected_model_name, _ = self.route(task_description, deadline)
+        solution = self.generate_solution(selected_model_name, task_description, deadline)
+        if solution is None:
+            return self._extract_solution(None, selected_model_name)
+        return solution
+
+    async def asolve(self, task_description: str, deadline: float = None) -> str:
+        """
+        Async variant of solve(), for solving many tasks concurrently against one backend.
+        """
+        task_complexity, _ = await self._aanalyze_task_complexity(task_description, deadline)
+        selected_model_name = self._select_model(task_complexity)
+        response_data = await self._amake_ollama_request(selected_model_name, self.solve_prompt(task_description), stream=self.stream_solutions,
+                                                         deadline=deadline)
+        return self._extract_solution(response_data, selected_model_name)
@@ -2,15 +2,22 @@
 import time
 import logging
 from .verifier import Verifier
+from .code_artifact import CodeArtifact
+from .fitness_cache import FitnessCache, get_fitness_cache
+from .model_cost import ModelCostStore, get_model_cost_store
 from config import settings
 
 class Fitness:
     """
     Calculates the fitness of a code solution based on multiple objectives.
+    calculate_efficiency() and calculate_simplicity() are the single definition of those
+    scores: utils.tools scores sandboxed solutions with them too.
     """
-    def __init__(self):
+    def __init__(self, cache: FitnessCache = None, cost_store: ModelCostStore = None):
         self.verifier = Verifier()
         self.weights = settings.FITNESS_WEIGHTS
+        self.cache = cache or get_fitness_cache()
+        self._cost_store = cost_store
         logging.basicConfig(level=logging.INFO, format='%(message)s')
         self.logger = logging.getLogger(__name__)
 
@@ -19,21 +26,62 @@ class Fitness:
         passed_count = sum(1 for result, case in zip(execution_results, test_cases) if result == case['expected_output'])
         return passed_count / len(test_cases) if test_cases else 0
 
-    def _calculate_efficiency(self, execution_time):
+    @staticmethod
+    def calculate_efficiency(execution_time: float) -> float:
         """Calculates efficiency score. Lower time is better."""
-        # Normalize time. This is a simple heuristic.
-        # A 1-second execution gets a low score, near-zero gets a high score.
-        return max(0, 1 - (execution_time / 2.0))
+        # Normalize time against the sandbox's 5-second test timeout: near-zero scores 1.0.
+        return max(0.0, 1.0 - (execution_time / 5.0))
+
+    @staticmethod
+    def calculate_simplicity(artifact: CodeArtifact) -> float:
+        """Calculates simplicity score: the inverse of the mean cyclomatic complexity of the code's blocks."""
+        try:
+            return 1.0 / artifact.average_complexity
+        except Exception:
+            return 0.5
+
+    @property
+    def cost_store(self) -> ModelCostStore:
+        if self._cost_store is None:
+            self._cost_store = get_model_cost_store()
+        return self._cost_store
+
+    def calculate_model_cost(self, *models: str) -> float:
+        """
+        Calculates model cost score from the models' seconds per generated token. Cheaper
+        is better. Several models (e.g. the one that rated a task and the one that solved
+        it) are scored on their mean cost, which is the harmonic mean of their scores.
+        """
+        scores = [self.cost_store.score(model) for model in models]
+        if not scores:
+            return settings.MODEL_COST_DEFAULT_SCORE
+        if min(scores) <= 0:
+            return 0.0
+        return len(scores) / sum(1 / score for score in scores)
+
+    def _calculate_static_scores(self, artifact: CodeArtifact, test_cases) -> dict:
+        """
+        Returns the simplicity and verifiability scores, served from the fitness cache when
+        the same normalized solution was scored before. Both depend only on the code's
+        structure, which the normalized key preserves. The code is parsed at most once, for
+        the cache key, radon and the verifier together.
+        """
+        cache_key = self.cache.make_key(artifact, test_cases)
+        cached = self.cache.get(cache_key)
+        if cached is not None and "simplicity" in cached and "verifiability" in cached:
+            return {"simplicity": cached["simplicity"], "verifiability": cached["verifiability"]}
+
+        scores = {
+            "simplicity": self.calculate_simplicity(artifact),
+            "verifiability": self.verifier.analyze(artifact).get("verifiability_score", 0.0),
+        }
+        self.cache.put(cache_key, scores)
+        return scores
 
-    def _calculate_simplicity(self, code):
-        """Calculates simplicity score. Shorter code is simpler."""
-        # Heuristic: Penalize long code. Assume a baseline of 20 lines is complex.
-        lines = len(code.split('\n'))
-        return max(0, 1 - (lines / 100.0))
-        
     def calculate(self, code, execution_results, execution_time, test_cases):
         """
-        Calculates the overall weighted fitness score for a solution.
+        Calculates the overall weighted fitness score for a solution. The solving model is
+        not known here, so model_cost counts as an unmeasured model's (see combine()).
 
         Returns:
             A tuple containing the weighted score and a dictionary of individual scores.
@@ -50,24 +98,29 @@ class Fitness:
             }
             return 0.0, scores
 
-        efficiency_score = self._calculate_efficiency(execution_time)
-        simplicity_score = self._calculate_simplicity(code)
-        
-        verification_results = self.verifier.analyze(code)
-        verifiability_score = verification_results.get("verifiability_score", 0.0)
+        efficiency_score = self.calculate_efficiency(execution_time)
+        artifact = CodeArtifact.of(code)
 
         scores = {
             "correctness": correctness_score,
             "efficiency": efficiency_score,
-            "simplicity": simplicity_score,
-            "verifiability": verifiability_score
+            **self._calculate_static_scores(artifact, test_cases)
         }
 
-        weighted_score = (
+        return self.combine(scores), scores
+
+    def combine(self, scores: dict) -> float:
+        """
+        Weights a dictionary of component scores into one fitness value. As in calculate(),
+        a solution that is not fully correct scores 0. A missing model_cost (the models
+        used are unknown) scores MODEL_COST_DEFAULT_SCORE, like a model not yet measured.
+        """
+        if scores.get("correctness", 0) < 1.0:
+            return 0.0
+        return (
             scores["correctness"] * self.weights["correctness"] +
             scores["efficiency"] * self.weights["efficiency"] +
             scores["simplicity"] * self.weights["simplicity"] +
-            scores["verifiability"] * self.weights["verifiability"]
+            scores["verifiability"] * self.weights["verifiability"] +
+            scores.get("model_cost", settings.MODEL_COST_DEFAULT_SCORE) * self.weights["model_cost"]
         )
-
-        return weighted_score, scores
@@ -0,0 +1,172 @@
+# dgm_core/fitness_cache.py
+# Content-addressed, disk-backed cache of per-component fitness scores.
+
+import os
+import ast
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from config import settings
+
+
+def _has_docstring(node: ast.AST) -> bool:
+    body = getattr(node, 'body', None)
+    return bool(isinstance(node, (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+                and body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant)
+                and isinstance(body[0].value.value, str))
+
+
+# Stands in for a body that held only a docstring. Shared, and never modified.
+_EMPTY_BODY = [ast.Pass()]
+
+
+def normalized_tree_hash(tree: ast.AST) -> str:
+    """
+    Hashes an already-parsed tree with docstrings removed, so that documentation-only
+    edits hash identically. The tree is serialized with an explicit stack and leading
+    docstrings are skipped as it goes, so it is never modified: other scorers may walk
+    the same tree concurrently.
+    """
+    parts = []
+    stack = [(False, tree)]
+    while stack:
+        is_text, item = stack.pop()
+        if is_text:
+            parts.append(item)
+        elif isinstance(item, ast.AST):
+            parts.append(f"{type(item).__name__}(")
+            stack.append((True, ")"))
+            docstring = _has_docstring(item)
+            for name in reversed(item._fields):
+                value = getattr(item, name, None)
+                if name == "body" and docstring:
+                    value = item.body[1:] or _EMPTY_BODY
+                stack.append((True, ","))
+                stack.append((False, value))
+        elif isinstance(item, list):
+            parts.append("[")
+            stack.append((True, "]"))
+            for value in reversed(item):
+                stack.append((True, ","))
+                stack.append((False, value))
+        else:
+            parts.append(repr(item))
+    return hashlib.sha256("".join(parts).encode('utf-8')).hexdigest()
+
+
+def unparsed_hash(code: str) -> str:
+    """Hash used for code that does not parse."""
+    return hashlib.sha256(f"unparsed:{code}".encode('utf-8')).hexdigest()
+
+
+def normalized_ast_hash(code: str) -> str:
+    """
+    Hashes the normalized AST of `code`: comments, formatting and docstrings are ignored.
+    Falls back to hashing the raw text if the code does not parse.
+    """
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return unparsed_hash(code)
+    return normalized_tree_hash(tree)
+
+
+class FitnessCache:
+    """
+    Stores per-component fitness scores keyed on the normalized solution AST plus the test
+    spec. Entries live in SQLite, are evicted least-recently-used beyond `max_entries`, and
+    hit/miss counters persist across runs.
+    """
+    def __init__(self, db_path: str = None, max_entries: int = None):
+        self.db_path = db_path or settings.FITNESS_CACHE_PATH
+        self.max_entries = max_entries or settings.FITNESS_CACHE_MAX_ENTRIES
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS fitness_cache (
+                cache_key TEXT PRIMARY KEY,
+                scores TEXT NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_fitness_cache_access ON fitness_cache (last_access);
+            CREATE TABLE IF NOT EXISTS fitness_cache_counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO fitness_cache_counters VALUES ('hits', 0), ('misses', 0);
+        """)
+
+    @staticmethod
+    def make_key(code, test_spec) -> str:
+        """
+        Builds the content address for a solution under a given test spec. `code` may be
+        source text or a CodeArtifact, whose memoized hash is reused.
+        """
+        code_hash = code.normalized_hash if hasattr(code, 'normalized_hash') else normalized_ast_hash(code)
+        if not isinstance(test_spec, str):
+            test_spec = json.dumps(test_spec, sort_keys=True)
+        spec_hash = hashlib.sha256(test_spec.encode('utf-8')).hexdigest()
+        return f"{code_hash}:{spec_hash}"
+
+    def _bump(self, counter: str):
+        self._conn.execute("UPDATE fitness_cache_counters SET value = value + 1 WHERE name = ?", (counter,))
+
+    def get(self, key: str) -> dict | None:
+        """Returns the cached component scores for `key`, or None on a miss."""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT scores FROM fitness_cache WHERE cache_key = ?", (key,)).fetchone()
+            if row is None:
+                self._bump('misses')
+                return None
+            self._conn.execute("UPDATE fitness_cache SET last_access = ? WHERE cache_key = ?", (time.time(), key))
+            self._bump('hits')
+        return json.loads(row[0])
+
+    def put(self, key: str, scores: dict):
+        """Stores component scores for `key`, evicting the least recently used entries if full."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fitness_cache (cache_key, scores, last_access) VALUES (?, ?, ?)",
+                (key, json.dumps(scores), time.time())
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM fitness_cache").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM fitness_cache WHERE cache_key IN "
+                    "(SELECT cache_key FROM fitness_cache ORDER BY last_access ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+
+    def stats(self) -> dict:
+        """Returns entry count and lifetime hit/miss counters."""
+        with self._lock:
+            counters = dict(self._conn.execute("SELECT name, value FROM fitness_cache_counters").fetchall())
+            entries = self._conn.execute("SELECT COUNT(*) FROM fitness_cache").fetchone()[0]
+        lookups = counters['hits'] + counters['misses']
+        return {
+            "entries": entries,
+            "hits": counters['hits'],
+            "misses": counters['misses'],
+            "hit_rate": counters['hits'] / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_fitness_cache() -> FitnessCache:
+    """Returns the process-wide fitness cache, opening it on first use."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = FitnessCache()
+        return _shared_cache
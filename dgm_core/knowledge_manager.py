@@ -1,97 +1,308 @@
 # dgm_core/knowledge_manager.py
 import os
+import re
+import json
+import hashlib
 import logging
-import chromadb
-from chromadb.utils import embedding_functions
+import threading
+from collections import OrderedDict
 from config import settings
+from .vector_store import MANIFEST_NAME, ChromaVectorBackend, NumpyVectorBackend
+
+def chunk_text(text: str, chunk_size: int, overlap: int) -> list[str]:
+    """
+    Splits text into chunks of roughly `chunk_size` characters. Paragraphs are kept whole
+    where possible and packed together; oversized paragraphs are cut into windows. Each
+    chunk starts with the last `overlap` characters of the previous one.
+    """
+    if overlap >= chunk_size:
+        raise ValueError("Chunk overlap must be smaller than the chunk size.")
+    step = chunk_size - overlap
+    pieces = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = paragraph.strip()
+        if len(paragraph) <= chunk_size:
+            pieces.append(paragraph)
+        else:
+            pieces.extend(paragraph[i:i + chunk_size] for i in range(0, len(paragraph) - overlap, step))
+
+    chunks = []
+    current = ""
+    for piece in filter(None, pieces):
+        if current and len(current) + 2 + len(piece) > chunk_size:
+            chunks.append(current)
+            tail = current[-overlap:] if overlap else ""
+            # Start the overlap at a word boundary rather than mid-word.
+            tail = tail[tail.find(' ') + 1:] if ' ' in tail else tail
+            current = f"{tail}\n\n{piece}" if tail else piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
 
 class KnowledgeManager:
     """
-    Manages the DGM's knowledge base using a vector store (ChromaDB).
-    It is responsible for loading, embedding, and querying documents.
+    Manages the DGM's knowledge base using a vector store: ChromaDB, or the memory-mapped
+    NumPy index selected with `backend="numpy"` (see dgm_core.vector_store).
+    It is responsible for loading, chunking, embedding, and querying documents.
+
+    Indexing is incremental: a manifest records the content hash of every source file
+    and the IDs of its chunks. Unchanged files are skipped, chunks are addressed by their
+    own content hash so only new text is embedded, and chunks that no longer exist are
+    removed from the store.
+
+    The embedding model and the vector store are only loaded on first use. Query
+    embeddings and results are kept in an LRU cache; cached results are dropped whenever
+    the index changes, including when another process rewrites the manifest.
     """
     COLLECTION_NAME = "dgm_knowledge"
+    EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 
-    def __init__(self, source_files: list[str]):
+    def __init__(self, source_files: list[str], chunk_size: int = None, chunk_overlap: int = None,
+                 batch_size: int = None, manifest_path: str = None, cache_size: int = None,
+                 backend: str = None):
         logging.basicConfig(level=logging.INFO, format='%(message)s')
         self.logger = logging.getLogger(__name__)
         self.source_files = source_files
-        self.collection = None
-        
-        try:
+        self.chunk_size = chunk_size or settings.KNOWLEDGE_CHUNK_SIZE
+        self.chunk_overlap = chunk_overlap if chunk_overlap is not None else settings.KNOWLEDGE_CHUNK_OVERLAP
+        self.batch_size = batch_size or settings.KNOWLEDGE_EMBEDDING_BATCH_SIZE
+        self.backend_name = backend or settings.KNOWLEDGE_VECTOR_BACKEND
+        if self.backend_name not in ("chroma", "numpy"):
+            raise ValueError(f"Unknown knowledge vector backend: {self.backend_name}")
+        self.store_path = settings.CHROMA_DB_PATH if self.backend_name == "chroma" else settings.NUMPY_INDEX_PATH
+        # Content hashes of indexed files and their chunk IDs, kept beside the vector store.
+        self.manifest_path = manifest_path or os.path.join(self.store_path, MANIFEST_NAME)
+        self.cache_size = cache_size or settings.KNOWLEDGE_QUERY_CACHE_SIZE
+        self._backend = None
+        self.embedding_function = None
+        self._connect_lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._embedding_cache = OrderedDict()
+        self._result_cache = OrderedDict()
+        self._index_version = None
+
+    def _load_embedding_function(self):
+        if self.backend_name == "chroma":
+            from chromadb.utils import embedding_functions
             # Use the default sentence transformer for local embeddings
-            self.embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-                model_name="all-MiniLM-L6-v2"
-            )
-            # Initialize the ChromaDB client with a persistent path
-            self.chroma_client = chromadb.PersistentClient(path=settings.CHROMA_DB_PATH)
-            
-            # Get or create the collection
-            self.collection = self.chroma_client.get_or_create_collection(
-                name=self.COLLECTION_NAME,
-                embedding_function=self.embedding_function
-            )
-        except Exception as e:
-            # This broad exception is to catch potential issues with ChromaDB/SentenceTransformer setup
-            # which can be numerous (network, file permissions, etc.)
-            raise RuntimeError(f"FATAL: Could not initialize or connect to ChromaDB. Error: {e}")
-
-    def _load_and_process_documents(self) -> tuple[list[str], list[str]]:
-        """Loads documents from the knowledge_base directory."""
-        documents = []
-        ids = []
-        for file_name in self.source_files:
-            file_path = os.path.join(settings.KNOWLEDGE_BASE_DIR, file_name)
+            return embedding_functions.SentenceTransformerEmbeddingFunction(model_name=self.EMBEDDING_MODEL)
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(self.EMBEDDING_MODEL)
+        return lambda texts: model.encode(list(texts), normalize_embeddings=True)
+
+    def _connect(self):
+        """Loads the embedding model and opens the vector store on first use."""
+        with self._connect_lock:
+            if self._backend is not None:
+                return self._backend
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    # Treat each file as a single document
-                    documents.append(f.read())
-                    ids.append(file_name) # Use filename as the document ID
-            except FileNotFoundError:
-                self.logger.warning(f"Knowledge source not found, skipping: {file_path}")
+                self.embedding_function = self._load_embedding_function()
+                if self.backend_name == "chroma":
+                    self._backend = ChromaVectorBackend(self.store_path, self.COLLECTION_NAME, self.embedding_function)
+                else:
+                    self._backend = NumpyVectorBackend(self.store_path)
             except Exception as e:
-                self.logger.error(f"Error reading {file_path}: {e}")
-        return documents, ids
+                # This broad exception is to catch potential issues with the vector store/SentenceTransformer
+                # setup which can be numerous (network, file permissions, etc.)
+                raise RuntimeError(f"FATAL: Could not initialize the {self.backend_name} vector store. Error: {e}")
+            return self._backend
+
+    @property
+    def backend(self):
+        return self._connect()
+
+    # --- Manifest ---
+
+    def _chunking_signature(self) -> dict:
+        """Settings that change chunk contents; if any differ, every file is re-chunked."""
+        return {"chunk_size": self.chunk_size, "chunk_overlap": self.chunk_overlap, "model": self.EMBEDDING_MODEL}
+
+    def _load_manifest(self) -> dict | None:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if manifest.get("chunking") != self._chunking_signature():
+            return None
+        return manifest
+
+    def _save_manifest(self, files: dict):
+        os.makedirs(os.path.dirname(self.manifest_path) or '.', exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"chunking": self._chunking_signature(), "files": files}, f, indent=4)
+        os.replace(tmp_path, self.manifest_path)
+
+    # --- Indexing ---
+
+    def _read_source(self, file_name: str) -> str | None:
+        file_path = os.path.join(settings.KNOWLEDGE_BASE_DIR, file_name)
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            self.logger.warning(f"Knowledge source not found, skipping: {file_path}")
+        except Exception as e:
+            self.logger.error(f"Error reading {file_path}: {e}")
+        return None
+
+    def _chunk_file(self, file_name: str, text: str) -> dict[str, str]:
+        """Returns the file's chunks keyed by content-addressed chunk ID."""
+        chunks = {}
+        for chunk in chunk_text(text, self.chunk_size, self.chunk_overlap):
+            chunks.setdefault(f"{file_name}:{_sha256(chunk)[:16]}", chunk)
+        return chunks
+
+    def _add_chunks(self, chunks: list[tuple[str, str, str]]):
+        """Embeds and stores (chunk_id, source, text) tuples, one embedding call per batch."""
+        for start in range(0, len(chunks), self.batch_size):
+            batch = chunks[start:start + self.batch_size]
+            documents = [text for _, _, text in batch]
+            self.backend.add(
+                ids=[chunk_id for chunk_id, _, _ in batch],
+                documents=documents,
+                embeddings=self.embedding_function(documents),
+                metadatas=[{"source": source} for _, source, _ in batch]
+            )
+
+    def _delete_chunks(self, chunk_ids: list[str]):
+        for start in range(0, len(chunk_ids), self.batch_size):
+            self.backend.delete(chunk_ids[start:start + self.batch_size])
 
     def initialize(self):
-        """Initializes the vector store, loading documents if necessary."""
+        """Brings the vector store in line with the source files, embedding only what changed."""
         self.logger.info("Initializing Knowledge Manager...")
-        
-        # Check if the database already contains the expected documents
-        if self.collection.count() >= len(self.source_files):
-             self.logger.info("  Knowledge base is already up-to-date.")
-             return
 
-        self.logger.info("  Loading knowledge into vector store...")
-        documents, ids = self._load_and_process_documents()
+        manifest = self._load_manifest()
+        if manifest is None:
+            # No usable manifest (first run, old whole-file index or new chunk settings):
+            # reconcile against whatever IDs the store already holds.
+            indexed_files = {}
+            existing_ids = self.backend.ids()
+        else:
+            indexed_files = manifest["files"]
+            existing_ids = {chunk_id for entry in indexed_files.values() for chunk_id in entry["chunks"]}
+
+        files = {}
+        wanted_ids = set()
+        new_chunks = []
+        for file_name in self.source_files:
+            text = self._read_source(file_name)
+            if text is None:
+                continue
+            file_hash = _sha256(text)
+            previous = indexed_files.get(file_name)
+            if previous is not None and previous["hash"] == file_hash:
+                files[file_name] = previous
+                wanted_ids.update(previous["chunks"])
+                continue
+            chunks = self._chunk_file(file_name, text)
+            files[file_name] = {"hash": file_hash, "chunks": list(chunks)}
+            wanted_ids.update(chunks)
+            new_chunks.extend((chunk_id, file_name, chunk) for chunk_id, chunk in chunks.items()
+                              if chunk_id not in existing_ids)
 
-        if not documents:
+        if not files:
             self.logger.error("No documents found to load into knowledge base.")
             return
 
+        stale_ids = sorted(existing_ids - wanted_ids)
+        if not new_chunks and not stale_ids and manifest is not None and files == indexed_files:
+            self.logger.info("  Knowledge base is already up-to-date.")
+            return
+
         try:
-            # Add documents to the collection. ChromaDB handles embedding automatically.
-            self.collection.add(
-                documents=documents,
-                ids=ids
-            )
-            self.logger.info(f"  Successfully loaded {len(documents)} documents.")
+            # One store write for the whole update, however many embedding batches it takes.
+            with self.backend.batch():
+                if stale_ids:
+                    self._delete_chunks(stale_ids)
+                    self.logger.info(f"  Removed {len(stale_ids)} stale chunks.")
+                if new_chunks:
+                    self.logger.info(f"  Embedding {len(new_chunks)} new chunks in batches of {self.batch_size}...")
+                    self._add_chunks(new_chunks)
+            self._save_manifest(files)
+            self._invalidate_results()
+            self.logger.info(f"  Knowledge base holds {len(wanted_ids)} chunks from {len(files)} documents.")
         except Exception as e:
-            self.logger.error(f"Failed to add documents to Chroma collection: {e}")
+            self.logger.error(f"Failed to update the {self.backend_name} vector store: {e}")
 
-    def query(self, query_text: str, n_results: int = 3) -> list:
-        """Queries the knowledge base for relevant documents."""
-        if not self.collection:
-            self.logger.error("Knowledge collection is not initialized.")
-            return []
-            
+    # --- Querying ---
+
+    def _current_index_version(self):
+        """Identifies the index state; it changes whenever the manifest is rewritten."""
         try:
-            results = self.collection.query(
-                query_texts=[query_text],
-                n_results=n_results
-            )
-            # The 'documents' key contains a list of lists.
-            return [doc for doc in results['documents'][0]]
+            stat = os.stat(self.manifest_path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _invalidate_results(self):
+        with self._cache_lock:
+            self._result_cache.clear()
+            self._index_version = self._current_index_version()
+
+    def _cache_put(self, cache: OrderedDict, key, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def _embed_queries(self, texts: list[str]) -> list:
+        """Returns query embeddings, computing all uncached ones in a single forward pass."""
+        embeddings = {}
+        with self._cache_lock:
+            for text in texts:
+                if text in self._embedding_cache:
+                    self._embedding_cache.move_to_end(text)
+                    embeddings[text] = self._embedding_cache[text]
+        missing = [text for text in dict.fromkeys(texts) if text not in embeddings]
+        if missing:
+            self._connect()
+            embeddings.update(zip(missing, self.embedding_function(missing)))
+            with self._cache_lock:
+                for text in missing:
+                    self._cache_put(self._embedding_cache, text, embeddings[text])
+        return [embeddings[text] for text in texts]
+
+    def query_many(self, query_texts: list[str], n_results: int = 3) -> list[list]:
+        """
+        Queries the knowledge base for several texts at once. Uncached queries are
+        embedded together and sent to the vector store in one request. Returns one list of
+        relevant chunks per query, in the order given.
+        """
+        try:
+            version = self._current_index_version()
+            with self._cache_lock:
+                if version != self._index_version:
+                    self._result_cache.clear()
+                    self._index_version = version
+                results = {}
+                for text in query_texts:
+                    cached = self._result_cache.get((text, n_results))
+                    if cached is not None:
+                        self._result_cache.move_to_end((text, n_results))
+                        results[text] = cached
+            pending = [t for t in dict.fromkeys(query_texts) if t not in results]
+
+            if pending:
+                response = self.backend.query(self._embed_queries(pending), n_results)
+                with self._cache_lock:
+                    for text, documents in zip(pending, response):
+                        results[text] = list(documents)
+                        self._cache_put(self._result_cache, (text, n_results), results[text])
+            return [list(results[text]) for text in query_texts]
         except Exception as e:
             self.logger.error(f"An error occurred during knowledge query: {e}")
-            return []
+            return [[] for _ in query_texts]
+
+    def query(self, query_text: str, n_results: int = 3) -> list:
+        """Queries the knowledge base for relevant chunks."""
+        return self.query_many([query_text], n_results)[0]
@@ -0,0 +1,125 @@
+# dgm_core/llm_cache.py
+# A shared, disk-backed cache of deterministic LLM responses.
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from config import settings
+
+
+class LLMResponseCache:
+    """
+    Caches Ollama responses keyed on (model, prompt, options). Entries expire after a TTL
+    and the store is kept under a byte budget by evicting the least recently used entries.
+    Only deterministic calls are cached unless the caller explicitly opts in.
+    """
+    def __init__(self, db_path: str = None, ttl_seconds: float = None, max_bytes: int = None):
+        self.db_path = db_path or settings.LLM_CACHE_PATH
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.LLM_CACHE_TTL_SECONDS
+        self.max_bytes = max_bytes or settings.LLM_CACHE_MAX_BYTES
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache (last_access);
+        """)
+
+    @staticmethod
+    def is_cacheable(options: dict = None, use_cache: bool = None) -> bool:
+        """
+        Decides whether a call may be served from or stored in the cache. By default only
+        greedy (temperature 0) calls are cached; `use_cache` overrides that per call.
+        """
+        if use_cache is not None:
+            return use_cache
+        return (options or {}).get("temperature") == 0
+
+    @staticmethod
+    def make_key(model: str, prompt, options: dict = None) -> str:
+        """Builds the cache key. `prompt` may be a string or a list of chat messages."""
+        payload = json.dumps({"model": model, "prompt": prompt, "options": options or {}}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, model: str, prompt, options: dict = None):
+        """Returns the cached response, or None if absent or expired."""
+        key = self.make_key(model, prompt, options)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl_seconds and now - row[1] > self.ttl_seconds):
+                if row is not None:
+                    self._conn.execute("DELETE FROM llm_cache WHERE cache_key = ?", (key,))
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE cache_key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, model: str, prompt, options: dict, response):
+        """Stores a response and evicts least recently used entries beyond the byte budget."""
+        key = self.make_key(model, prompt, options)
+        body = json.dumps(response)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (cache_key, model, response, size_bytes, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, body, len(body), now, now)
+            )
+            self._evict()
+
+    def _evict(self):
+        if self.ttl_seconds:
+            self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        stale_keys = []
+        for key, size in self._conn.execute("SELECT cache_key, size_bytes FROM llm_cache ORDER BY last_access ASC"):
+            if total - freed <= self.max_bytes:
+                break
+            stale_keys.append((key,))
+            freed += size
+        self._conn.executemany("DELETE FROM llm_cache WHERE cache_key = ?", stale_keys)
+
+    def stats(self) -> dict:
+        """Returns entry count, stored bytes and this process's hit/miss counters."""
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM llm_cache"
+            ).fetchone()
+        return {"entries": entries, "bytes": total, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Returns the process-wide LLM response cache, opening it on first use."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = LLMResponseCache()
+        return _shared_cache
@@ -1,7 +1,7 @@
 # dgm_core/llm_interface.py
-import ollama
 import logging
 from config import settings
+from dgm_core.ollama_client import get_ollama_client
 
 class LLMInterface:
     """
@@ -20,10 +20,10 @@ class LLMInterface:
         self.logger = logging.getLogger(__name__)
 
     def initialize_model(self):
-        """Initializes the Ollama client with the correct host."""
+        """Attaches to the shared pooled Ollama client for the configured host."""
         try:
-            self.client = ollama.Client(host=settings.OLLAMA_HOST_URL)
-            self.client.list()
+            self.client = get_ollama_client(settings.OLLAMA_HOST_URL)
+            self.client.list_models()
             self.logger.info(f"LLMInterface initialized for model: '{self.model_name}'")
         except Exception as e:
             self.logger.error(f"Failed to initialize Ollama client for model {self.model_name}. Is Ollama running at {settings.OLLAMA_HOST_URL}? Error: {e}")
@@ -33,17 +33,22 @@ class LLMInterface:
         """Sets parameters for the next LLM query."""
         self.model_params.update(params)
 
-    def query(self, prompt: str) -> str:
-        """Sends a prompt to the LLM and returns the response."""
+    def query(self, prompt: str, use_cache: bool = None) -> str:
+        """
+        Sends a prompt to the LLM and returns the response.
+        Answers are reused from the shared response cache when the current parameters are
+        deterministic (temperature 0) or `use_cache` is set.
+        """
         if not self.client:
             self.logger.error("LLM client not initialized. Cannot send query.")
             return "Error: LLM client is not available."
-            
+
         try:
             response = self.client.chat(
                 model=self.model_name,
                 messages=[{'role': 'user', 'content': prompt}],
-                options=self.model_params
+                options=self.model_params,
+                use_cache=use_cache
             )
             return response['message']['content']
         except Exception as e:
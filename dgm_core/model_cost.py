@@ -0,0 +1,138 @@
+# dgm_core/model_cost.py
+# A persistent, rolling record of what each Ollama model costs to call, and the model_cost
+# fitness score derived from it.
+
+import os
+import time
+import sqlite3
+import threading
+from config import settings
+
+
+class ModelCostStore:
+    """
+    Keeps the last `window` uncached calls per model in SQLite: wall-clock seconds, load
+    time and prompt/generated token counts. A model's cost is its seconds per generated
+    token over those calls, including the load time it actually incurred, so short
+    mutation proposals, long solutions and streams stopped after the first code block
+    are comparable. Scores are relative: the cheapest model with at least `min_samples`
+    calls that generated tokens scores 1.0 and a model k times as slow scores 1/k.
+    Scores are recomputed at most every `refresh_seconds`, so every task of one
+    evaluation is scored against the same cost model.
+    """
+    def __init__(self, db_path: str = None, window: int = None, min_samples: int = None,
+                 refresh_seconds: float = None):
+        self.db_path = db_path or settings.MODEL_COST_STORE_PATH
+        self.window = window or settings.MODEL_COST_WINDOW
+        self.min_samples = min_samples or settings.MODEL_COST_MIN_SAMPLES
+        self.refresh_seconds = settings.MODEL_COST_REFRESH_SECONDS if refresh_seconds is None else refresh_seconds
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS model_calls (
+                call_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                model TEXT NOT NULL,
+                recorded_at REAL NOT NULL,
+                seconds REAL NOT NULL,
+                load_seconds REAL NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                eval_tokens INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_model_calls_model ON model_calls (model, call_id);
+        """)
+        self._scores = None
+        self._scores_time = 0.0
+
+    def record(self, model: str, response_data: dict, elapsed: float):
+        """
+        Adds one call. Ollama's total_duration is used when reported; otherwise (e.g. a
+        stream closed early) the measured `elapsed` seconds.
+        """
+        seconds = (response_data.get("total_duration") or 0) / 1e9 or elapsed
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO model_calls (model, recorded_at, seconds, load_seconds, prompt_tokens, eval_tokens) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (model, time.time(), seconds, (response_data.get("load_duration") or 0) / 1e9,
+                 response_data.get("prompt_eval_count") or 0, response_data.get("eval_count") or 0)
+            )
+            self._conn.execute(
+                "DELETE FROM model_calls WHERE model = ? AND call_id <= "
+                "(SELECT call_id FROM model_calls WHERE model = ? ORDER BY call_id DESC LIMIT 1 OFFSET ?)",
+                (model, model, self.window)
+            )
+
+    def costs(self) -> dict:
+        """
+        Per-model call count, mean seconds and load seconds per call, generation throughput,
+        and seconds per generated token over the calls that generated any.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT model, COUNT(*), AVG(seconds), AVG(load_seconds), AVG(prompt_tokens), SUM(eval_tokens), "
+                "SUM(seconds - load_seconds), SUM(eval_tokens > 0), SUM(CASE WHEN eval_tokens > 0 THEN seconds END) "
+                "FROM model_calls GROUP BY model"
+            ).fetchall()
+        return {
+            model: {
+                "calls": calls,
+                "seconds_per_call": seconds,
+                "load_seconds_per_call": load_seconds,
+                "prompt_tokens_per_call": prompt_tokens,
+                "tokens_per_second": eval_tokens / busy_seconds if busy_seconds > 0 else None,
+                "generating_calls": generating_calls,
+                "seconds_per_token": generating_seconds / eval_tokens if eval_tokens else None,
+            }
+            for model, calls, seconds, load_seconds, prompt_tokens, eval_tokens, busy_seconds,
+                generating_calls, generating_seconds in rows
+        }
+
+    def scores(self) -> dict:
+        """Returns the model_cost score of every model with enough measured calls."""
+        with self._lock:
+            if self._scores is not None and time.monotonic() - self._scores_time < self.refresh_seconds:
+                return self._scores
+        measured = {model: cost["seconds_per_token"] for model, cost in self.costs().items()
+                    if cost["generating_calls"] >= self.min_samples}
+        cheapest = min(measured.values(), default=0.0)
+        scores = {model: cheapest / seconds if seconds > 0 else 1.0 for model, seconds in measured.items()}
+        with self._lock:
+            self._scores, self._scores_time = scores, time.monotonic()
+        return scores
+
+    def score(self, model: str) -> float:
+        """Scores how cheap `model` is to call; models not yet measured get a neutral default."""
+        return self.scores().get(model, settings.MODEL_COST_DEFAULT_SCORE)
+
+    def report(self) -> str:
+        costs = self.costs()
+        if not costs:
+            return "no calls measured"
+        scores = self.scores()
+        return ", ".join(
+            f"{model} {cost['seconds_per_call']:.2f}s/call"
+            + (f" {cost['seconds_per_token'] * 1000:.1f}ms/token" if cost["seconds_per_token"] is not None else "")
+            + f" x{cost['calls']}"
+            + (f" (score {scores[model]:.2f})" if model in scores else "")
+            for model, cost in sorted(costs.items(), key=lambda item: (item[1]["seconds_per_token"] is None,
+                                                                       item[1]["seconds_per_token"] or 0.0))
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def get_model_cost_store() -> ModelCostStore:
+    """Returns the process-wide model cost store, opening it on first use."""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = ModelCostStore()
+        return _shared_store
@@ -0,0 +1,314 @@
+# dgm_core/model_residency.py
+# Keeps the models a generation needs resident in Ollama and schedules requests to avoid model swaps.
+
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager, asynccontextmanager
+from dataclasses import dataclass
+from config import settings
+
+
+@dataclass
+class _ModelState:
+    size_mb: float
+    resident: bool = False
+    in_flight: int = 0
+    waiting: int = 0
+    waiting_since: float | None = None
+    last_used: float = 0.0
+    requests: int = 0
+    loads: int = 0
+    load_seconds: float = 0.0
+    unloads: int = 0
+
+
+class ModelResidencyManager:
+    """
+    Tracks which models are loaded in one Ollama backend and decides when a request may
+    start. A request for a resident model starts at once. A request for a model that is
+    not loaded starts if it fits in `memory_budget_mb`, counting models that nothing is
+    using as evictable; otherwise it waits until the models in use drain, which groups
+    queued requests by model instead of interleaving them. A model that has waited longer
+    than `switch_wait` stops new requests to the others so that it cannot starve.
+
+    Every request sets keep_alive explicitly, so models stay loaded until this manager
+    unloads them. Loads are detected from Ollama's load_duration and counted per model.
+    """
+    def __init__(self, base_url: str = None, memory_budget_mb: float = None, keep_alive: str = None,
+                 switch_wait: float = None):
+        self.base_url = (base_url or settings.OLLAMA_HOST_URL).rstrip('/')
+        self.memory_budget_mb = memory_budget_mb or settings.OLLAMA_MODEL_MEMORY_BUDGET_MB
+        self.keep_alive = keep_alive or settings.OLLAMA_KEEP_ALIVE
+        self.switch_wait = settings.OLLAMA_MODEL_SWITCH_WAIT if switch_wait is None else switch_wait
+        self._condition = threading.Condition()
+        self._models: dict[str, _ModelState] = {}
+        self._sizes_known = False
+
+    @property
+    def client(self):
+        from dgm_core.ollama_client import get_ollama_client
+        return get_ollama_client(self.base_url)
+
+    # --- Model state ---
+
+    def _state(self, model: str) -> _ModelState:
+        state = self._models.get(model)
+        if state is None:
+            state = self._models[model] = _ModelState(size_mb=settings.OLLAMA_DEFAULT_MODEL_SIZE_MB)
+        return state
+
+    def _learn_sizes(self):
+        """Fills in model sizes from /api/tags, once; unknown models keep the default estimate."""
+        if self._sizes_known:
+            return
+        self._sizes_known = True
+        try:
+            models = self.client.list_models().get("models", [])
+        except Exception:
+            return
+        with self._condition:
+            for entry in models:
+                if entry.get("size"):
+                    self._state(entry.get("name") or entry.get("model")).size_mb = entry["size"] / (1024 * 1024)
+
+    def refresh(self):
+        """Re-reads the set of loaded models from Ollama's /api/ps, when the backend supports it."""
+        self._learn_sizes()
+        try:
+            running = self.client.running_models().get("models", [])
+        except Exception:
+            return
+        with self._condition:
+            loaded = set()
+            for entry in running:
+                name = entry.get("name") or entry.get("model")
+                state = self._state(name)
+                state.resident = True
+                if entry.get("size"):
+                    state.size_mb = entry["size"] / (1024 * 1024)
+                loaded.add(name)
+            for name, state in self._models.items():
+                if name not in loaded and state.in_flight == 0:
+                    state.resident = False
+
+    def _resident_mb(self) -> float:
+        return sum(s.size_mb for s in self._models.values() if s.resident)
+
+    def _cold_models(self, keep: set = frozenset(), include_waiting: bool = False) -> list[str]:
+        """
+        Resident models that nothing is using (or, unless `include_waiting`, waiting for),
+        least recently used first.
+        """
+        cold = [name for name, s in self._models.items()
+                if s.resident and s.in_flight == 0 and (include_waiting or s.waiting == 0) and name not in keep]
+        return sorted(cold, key=lambda name: self._models[name].last_used)
+
+    def _room_for(self, model: str, keep: set = frozenset(), include_waiting: bool = False) -> list[str] | None:
+        """
+        Returns the cold models to unload so that `model` fits in the budget (possibly none),
+        or None if it cannot fit without unloading a model that is in use.
+        """
+        need = self._state(model).size_mb - (self.memory_budget_mb - self._resident_mb())
+        evict = []
+        for name in self._cold_models(keep | {model}, include_waiting):
+            if need <= 0:
+                break
+            evict.append(name)
+            need -= self._models[name].size_mb
+        return evict if need <= 0 else None
+
+    def _has_starved(self, state: _ModelState) -> bool:
+        return (not state.resident and state.waiting_since is not None
+                and time.monotonic() - state.waiting_since > self.switch_wait)
+
+    def _starving(self, model: str) -> bool:
+        """True if another model has waited past `switch_wait` for room to load."""
+        return any(name != model and self._has_starved(s) for name, s in self._models.items())
+
+    def _try_start(self, model: str) -> list[str] | None:
+        """Starts a request for `model` if allowed, returning the models to unload first; else None."""
+        state = self._state(model)
+        if state.resident:
+            if self._starving(model):
+                return None
+            evict = []
+        else:
+            # A starved model may displace models whose queued requests are merely waiting.
+            evict = self._room_for(model, include_waiting=self._has_starved(state))
+            if evict is None:
+                if any(s.in_flight for s in self._models.values()):
+                    return None
+                # Nothing is running, so waiting cannot free memory: go over budget instead.
+                evict = self._cold_models({model})
+        state.in_flight += 1
+        state.requests += 1
+        state.resident = True
+        for name in evict:
+            self._models[name].resident = False
+            self._models[name].unloads += 1
+        return evict
+
+    def _unload(self, models: list[str]):
+        for name in models:
+            try:
+                self.client.unload_model(name)
+            except Exception as e:
+                print(f"[MODEL RESIDENCY] Failed to unload {name}: {e}")
+
+    # --- Request scheduling ---
+
+    def _begin_wait(self, state: _ModelState):
+        state.waiting += 1
+        if state.waiting_since is None:
+            state.waiting_since = time.monotonic()
+
+    def _end_wait(self, state: _ModelState):
+        state.waiting -= 1
+        if state.waiting == 0:
+            state.waiting_since = None
+
+    def _acquire(self, model: str, blocking: bool = True) -> bool:
+        self._learn_sizes()
+        with self._condition:
+            state = self._state(model)
+            evict = self._try_start(model)
+            if evict is None:
+                if not blocking:
+                    return False
+                self._begin_wait(state)
+                while evict is None:
+                    self._condition.wait(timeout=1.0)
+                    evict = self._try_start(model)
+                self._end_wait(state)
+        self._unload(evict)
+        return True
+
+    def _release(self, model: str):
+        with self._condition:
+            state = self._state(model)
+            state.in_flight -= 1
+            state.last_used = time.monotonic()
+            self._condition.notify_all()
+
+    @contextmanager
+    def request(self, model: str):
+        """Waits until a request for `model` may run, and holds the model in use meanwhile."""
+        self._acquire(model)
+        try:
+            yield
+        finally:
+            self._release(model)
+
+    @asynccontextmanager
+    async def arequest(self, model: str):
+        """Async variant of request(); waits without blocking the event loop."""
+        import asyncio
+        if not self._acquire(model, blocking=False):
+            with self._condition:
+                self._begin_wait(self._state(model))
+            try:
+                while not self._acquire(model, blocking=False):
+                    await asyncio.sleep(0.1)
+            finally:
+                with self._condition:
+                    self._end_wait(self._state(model))
+        try:
+            yield
+        finally:
+            self._release(model)
+
+    def observe(self, model: str, response_data: dict):
+        """Counts a model load when a response reports one, from Ollama's load_duration."""
+        load_seconds = (response_data.get("load_duration") or 0) / 1e9
+        if load_seconds >= settings.OLLAMA_LOAD_DETECT_SECONDS:
+            with self._condition:
+                state = self._state(model)
+                state.loads += 1
+                state.load_seconds += load_seconds
+
+    # --- Generation planning ---
+
+    @staticmethod
+    def models_for(genomes: list, solver: bool = True, mutator: bool = True) -> list[str]:
+        """The models a set of genomes will call, most widely used first."""
+        counts = Counter()
+        for genome in genomes:
+            if solver:
+                counts.update(dict.fromkeys([genome.solver_policy.get('easy_model', 'gemma:2b'),
+                                             genome.solver_policy.get('hard_model', 'llama3:8b')], 1))
+            if mutator:
+                counts[genome.mutator_model] += 1
+        return [model for model, _ in counts.most_common()]
+
+    def preload(self, models: list[str]) -> list[str]:
+        """
+        Loads `models` in priority order while they fit in the budget, unloading cold models
+        that are not needed to make room. Returns the models that were loaded.
+        """
+        self.refresh()
+        needed = set(models)
+        loaded = []
+        for model in models:
+            with self._condition:
+                if self._state(model).resident:
+                    continue
+                evict = self._room_for(model, keep=needed)
+                if evict is None:
+                    break
+                state = self._state(model)
+                state.resident = True
+                state.in_flight += 1
+                for name in evict:
+                    self._models[name].resident = False
+                    self._models[name].unloads += 1
+            try:
+                self._unload(evict)
+                start = time.monotonic()
+                data = self.client.load_model(model, self.keep_alive)
+                if not data.get("load_duration"):
+                    data["load_duration"] = int((time.monotonic() - start) * 1e9)
+                self.observe(model, data)
+                loaded.append(model)
+            except Exception as e:
+                print(f"[MODEL RESIDENCY] Failed to preload {model}: {e}")
+                with self._condition:
+                    self._state(model).resident = False
+            finally:
+                self._release(model)
+        if loaded:
+            print(f"[MODEL RESIDENCY] Preloaded {', '.join(loaded)}.")
+        return loaded
+
+    # --- Reporting ---
+
+    def stats(self) -> dict:
+        """Per-model request, load and unload counts, and total time spent loading."""
+        with self._condition:
+            models = {name: {"resident": s.resident, "requests": s.requests, "loads": s.loads,
+                             "load_seconds": round(s.load_seconds, 3), "unloads": s.unloads}
+                      for name, s in self._models.items()}
+        return {
+            "models": models,
+            "loads": sum(m["loads"] for m in models.values()),
+            "load_seconds": round(sum(m["load_seconds"] for m in models.values()), 3),
+        }
+
+    def report(self) -> str:
+        stats = self.stats()
+        per_model = ", ".join(f"{name} x{m['loads']} ({m['load_seconds']:.1f}s)"
+                              for name, m in stats["models"].items() if m["loads"])
+        return f"{stats['loads']} model loads, {stats['load_seconds']:.1f}s loading" + (f": {per_model}" if per_model else "")
+
+
+_shared_managers = {}
+_shared_managers_lock = threading.Lock()
+
+
+def get_model_residency(base_url: str = None) -> ModelResidencyManager:
+    """Returns the process-wide residency manager for an Ollama backend."""
+    key = (base_url or settings.OLLAMA_HOST_URL).rstrip('/')
+    with _shared_managers_lock:
+        if key not in _shared_managers:
+            _shared_managers[key] = ModelResidencyManager(key)
+        return _shared_managers[key]
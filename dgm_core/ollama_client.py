@@ -0,0 +1,433 @@
+# dgm_core/ollama_client.py
+# A shared, pooled Ollama HTTP client with sync and asyncio APIs and bounded concurrency.
+
+# httpx and asyncio are imported when the first client (or async limiter) is created:
+# together they cost tens of milliseconds, which short-lived processes that never call
+# Ollama should not pay.
+
+import json
+import time
+import weakref
+import threading
+from config import settings
+from dgm_core.llm_cache import get_llm_cache
+from dgm_core.model_residency import get_model_residency
+from dgm_core.model_cost import get_model_cost_store
+from utils.resource_monitor import get_admission_controller
+from utils.tracing import get_tracer
+
+
+class OllamaRequestError(Exception):
+    """Raised when an Ollama request fails or returns an unusable response."""
+
+
+class _SyncLimiter:
+    """Bounds in-flight requests globally and per model across threads."""
+    def __init__(self, global_limit: int, per_model_limit: int):
+        self._global = threading.BoundedSemaphore(global_limit)
+        self._per_model_limit = per_model_limit
+        self._per_model = {}
+        self._lock = threading.Lock()
+
+    def _model_semaphore(self, model: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if model not in self._per_model:
+                self._per_model[model] = threading.BoundedSemaphore(self._per_model_limit)
+            return self._per_model[model]
+
+    def __call__(self, model: str):
+        return _SyncSlot(self._global, self._model_semaphore(model))
+
+
+class _SyncSlot:
+    def __init__(self, global_sem, model_sem):
+        self._global_sem = global_sem
+        self._model_sem = model_sem
+
+    def __enter__(self):
+        # Taking the model slot first keeps one busy model from hogging global slots.
+        self._model_sem.acquire()
+        self._global_sem.acquire()
+
+    def __exit__(self, *exc):
+        self._global_sem.release()
+        self._model_sem.release()
+
+
+class _AsyncLimiter:
+    """Bounds in-flight requests globally and per model within one event loop."""
+    def __init__(self, global_limit: int, per_model_limit: int):
+        import asyncio
+        self._asyncio = asyncio
+        self._global = asyncio.Semaphore(global_limit)
+        self._per_model_limit = per_model_limit
+        self._per_model = {}
+
+    def _model_semaphore(self, model: str) -> "asyncio.Semaphore":
+        if model not in self._per_model:
+            self._per_model[model] = self._asyncio.Semaphore(self._per_model_limit)
+        return self._per_model[model]
+
+    async def acquire(self, model: str):
+        model_sem = self._model_semaphore(model)
+        await model_sem.acquire()
+        try:
+            await self._global.acquire()
+        except BaseException:
+            model_sem.release()
+            raise
+
+    def release(self, model: str):
+        self._global.release()
+        self._model_semaphore(model).release()
+
+
+class _StreamAccumulator:
+    """Collects an NDJSON /api/generate stream and decides when to stop reading it."""
+    def __init__(self, stop_when=None):
+        self.stop_when = stop_when
+        self.start = time.monotonic()
+        self.first_token_at = None
+        self.text = ""
+        self.tokens = 0
+        self.final = {}
+        self.stopped_early = False
+
+    def feed(self, line: str) -> bool:
+        """Consumes one stream line. Returns True when reading should stop."""
+        if not line.strip():
+            return False
+        try:
+            chunk = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise OllamaRequestError(f"Malformed stream chunk: {e}") from e
+        if "error" in chunk:
+            raise OllamaRequestError(chunk["error"])
+        token = chunk.get("response", "")
+        if token and self.first_token_at is None:
+            self.first_token_at = time.monotonic()
+        self.text += token
+        self.tokens += bool(token)
+        if chunk.get("done"):
+            self.final = chunk
+            return True
+        if self.stop_when and token and self.stop_when(self.text):
+            self.stopped_early = True
+            return True
+        return False
+
+    def result(self) -> dict:
+        data = {key: value for key, value in self.final.items() if key != "response"}
+        # A stream closed before its final chunk reports no counts: each chunk is one token.
+        data.setdefault("eval_count", self.tokens)
+        data.update({
+            "response": self.text,
+            "done": bool(self.final.get("done")),
+            "stopped_early": self.stopped_early,
+            "time_to_first_token": (self.first_token_at - self.start) if self.first_token_at else None,
+            "total_time": time.monotonic() - self.start,
+        })
+        return data
+
+
+class OllamaClient:
+    """
+    One client per Ollama backend, shared by every component in the process. The sync API
+    uses a keep-alive connection pool; the async API keeps one pooled AsyncClient per event
+    loop, held weakly and closed when that loop shuts down. Both enforce a global
+    in-flight limit and a per-model concurrency limit, both go through the shared LLM
+    response cache, and both are scheduled by the backend's ModelResidencyManager so that
+    requests for the same model run together.
+    """
+    def __init__(self, base_url: str = None, global_limit: int = None, per_model_limit: int = None):
+        self.base_url = (base_url or settings.OLLAMA_HOST_URL).rstrip('/')
+        self.global_limit = global_limit or settings.OLLAMA_MAX_IN_FLIGHT
+        self.per_model_limit = per_model_limit or settings.OLLAMA_MAX_IN_FLIGHT_PER_MODEL
+        import httpx
+        self._httpx = httpx
+        self._limits = httpx.Limits(max_connections=self.global_limit, max_keepalive_connections=self.global_limit)
+        self._client = httpx.Client(base_url=self.base_url, limits=self._limits)
+        self._sync_limiter = _SyncLimiter(self.global_limit, self.per_model_limit)
+        self.residency = get_model_residency(self.base_url)
+        self._async_state = weakref.WeakKeyDictionary()
+        self._async_lock = threading.Lock()
+
+    # --- Request building ---
+
+    @staticmethod
+    def _generate_payload(model, prompt, options, format):
+        # keep_alive is always explicit: the residency manager, not Ollama's idle timer, unloads models.
+        payload = {"model": model, "prompt": prompt, "stream": False, "keep_alive": settings.OLLAMA_KEEP_ALIVE}
+        if options:
+            payload["options"] = options
+        if format:
+            payload["format"] = format
+        return payload
+
+    @staticmethod
+    def _chat_payload(model, messages, options, format):
+        payload = {"model": model, "messages": messages, "stream": False, "keep_alive": settings.OLLAMA_KEEP_ALIVE}
+        if options:
+            payload["options"] = options
+        if format:
+            payload["format"] = format
+        return payload
+
+    @staticmethod
+    def _cache_options(options, format):
+        return {**(options or {}), "format": format} if format else options
+
+    def _decode(self, response: "httpx.Response") -> dict:
+        try:
+            response.raise_for_status()
+            return response.json()
+        except (self._httpx.HTTPError, json.JSONDecodeError) as e:
+            raise OllamaRequestError(str(e)) from e
+
+    def _observe(self, model: str, data: dict, span, started: float):
+        """Feeds an uncached response's load time, latency and token counts to residency, cost and tracing."""
+        self.residency.observe(model, data)
+        get_model_cost_store().record(model, data, time.monotonic() - started)
+        get_tracer().record_llm_response(span, data)
+
+    # --- Sync API ---
+
+    def _post(self, path: str, model: str, payload: dict, cache_prompt, options: dict,
+              format: str, timeout: float, use_cache: bool) -> dict:
+        with get_tracer().span("llm_call", model=model, endpoint=path) as span:
+            cache = get_llm_cache()
+            cache_options = self._cache_options(options, format)
+            cacheable = cache.is_cacheable(options, use_cache)
+            if cacheable:
+                cached = cache.get(model, cache_prompt, cache_options)
+                if cached is not None:
+                    span.set(cached=True)
+                    return cached
+
+            with get_admission_controller().admit("llm"), self.residency.request(model), self._sync_limiter(model):
+                started = time.monotonic()
+                try:
+                    response = self._client.post(path, json=payload, timeout=timeout)
+                except self._httpx.HTTPError as e:
+                    raise OllamaRequestError(str(e)) from e
+            data = self._decode(response)
+            self._observe(model, data, span, started)
+
+            if cacheable:
+                cache.put(model, cache_prompt, cache_options, data)
+            return data
+
+    def generate(self, model: str, prompt: str, options: dict = None, format: str = None,
+                 timeout: float = 300, use_cache: bool = None) -> dict:
+        """Calls /api/generate and returns the decoded response."""
+        payload = self._generate_payload(model, prompt, options, format)
+        return self._post("/api/generate", model, payload, prompt, options, format, timeout, use_cache)
+
+    def chat(self, model: str, messages: list[dict], options: dict = None, format: str = None,
+             timeout: float = 300, use_cache: bool = None) -> dict:
+        """Calls /api/chat and returns the decoded response."""
+        payload = self._chat_payload(model, messages, options, format)
+        return self._post("/api/chat", model, payload, messages, options, format, timeout, use_cache)
+
+    def generate_stream(self, model: str, prompt: str, options: dict = None, stop_when=None,
+                        timeout: float = 300, use_cache: bool = None) -> dict:
+        """
+        Calls /api/generate in streaming mode, accumulating tokens as they arrive. If
+        `stop_when(text)` returns truthy the stream is closed, which makes Ollama stop
+        generating. The result mirrors a non-streamed response plus 'stopped_early',
+        'time_to_first_token' and 'total_time'.
+        """
+        with get_tracer().span("llm_call", model=model, endpoint="/api/generate", stream=True) as span:
+            cache = get_llm_cache()
+            cacheable = cache.is_cacheable(options, use_cache)
+            if cacheable:
+                cached = cache.get(model, prompt, options)
+                if cached is not None:
+                    span.set(cached=True)
+                    return cached
+
+            payload = {**self._generate_payload(model, prompt, options, None), "stream": True}
+            stream = _StreamAccumulator(stop_when)
+            with get_admission_controller().admit("llm"), self.residency.request(model), self._sync_limiter(model):
+                started = time.monotonic()
+                try:
+                    with self._client.stream("POST", "/api/generate", json=payload, timeout=timeout) as response:
+                        if response.is_error:
+                            response.read()
+                            self._decode(response)
+                        for line in response.iter_lines():
+                            if stream.feed(line):
+                                break
+                except self._httpx.HTTPError as e:
+                    raise OllamaRequestError(str(e)) from e
+            data = stream.result()
+            self._observe(model, data, span, started)
+            span.set(time_to_first_token=data["time_to_first_token"], stopped_early=data["stopped_early"])
+
+            if cacheable:
+                cache.put(model, prompt, options, data)
+            return data
+
+    def list_models(self, timeout: float = 10) -> dict:
+        """Calls /api/tags."""
+        try:
+            return self._decode(self._client.get("/api/tags", timeout=timeout))
+        except self._httpx.HTTPError as e:
+            raise OllamaRequestError(str(e)) from e
+
+    def running_models(self, timeout: float = 10) -> dict:
+        """Calls /api/ps, which lists the models currently loaded in memory."""
+        try:
+            return self._decode(self._client.get("/api/ps", timeout=timeout))
+        except self._httpx.HTTPError as e:
+            raise OllamaRequestError(str(e)) from e
+
+    def load_model(self, model: str, keep_alive: str = None, timeout: float = 300) -> dict:
+        """Loads `model` without generating anything and keeps it resident for `keep_alive`."""
+        payload = {"model": model, "stream": False, "keep_alive": keep_alive or settings.OLLAMA_KEEP_ALIVE}
+        try:
+            return self._decode(self._client.post("/api/generate", json=payload, timeout=timeout))
+        except self._httpx.HTTPError as e:
+            raise OllamaRequestError(str(e)) from e
+
+    def unload_model(self, model: str, timeout: float = 60) -> dict:
+        """Asks Ollama to release `model` from memory now."""
+        try:
+            return self._decode(self._client.post("/api/generate", json={"model": model, "keep_alive": 0, "stream": False},
+                                                  timeout=timeout))
+        except self._httpx.HTTPError as e:
+            raise OllamaRequestError(str(e)) from e
+
+    # --- Async API ---
+
+    async def _loop_state(self) -> tuple["httpx.AsyncClient", _AsyncLimiter]:
+        import asyncio
+        loop = asyncio.get_running_loop()
+        with self._async_lock:
+            state = self._async_state.get(loop)
+            if state is not None:
+                return state[:2]
+            client = self._httpx.AsyncClient(base_url=self.base_url, limits=self._limits)
+            closer = self._close_at_loop_shutdown(loop, client)
+            state = (client, _AsyncLimiter(self.global_limit, self.per_model_limit), closer)
+            self._async_state[loop] = state
+        # Starting the generator registers it with the running loop's shutdown hooks.
+        await closer.asend(None)
+        return state[:2]
+
+    async def _close_at_loop_shutdown(self, loop, client):
+        # Left suspended at the yield, this generator is finalized by the loop's
+        # shutdown_asyncgens() (which asyncio.run() calls) while the loop can still run
+        # coroutines, so the loop's state is dropped and its AsyncClient closed before
+        # the loop itself closes.
+        try:
+            yield
+        finally:
+            with self._async_lock:
+                if self._async_state.get(loop, (None,))[0] is client:
+                    del self._async_state[loop]
+            await client.aclose()
+
+    async def _apost(self, path: str, model: str, payload: dict, cache_prompt, options: dict,
+                     format: str, timeout: float, use_cache: bool) -> dict:
+        with get_tracer().span("llm_call", model=model, endpoint=path) as span:
+            cache = get_llm_cache()
+            cache_options = self._cache_options(options, format)
+            cacheable = cache.is_cacheable(options, use_cache)
+            if cacheable:
+                cached = cache.get(model, cache_prompt, cache_options)
+                if cached is not None:
+                    span.set(cached=True)
+                    return cached
+
+            client, limiter = await self._loop_state()
+            async with get_admission_controller().aadmit("llm"), self.residency.arequest(model):
+                await limiter.acquire(model)
+                started = time.monotonic()
+                try:
+                    response = await client.post(path, json=payload, timeout=timeout)
+                except self._httpx.HTTPError as e:
+                    raise OllamaRequestError(str(e)) from e
+                finally:
+                    limiter.release(model)
+            data = self._decode(response)
+            self._observe(model, data, span, started)
+
+            if cacheable:
+                cache.put(model, cache_prompt, cache_options, data)
+            return data
+
+    async def agenerate(self, model: str, prompt: str, options: dict = None, format: str = None,
+                        timeout: float = 300, use_cache: bool = None) -> dict:
+        """Async variant of generate()."""
+        payload = self._generate_payload(model, prompt, options, format)
+        return await self._apost("/api/generate", model, payload, prompt, options, format, timeout, use_cache)
+
+    async def achat(self, model: str, messages: list[dict], options: dict = None, format: str = None,
+                    timeout: float = 300, use_cache: bool = None) -> dict:
+        """Async variant of chat()."""
+        payload = self._chat_payload(model, messages, options, format)
+        return await self._apost("/api/chat", model, payload, messages, options, format, timeout, use_cache)
+
+    async def agenerate_stream(self, model: str, prompt: str, options: dict = None, stop_when=None,
+                               timeout: float = 300, use_cache: bool = None) -> dict:
+        """Async variant of generate_stream()."""
+        with get_tracer().span("llm_call", model=model, endpoint="/api/generate", stream=True) as span:
+            cache = get_llm_cache()
+            cacheable = cache.is_cacheable(options, use_cache)
+            if cacheable:
+                cached = cache.get(model, prompt, options)
+                if cached is not None:
+                    span.set(cached=True)
+                    return cached
+
+            payload = {**self._generate_payload(model, prompt, options, None), "stream": True}
+            stream = _StreamAccumulator(stop_when)
+            client, limiter = await self._loop_state()
+            async with get_admission_controller().aadmit("llm"), self.residency.arequest(model):
+                await limiter.acquire(model)
+                started = time.monotonic()
+                try:
+                    async with client.stream("POST", "/api/generate", json=payload, timeout=timeout) as response:
+                        if response.is_error:
+                            await response.aread()
+                            self._decode(response)
+                        async for line in response.aiter_lines():
+                            if stream.feed(line):
+                                break
+                except self._httpx.HTTPError as e:
+                    raise OllamaRequestError(str(e)) from e
+                finally:
+                    limiter.release(model)
+            data = stream.result()
+            self._observe(model, data, span, started)
+            span.set(time_to_first_token=data["time_to_first_token"], stopped_early=data["stopped_early"])
+
+            if cacheable:
+                cache.put(model, prompt, options, data)
+            return data
+
+    async def aclose(self):
+        """Closes the AsyncClient bound to the running event loop."""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        with self._async_lock:
+            state = self._async_state.pop(loop, None)
+        if state:
+            await state[2].aclose()
+
+    def close(self):
+        self._client.close()
+
+
+_shared_clients = {}
+_shared_clients_lock = threading.Lock()
+
+
+def get_ollama_client(base_url: str = None) -> OllamaClient:
+    """Returns the process-wide client for `base_url`, creating it on first use."""
+    key = (base_url or settings.OLLAMA_HOST_URL).rstrip('/')
+    with _shared_clients_lock:
+        if key not in _shared_clients:
+            _shared_clients[key] = OllamaClient(key)
+        return _shared_clients[key]
@@ -1,11 +1,11 @@
 # dgm_core/self_mutator.py (With Few-Shot Prompting and Self-Correction)
 # Proposes mutations to the DGM's genome and environment using a live LLM.
 
-import requests
 import json
 import random
 import copy
 from dgm_core.dgm_genome import Genome
+from dgm_core.ollama_client import OllamaRequestError, get_ollama_client
 
 class SelfMutator:
     """
@@ -16,20 +16,34 @@ class SelfMutator:
         self.parent_genome = parent_genome
         self.mutator_model = parent_genome.mutator_model
         self.ollama_base_url = ollama_base_url
+        self.client = get_ollama_client(ollama_base_url)
         print(f"SelfMutator instantiated with LIVE cognitive engine: {self.mutator_model}")
 
-    def _make_ollama_request(self, model: str, prompt: str):
-        """Helper function to make requests to the Ollama API."""
-        api_url = f"{self.ollama_base_url}/api/generate"
-        payload = {"model": model, "prompt": prompt, "stream": False, "format": "json"}
+    def _make_ollama_request(self, model: str, prompt: str, options: dict = None, use_cache: bool = None):
+        """
+        Helper function to make requests to the Ollama API through the shared pooled client.
+        Mutation proposals are sampled, so the shared response cache is only used for
+        greedy calls or when `use_cache` is set explicitly.
+        """
         try:
             print(f"Sending request to Ollama for model '{model}'...")
-            response = requests.post(api_url, json=payload, timeout=180)
-            response.raise_for_status()
-            response_json = json.loads(response.json()['response'])
+            response_data = self.client.generate(model, prompt, options=options, format="json", timeout=180, use_cache=use_cache)
+            response_json = json.loads(response_data['response'])
             print("Ollama request successful.")
             return response_json
-        except (requests.exceptions.RequestException, json.JSONDecodeError, KeyError) as e:
+        except (OllamaRequestError, json.JSONDecodeError, KeyError) as e:
+            print(f"ERROR: Ollama request or parsing failed: {e}")
+            return None
+
+    async def _amake_ollama_request(self, model: str, prompt: str, options: dict = None, use_cache: bool = None):
+        """Async variant of _make_ollama_request()."""
+        try:
+            print(f"Sending async request to Ollama for model '{model}'...")
+            response_data = await self.client.agenerate(model, prompt, options=options, format="json", timeout=180, use_cache=use_cache)
+            response_json = json.loads(response_data['response'])
+            print("Ollama request successful.")
+            return response_json
+        except (OllamaRequestError, json.JSONDecodeError, KeyError) as e:
             print(f"ERROR: Ollama request or parsing failed: {e}")
             return None
 
@@ -79,8 +93,25 @@ class SelfMutator:
         Provide only the corrected JSON object.
         """
 
+    def _mutation_prompt(self, attempt: int, last_failed_response, last_error) -> str:
+        if attempt == 0:
+            return self._get_initial_prompt()
+        print(f"Self-Correction Attempt {attempt}...")
+        return self._get_correction_prompt(str(last_failed_response), str(last_error))
+
+    def _try_apply(self, mutation_proposal, attempt: int, max_attempts: int):
+        """Applies a proposal to a copy of the parent. Returns ((genome, info), None) or (None, error)."""
+        if not mutation_proposal:
+            return None, "LLM response was None."
+        try:
+            mutant_genome = copy.deepcopy(self.parent_genome)
+            mutation_info = self._apply_mutation(mutant_genome, mutation_proposal)
+            return (mutant_genome, mutation_info), None
+        except Exception as e:
+            print(f"Error applying LLM-proposed mutation (Attempt {attempt + 1}/{max_attempts}): {e}")
+            return None, e
+
     def propose_mutation(self) -> (Genome, dict):
-        # ... [This method remains the same] ...
         print("Proposing mutation via LLM...")
         
         max_attempts = 2
@@ -88,30 +119,35 @@ class SelfMutator:
         last_error = "Initial attempt failed."
 
         for attempt in range(max_attempts):
-            if attempt == 0:
-                prompt = self._get_initial_prompt()
-            else:
-                print(f"Self-Correction Attempt {attempt}...")
-                prompt = self._get_correction_prompt(str(last_failed_response), str(last_error))
-
+            prompt = self._mutation_prompt(attempt, last_failed_response, last_error)
             mutation_proposal = self._make_ollama_request(self.mutator_model, prompt)
             last_failed_response = mutation_proposal
-
-            if not mutation_proposal:
-                last_error = "LLM response was None."
-                continue
-
-            try:
-                mutant_genome = copy.deepcopy(self.parent_genome)
-                mutation_info = self._apply_mutation(mutant_genome, mutation_proposal)
-                return mutant_genome, mutation_info
-            except Exception as e:
-                last_error = e
-                print(f"Error applying LLM-proposed mutation (Attempt {attempt + 1}/{max_attempts}): {e}")
+            result, last_error = self._try_apply(mutation_proposal, attempt, max_attempts)
+            if result:
+                return result
         
         print("LLM self-correction failed after multiple attempts. Falling back to random mutation.")
         return self._fallback_random_mutation()
 
+    async def apropose_mutation(self) -> (Genome, dict):
+        """Async variant of propose_mutation(), for proposing many mutants concurrently."""
+        print("Proposing mutation via LLM (async)...")
+
+        max_attempts = 2
+        last_failed_response = None
+        last_error = "Initial attempt failed."
+
+        for attempt in range(max_attempts):
+            prompt = self._mutation_prompt(attempt, last_failed_response, last_error)
+            mutation_proposal = await self._amake_ollama_request(self.mutator_model, prompt)
+            last_failed_response = mutation_proposal
+            result, last_error = self._try_apply(mutation_proposal, attempt, max_attempts)
+            if result:
+                return result
+
+        print("LLM self-correction failed after multiple attempts. Falling back to random mutation.")
+        return self._fallback_random_mutation()
+
 
     def _apply_mutation(self, genome: Genome, proposal: dict) -> dict:
         # ... [This method remains the same] ...
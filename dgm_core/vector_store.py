@@ -0,0 +1,333 @@
+# dgm_core/vector_store.py
+# Vector backends for the KnowledgeManager: ChromaDB, or a memory-mapped NumPy index.
+
+import os
+import json
+import time
+import fcntl
+import shutil
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+from config import settings
+
+MANIFEST_NAME = "dgm_manifest.json"
+
+
+class ChromaVectorBackend:
+    """Stores chunk embeddings in a persistent ChromaDB collection."""
+    def __init__(self, path: str, collection_name: str, embedding_function):
+        import chromadb
+        self.path = path
+        self.client = chromadb.PersistentClient(path=path)
+        self.collection = self.client.get_or_create_collection(
+            name=collection_name,
+            embedding_function=embedding_function
+        )
+
+    def ids(self) -> set[str]:
+        return set(self.collection.get(include=[])["ids"])
+
+    def add(self, ids: list[str], documents: list[str], embeddings: list, metadatas: list[dict]):
+        self.collection.add(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+
+    def delete(self, ids: list[str]):
+        self.collection.delete(ids=ids)
+
+    def batch(self):
+        """Chroma persists every call itself, so batching is a no-op."""
+        return nullcontext()
+
+    def query(self, embeddings: list, n_results: int) -> list[list[str]]:
+        results = self.collection.query(query_embeddings=embeddings, n_results=n_results)
+        # The 'documents' key contains one list of matches per query.
+        return [list(documents) for documents in results['documents']]
+
+
+class NumpyVectorBackend:
+    """
+    Stores unit-normalized embeddings as a memory-mapped .npy matrix with a JSON sidecar
+    of IDs, documents and metadata, and answers queries by exact cosine top-k search.
+
+    `dtype` is 'float32', 'float16' or 'int8'. The int8 mode quantizes each row with its
+    own scale, a quarter of the float32 size at a small cost in score precision.
+
+    Every write produces a new generation directory and then atomically repoints the
+    CURRENT file at it, so readers never see a half-written index. Opening an index
+    only maps the matrix, and worker processes on the same host share its page cache.
+    add() and delete() calls made inside batch() are written as a single generation.
+
+    Each backend holds a shared flock on the generation it has mapped. A writer deletes
+    an old generation only once it can lock it exclusively, i.e. once no reader in any
+    process still holds it.
+    """
+    DTYPES = ("float32", "float16", "int8")
+    SEARCH_BLOCK_ROWS = 65536
+
+    def __init__(self, path: str, dtype: str = None):
+        import numpy as np
+        self._np = np
+        self.path = path
+        self.dtype = dtype or settings.NUMPY_INDEX_DTYPE
+        if self.dtype not in self.DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {self.dtype}")
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._generation = None
+        self._vectors = None
+        self._scales = None
+        self._records = {"ids": [], "documents": [], "metadatas": []}
+        self._generation_fd = None
+        self._pending = None
+        self._lock_dir = os.path.join(self.path, "locks")
+        os.makedirs(self._lock_dir, exist_ok=True)
+
+    # --- Storage ---
+
+    def _current_generation(self) -> str | None:
+        try:
+            with open(os.path.join(self.path, "CURRENT"), 'r') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _lock_generation(self, generation: str, mode: int) -> int:
+        """Opens and flocks the generation's lock file, returning the held descriptor."""
+        fd = os.open(os.path.join(self._lock_dir, f"{generation}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, mode)
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+
+    def _hold_generation(self, fd: int | None):
+        """Releases the generation held so far and keeps `fd` (or nothing) instead."""
+        if self._generation_fd is not None:
+            os.close(self._generation_fd)
+        self._generation_fd = fd
+
+    def _refresh(self):
+        """Maps the current generation if another writer (or process) has replaced it."""
+        np = self._np
+        while True:
+            generation = self._current_generation()
+            if generation == self._generation:
+                return
+            if generation is None:
+                self._hold_generation(None)
+                self._vectors, self._scales = None, None
+                self._records = {"ids": [], "documents": [], "metadatas": []}
+                self._generation = None
+                return
+            fd = self._lock_generation(generation, fcntl.LOCK_SH)
+            directory = os.path.join(self.path, generation)
+            try:
+                with open(os.path.join(directory, "records.json"), 'r', encoding='utf-8') as f:
+                    records = json.load(f)
+                vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode='r')
+                scales_path = os.path.join(directory, "scales.npy")
+                scales = np.load(scales_path, mmap_mode='r') if os.path.exists(scales_path) else None
+            except FileNotFoundError:
+                os.close(fd)
+                # Superseded and deleted between reading CURRENT and locking it: retry.
+                if self._current_generation() == generation:
+                    raise
+                try:
+                    os.remove(os.path.join(self._lock_dir, f"{generation}.lock"))
+                except FileNotFoundError:
+                    pass
+                continue
+            self._hold_generation(fd)
+            self._records, self._vectors, self._scales = records, vectors, scales
+            self._generation = generation
+            return
+
+    def _delete_old_generations(self):
+        """Deletes every superseded generation that no reader holds any more."""
+        for name in os.listdir(self.path):
+            if not name.startswith("gen-") or name == self._generation:
+                continue
+            try:
+                fd = self._lock_generation(name, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue
+            try:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+                os.remove(os.path.join(self._lock_dir, f"{name}.lock"))
+            except FileNotFoundError:
+                pass
+            finally:
+                os.close(fd)
+
+    def _dense(self):
+        """Returns the stored vectors as float32, de-quantizing if necessary."""
+        np = self._np
+        if self._vectors is None:
+            return None
+        dense = np.asarray(self._vectors, dtype=np.float32)
+        return dense * self._scales[:, None] if self._scales is not None else dense
+
+    def _normalize(self, embeddings):
+        np = self._np
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def _write(self, records: dict, dense):
+        """Writes a new generation, atomically makes it current and deletes unused old ones."""
+        np = self._np
+        generation = f"gen-{time.time_ns()}-{os.getpid()}"
+        # Written under a tmp- name while locked, so no writer's sweep can take it mid-write.
+        writer_fd = self._lock_generation(generation, fcntl.LOCK_SH)
+        directory = os.path.join(self.path, f"tmp-{generation}")
+        os.makedirs(directory, exist_ok=True)
+        if dense is None:
+            dense = np.zeros((0, 0), dtype=np.float32)
+        if self.dtype == "int8":
+            scales = np.abs(dense).max(axis=1) / 127.0 if len(dense) else np.zeros(0, dtype=np.float32)
+            scales = np.where(scales == 0, 1.0, scales).astype(np.float32)
+            np.save(os.path.join(directory, "scales.npy"), scales)
+            np.save(os.path.join(directory, "vectors.npy"), np.round(dense / scales[:, None]).astype(np.int8))
+        else:
+            np.save(os.path.join(directory, "vectors.npy"), dense.astype(self.dtype))
+        with open(os.path.join(directory, "records.json"), 'w', encoding='utf-8') as f:
+            json.dump(records, f)
+        os.rename(directory, os.path.join(self.path, generation))
+
+        tmp_path = os.path.join(self.path, "CURRENT.tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(generation)
+        os.replace(tmp_path, os.path.join(self.path, "CURRENT"))
+        try:
+            self._refresh()
+        finally:
+            os.close(writer_fd)
+        self._delete_old_generations()
+
+    # --- Backend interface ---
+
+    def ids(self) -> set[str]:
+        with self._lock:
+            self._refresh()
+            return set(self._records["ids"])
+
+    @contextmanager
+    def batch(self):
+        """
+        Buffers every add() and delete() made until the block exits, then writes them as
+        one generation. Nothing is written if the block raises. Nested batches join the
+        outermost one.
+        """
+        with self._lock:
+            outermost = self._pending is None
+            if outermost:
+                self._refresh()
+                dense = self._dense()
+                self._pending = {
+                    "records": {key: list(values) for key, values in self._records.items()},
+                    "blocks": [dense] if dense is not None and len(dense) else [],
+                    "changed": False,
+                }
+        if not outermost:
+            yield
+            return
+        try:
+            yield
+            with self._lock:
+                pending = self._pending
+                if pending["changed"]:
+                    self._write(pending["records"], self._stack(pending["blocks"]))
+        finally:
+            with self._lock:
+                self._pending = None
+
+    def _stack(self, blocks: list):
+        if not blocks:
+            return None
+        return blocks[0] if len(blocks) == 1 else self._np.vstack(blocks)
+
+    def add(self, ids: list[str], documents: list[str], embeddings: list, metadatas: list[dict]):
+        with self.batch(), self._lock:
+            pending = self._pending
+            pending["records"]["ids"].extend(ids)
+            pending["records"]["documents"].extend(documents)
+            pending["records"]["metadatas"].extend(metadatas)
+            pending["blocks"].append(self._normalize(embeddings))
+            pending["changed"] = True
+
+    def delete(self, ids: list[str]):
+        np = self._np
+        with self.batch(), self._lock:
+            pending = self._pending
+            doomed = set(ids)
+            keep = [i for i, chunk_id in enumerate(pending["records"]["ids"]) if chunk_id not in doomed]
+            if len(keep) == len(pending["records"]["ids"]):
+                return
+            pending["records"] = {key: [values[i] for i in keep] for key, values in pending["records"].items()}
+            dense = self._stack(pending["blocks"])
+            pending["blocks"] = [dense[np.array(keep, dtype=np.int64)]] if dense is not None else []
+            pending["changed"] = True
+
+    def query(self, embeddings: list, n_results: int) -> list[list[str]]:
+        """Returns the documents of the `n_results` nearest chunks, by cosine similarity, per query."""
+        np = self._np
+        with self._lock:
+            self._refresh()
+            vectors, scales, documents = self._vectors, self._scales, self._records["documents"]
+        queries = self._normalize(embeddings)
+        if vectors is None or not len(vectors) or n_results <= 0:
+            return [[] for _ in queries]
+
+        scores = np.empty((len(queries), len(vectors)), dtype=np.float32)
+        for start in range(0, len(vectors), self.SEARCH_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + self.SEARCH_BLOCK_ROWS], dtype=np.float32)
+            block_scores = queries @ block.T
+            if scales is not None:
+                block_scores *= scales[start:start + self.SEARCH_BLOCK_ROWS]
+            scores[:, start:start + len(block)] = block_scores
+
+        k = min(n_results, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in zip(scores, top):
+            ranked = candidates[np.argsort(-row[candidates])]
+            results.append([documents[i] for i in ranked])
+        return results
+
+    def import_from_chroma(self, chroma_path: str = None, collection_name: str = "dgm_knowledge"):
+        """Copies every chunk (and the indexing manifest) out of an existing Chroma store."""
+        import chromadb
+        chroma_path = chroma_path or settings.CHROMA_DB_PATH
+        collection = chromadb.PersistentClient(path=chroma_path).get_collection(name=collection_name)
+        data = collection.get(include=["embeddings", "documents", "metadatas"])
+        with self._lock:
+            self._refresh()
+            records = {"ids": list(data["ids"]), "documents": list(data["documents"]),
+                       "metadatas": [m or {} for m in data["metadatas"]]}
+            dense = self._normalize(data["embeddings"]) if len(data["ids"]) else None
+            self._write(records, dense)
+        manifest_path = os.path.join(chroma_path, MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            shutil.copyfile(manifest_path, os.path.join(self.path, MANIFEST_NAME))
+        self.logger.info(f"Imported {len(records['ids'])} chunks from {chroma_path} into {self.path}.")
+        return len(records["ids"])
+
+
+def main():
+    """Imports the existing ChromaDB knowledge collection into a NumPy index."""
+    import argparse
+    parser = argparse.ArgumentParser(description="DGM vector index tools.")
+    parser.add_argument('--from-chroma', type=str, default=settings.CHROMA_DB_PATH, help='ChromaDB directory to import.')
+    parser.add_argument('--to', type=str, default=settings.NUMPY_INDEX_PATH, help='NumPy index directory to write.')
+    parser.add_argument('--dtype', type=str, default=settings.NUMPY_INDEX_DTYPE, choices=NumpyVectorBackend.DTYPES,
+                        help='Storage type for the vectors; int8 quantizes them.')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    NumpyVectorBackend(args.to, args.dtype).import_from_chroma(args.from_chroma)
+
+if __name__ == "__main__":
+    main()
@@ -1,72 +1,193 @@
 # dgm_core/verifier.py
 import ast
+import time
 import logging
+from dataclasses import dataclass, field
+from .code_artifact import CodeArtifact
+
+class AnalysisContext:
+    """
+    Scope information maintained by the traversal and shared with every check.
+    `range_len_loops` is the stack of loop variables bound by enclosing
+    'for i in range(len(x))' loops, innermost last.
+    """
+    def __init__(self):
+        self.range_len_loops: list[str] = []
+
+    def is_range_len_variable(self, name: str) -> bool:
+        return name in self.range_len_loops
+
+
+class AnalysisCheck:
+    """
+    A single static check run by the Verifier's single-pass engine.
+    Subclasses list the node types they inspect in `node_types` and implement visit();
+    the engine calls visit() for each such node with the current AnalysisContext.
+    Returns a score from 0.0 (high risk) to 1.0 (low risk) via `score`.
+    """
+    name = "check"
+    node_types: tuple = ()
+
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+        self.score = 1.0
+
+    def visit(self, node: ast.AST, context: AnalysisContext):
+        raise NotImplementedError
+
+
+class IndexOffsetCheck(AnalysisCheck):
+    """
+    Heuristically checks for potential IndexError: inside a loop over range(len(x)),
+    a subscript of the form x[i + offset] may run past the end of the sequence.
+    """
+    name = "index_error"
+    node_types = (ast.Subscript,)
+
+    def visit(self, node: ast.Subscript, context: AnalysisContext):
+        if self.score < 1.0:
+            return # Found one issue, no need to check further
+        index = node.slice
+        if (isinstance(index, ast.BinOp) and
+            isinstance(index.op, ast.Add) and
+            isinstance(index.left, ast.Name) and
+            context.is_range_len_variable(index.left.id)):
+            self.logger.warning("Verifier Warning: Potential IndexError due to index offset in loop.")
+            self.score = 0.5 # Penalize potential off-by-one error
+
+
+def _range_len_target(node: ast.For) -> str | None:
+    """Returns the loop variable of a 'for i in range(len(x))' loop, or None for other loops."""
+    call = node.iter
+    if (isinstance(call, ast.Call) and isinstance(call.func, ast.Name) and call.func.id == 'range'
+            and call.args and isinstance(call.args[0], ast.Call)):
+        len_call = call.args[0]
+        if isinstance(len_call.func, ast.Name) and len_call.func.id == 'len' and isinstance(node.target, ast.Name):
+            return node.target.id
+    return None
+
+
+class _ExitScope:
+    """Stack marker that restores the enclosing loop scope once a node's children are done."""
+    __slots__ = ("range_len_loops",)
+
+    def __init__(self, range_len_loops: list[str]):
+        self.range_len_loops = range_len_loops
+
+
+class _SinglePassAnalyzer:
+    """
+    Walks a tree once, dispatching each node to the checks registered for its type.
+    The walk uses an explicit stack, so deeply nested generated code (e.g. a long chain
+    of binary operations) cannot exhaust the interpreter's recursion limit.
+    """
+    _FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)
+
+    def __init__(self, checks: list[AnalysisCheck]):
+        self.context = AnalysisContext()
+        self.handlers: dict[type, list[AnalysisCheck]] = {}
+        for check in checks:
+            for node_type in check.node_types:
+                self.handlers.setdefault(node_type, []).append(check)
+        self.timings = {check.name: 0.0 for check in checks}
+
+    def run(self, tree: ast.AST):
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, _ExitScope):
+                self.context.range_len_loops = node.range_len_loops
+                continue
+            self._visit(node)
+
+            loops = self.context.range_len_loops
+            if isinstance(node, ast.For):
+                target = _range_len_target(node)
+                if target is not None:
+                    stack.append(_ExitScope(loops))
+                    self.context.range_len_loops = loops + [target]
+            elif isinstance(node, self._FUNCTION_NODES) and loops:
+                # A nested function runs later, after the enclosing loop variable has moved on.
+                stack.append(_ExitScope(loops))
+                self.context.range_len_loops = []
+            # Reversed, so children are visited in source order.
+            stack.extend(reversed(list(ast.iter_child_nodes(node))))
+
+    def _visit(self, node: ast.AST):
+        for check in self.handlers.get(type(node), ()):
+            start = time.perf_counter()
+            check.visit(node, self.context)
+            self.timings[check.name] += time.perf_counter() - start
+
+
+@dataclass
+class VerificationReport:
+    """Per-check scores and timings (in seconds) from one Verifier run."""
+    verifiability_score: float
+    check_scores: dict[str, float] = field(default_factory=dict)
+    check_timings: dict[str, float] = field(default_factory=dict)
+    parse_time: float = 0.0
+    traversal_time: float = 0.0
+
 
 class Verifier:
     """
     Analyzes code for formal properties and potential logical errors.
     In DGM v9.0, this is upgraded to perform Abstract Syntax Tree (AST) analysis.
+    All registered checks share a single traversal of the tree, so the cost of
+    analysis grows with code size rather than with code size times check count.
     """
+    DEFAULT_CHECKS = (IndexOffsetCheck,)
 
     def __init__(self):
         logging.basicConfig(level=logging.INFO, format='%(message)s')
         self.logger = logging.getLogger(__name__)
+        self.check_types: list[type[AnalysisCheck]] = list(self.DEFAULT_CHECKS)
 
-    def _check_for_potential_index_errors(self, tree: ast.AST) -> float:
+    def register_check(self, check_type: type[AnalysisCheck]):
+        """Adds a check to every subsequent analysis."""
+        self.check_types.append(check_type)
+
+    def analyze_report(self, code: str | CodeArtifact) -> VerificationReport:
         """
-        Heuristically checks for potential IndexError by analyzing loops and subscripts.
-        This is a simple verifier; more advanced analysis is possible.
-        
-        Returns a score from 0.0 (high risk) to 1.0 (low risk).
-        A very basic check: if a loop over range(len(x)) uses x[i+1], flag it.
+        Runs every registered check over the code in one traversal. An artifact that was
+        already parsed is not parsed again. The overall score is the lowest check score.
         """
-        score = 1.0
-        for node in ast.walk(tree):
-            # Check for loops like 'for i in range(len(some_list))'
-            if isinstance(node, ast.For) and isinstance(node.iter, ast.Call):
-                call = node.iter
-                if isinstance(call.func, ast.Name) and call.func.id == 'range':
-                    if call.args and isinstance(call.args[0], ast.Call):
-                        len_call = call.args[0]
-                        if isinstance(len_call.func, ast.Name) and len_call.func.id == 'len':
-                            # We have a 'for i in range(len(list_name))' loop
-                            # Now, look for risky subscripts inside this loop
-                            for sub_node in ast.walk(node):
-                                if isinstance(sub_node, ast.Subscript):
-                                    # Check if the subscript index is 'i + constant'
-                                    if (isinstance(sub_node.slice, ast.BinOp) and
-                                        isinstance(sub_node.slice.op, ast.Add) and
-                                        isinstance(sub_node.slice.left, ast.Name) and
-                                        sub_node.slice.left.id == node.target.id):
-                                        self.logger.warning("Verifier Warning: Potential IndexError due to index offset in loop.")
-                                        score = 0.5 # Penalize potential off-by-one error
-                                        break # Found one issue, no need to check further in this loop
-            if score < 1.0:
-                break
-        return score
-
-
-    def analyze(self, code: str) -> dict[str, float]:
+        start = time.perf_counter()
+        tree = CodeArtifact.of(code).tree
+        parsed = time.perf_counter()
+
+        checks = [check_type(self.logger) for check_type in self.check_types]
+        analyzer = _SinglePassAnalyzer(checks)
+        analyzer.run(tree)
+
+        scores = {check.name: check.score for check in checks}
+        return VerificationReport(
+            verifiability_score=min(scores.values(), default=1.0),
+            check_scores=scores,
+            check_timings=analyzer.timings,
+            parse_time=parsed - start,
+            traversal_time=time.perf_counter() - parsed,
+        )
+
+    def analyze(self, code: str | CodeArtifact) -> dict[str, float]:
         """
         Performs static analysis on the given code.
-        
+
         Args:
-            code (str): The source code to analyze.
+            code (str | CodeArtifact): The source code, or its shared parsed artifact.
 
         Returns:
-            dict: A dictionary of verification scores.
-                  For now, contains 'verifiability_score'.
+            dict: A dictionary of verification scores: 'verifiability_score' plus
+                  one '<check>_score' entry per registered check.
         """
         results = {"verifiability_score": 1.0}
 
         try:
-            tree = ast.parse(code)
-            # Add more analysis functions here as the verifier grows
-            index_error_score = self._check_for_potential_index_errors(tree)
-
-            # Combine scores (for now, we only have one)
-            final_score = index_error_score
-            results["verifiability_score"] = final_score
+            report = self.analyze_report(code)
+            results["verifiability_score"] = report.verifiability_score
+            for name, score in report.check_scores.items():
+                results[f"{name}_score"] = score
 
         except SyntaxError as e:
             self.logger.warning(f"Verifier: SyntaxError - {e}. Returning lowest score.")
@@ -1,36 +1,120 @@
 # dgm_evaluator.py
 import json
+import time
 import logging
 import sys
 import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, asdict
 from typing import Dict, Optional, Tuple
 
 from dgm_core.dgm_config import DGMConfig
-from dgm_core.dgm_genome import DGMGenome
-from dgm_core.evolutionary_solver import EvolutionarySolver, Solution
+from dgm_core.dgm_genome import Genome
+from dgm_core.evolutionary_solver import EvolutionarySolver
+from dgm_lineage_archive import load_current_genome
 from config import settings
+from utils.tools import extract_code, build_test_code, evaluate_fitness
 
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger(__name__)
 
+@dataclass
+class TaskResult:
+    """The outcome of one benchmark task."""
+    name: str
+    solved: bool = False
+    generations: int = 0
+    correctness: float = 0.0
+    latency: float = 0.0
+    timed_out: bool = False
+    error: Optional[str] = None
+
 class DGMEvaluator:
     """
     Encapsulates the logic for running the benchmark suite on a DGM instance.
     Accepts command-line arguments to specify the configuration to evaluate.
     """
-    def __init__(self, solver_model: str = None):
+    def __init__(self, solver_model: str = None, genome: Genome = None):
         try:
             self.config = DGMConfig()
-            self.genome = DGMGenome(self.config, solver_model_override=solver_model)
-            self.solver = EvolutionarySolver(self.genome)
+            self.genome = genome or load_current_genome()
+            if solver_model:
+                self.genome.solver_policy['easy_model'] = solver_model
+                self.genome.solver_policy['hard_model'] = solver_model
+            self.solver = EvolutionarySolver(self.genome, settings.OLLAMA_HOST_URL)
         except Exception as e:
             logger.error(f"Failed to initialize DGM components: {e}")
             sys.exit(1)
+        self.last_results: list[TaskResult] = []
+
+    def _evaluate_task(self, task: dict, deadline: float = None) -> TaskResult:
+        """
+        Solves one task and checks the solution against the task's test cases. The solver's
+        Ollama requests are bounded by `deadline`, a time.monotonic() value.
+        """
+        result = TaskResult(name=task['name'])
+        start = time.monotonic()
+        try:
+            logger.info(f">>> Evaluating Task: {task['description'][:70]}...")
+            solution_code = extract_code(self.solver.solve(task['description'], deadline))
+            test_code = build_test_code(task['name'], task['test_cases'])
+            result.correctness = evaluate_fitness(solution_code, test_code)[0]
+            result.solved = result.correctness >= 1.0
+            result.generations = 1
+        except Exception as e:
+            result.error = str(e)
+        result.latency = time.monotonic() - start
+        return result
 
-    def run_benchmark_suite(self) -> float:
+    def _run_tasks(self, benchmarks: list[dict], workers: int, task_timeout: float, partial: bool) -> list[TaskResult]:
+        """
+        Runs tasks concurrently. A task that outlives its deadline is recorded as timed out
+        and abandoned; its Ollama requests are bounded by the same deadline, so it releases
+        its Ollama slot and thread soon after. Unless `partial` is set, the first failure
+        cancels the remaining tasks.
+        """
+        results = {}
+        started = {}
+
+        def run(index, task):
+            started[index] = time.monotonic()
+            return self._evaluate_task(task, started[index] + task_timeout)
+
+        executor = ThreadPoolExecutor(max_workers=workers)
+        pending = {executor.submit(run, i, task): i for i, task in enumerate(benchmarks)}
+        aborted = False
+        try:
+            while pending and not aborted:
+                done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    results[index] = future.result()
+                now = time.monotonic()
+                for future, index in list(pending.items()):
+                    if index in started and now - started[index] > task_timeout:
+                        pending.pop(future)
+                        results[index] = TaskResult(name=benchmarks[index]['name'], latency=now - started[index],
+                                                    timed_out=True, error="deadline exceeded")
+                for index in sorted(results):
+                    if not results[index].solved and not partial:
+                        aborted = True
+                        break
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        for future, index in pending.items():
+            results.setdefault(index, TaskResult(name=benchmarks[index]['name'], error="cancelled"))
+        return [results[i] for i in sorted(results)]
+
+    def run_benchmark_suite(self, workers: int = None, task_timeout: float = None, partial: bool = False) -> float:
         """
         Runs the full benchmark suite and returns the average generations per task.
+        Tasks run on `workers` threads, each under a `task_timeout` deadline. Per-task
+        results are kept in `last_results`; in partial mode failed tasks are recorded
+        instead of aborting the evaluation.
         """
+        workers = workers or settings.EVALUATOR_WORKERS
+        task_timeout = task_timeout or settings.EVALUATOR_TASK_TIMEOUT
         try:
             with open(settings.BENCHMARK_FILE, 'r') as f:
                 benchmarks = json.load(f)
@@ -38,21 +122,23 @@ class DGMEvaluator:
             logger.error(f"Benchmark suite file not found or is invalid: {settings.BENCHMARK_FILE}")
             return float('inf')
 
+        self.last_results = self._run_tasks(benchmarks, workers, task_timeout, partial)
+
         total_generations = 0
         successful_tasks = 0
-        for task in benchmarks:
-            logger.info(f">>> Evaluating Task: {task['description'][:70]}...")
-            best_solution, generations = self.solver.solve(task)
-            if best_solution:
-                total_generations += generations
+        for result in self.last_results:
+            if result.solved:
+                total_generations += result.generations
                 successful_tasks += 1
             else:
-                logger.warning(f"  Failed to solve task: {task['name']}\n")
-                return float('inf')
+                reason = f" ({result.error})" if result.error else ""
+                logger.warning(f"  Failed to solve task: {result.name}{reason}\n")
+                if not partial:
+                    return float('inf')
 
         if successful_tasks == 0:
             return float('inf')
-        
+
         return total_generations / successful_tasks
 
 def main():
@@ -62,12 +148,18 @@ def main():
     """
     parser = argparse.ArgumentParser(description="DGM Evaluation Script.")
     parser.add_argument('--solver-model', type=str, help='The solver model to use for this evaluation run.')
+    parser.add_argument('--workers', type=int, default=None, help='Number of benchmark tasks to run concurrently.')
+    parser.add_argument('--task-timeout', type=float, default=None, help='Deadline in seconds for each task.')
+    parser.add_argument('--partial', action='store_true', help='Record failed tasks instead of aborting on the first one.')
     args = parser.parse_args()
 
     logger.info("--- DGM Evaluator Initialized ---")
     evaluator = DGMEvaluator(solver_model=args.solver_model)
-    result = evaluator.run_benchmark_suite()
-    
+    result = evaluator.run_benchmark_suite(workers=args.workers, task_timeout=args.task_timeout, partial=args.partial)
+
+    for task_result in evaluator.last_results:
+        print(f"TASK_RESULT:{json.dumps(asdict(task_result))}")
+
     if result == float('inf'):
         print(f"BENCHMARK_RESULT:{result}")
         sys.exit(1)
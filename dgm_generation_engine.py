@@ -0,0 +1,109 @@
+# dgm_generation_engine.py
+# Runs population-based generations: parallel proposal, parallel evaluation,
+# tournament selection and elitism.
+
+import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+from dgm_core.dgm_genome import Genome
+from dgm_core.self_mutator import SelfMutator
+from dgm_core.model_residency import get_model_residency
+from dgm_core.model_cost import get_model_cost_store
+from utils.tracing import get_tracer
+from dgm_mutant_manager import MutantManager
+from config import settings
+
+class GenerationEngine:
+    """
+    Advances a population of genomes by one generation. Parents are chosen by tournament,
+    their mutants are proposed and evaluated concurrently, and the best genomes of the
+    previous generation survive unchanged through elitism.
+    """
+    def __init__(self, mutant_manager: MutantManager, ollama_base_url: str,
+                 population_size: int = None, tournament_size: int = None,
+                 elitism_count: int = None, workers: int = None, next_genome_id: int = 0):
+        self.mutant_manager = mutant_manager
+        self.ollama_base_url = ollama_base_url
+        self.population_size = population_size or settings.POPULATION_SIZE
+        self.tournament_size = tournament_size or settings.TOURNAMENT_SIZE
+        self.elitism_count = elitism_count if elitism_count is not None else settings.ELITISM_COUNT
+        self.workers = workers or settings.GENERATION_WORKERS
+        # The most recent offspring, survivors or not, and their mutation info keyed by genome_id.
+        self.offspring = []
+        self.mutation_infos = {}
+        # Genome IDs are never reused, so callers with an archive start numbering past it.
+        self._next_genome_id = next_genome_id
+        self.residency = get_model_residency(ollama_base_url)
+
+    def _tournament_select(self, population: list[Genome]) -> Genome:
+        contenders = random.sample(population, min(self.tournament_size, len(population)))
+        return max(contenders, key=lambda g: g.fitness)
+
+    def _propose(self, parent: Genome) -> tuple[Genome, dict]:
+        with get_tracer().span("proposal", parent_id=parent.genome_id, model=parent.mutator_model) as span:
+            mutant_genome, mutation_info = SelfMutator(parent, self.ollama_base_url).propose_mutation()
+            span.set(mutation_type=mutation_info['type'])
+            return mutant_genome, mutation_info
+
+    def _evaluate(self, proposal: tuple[Genome, dict]) -> float:
+        mutant_genome, mutation_info = proposal
+        try:
+            return self.mutant_manager.evaluate(mutant_genome, mutation_info)
+        except Exception as e:
+            print(f"[GENERATION ENGINE] Evaluation of mutant #{mutant_genome.genome_id} failed: {e}")
+            return 0.0
+
+    def run_generation(self, population: list[Genome]) -> list[Genome]:
+        """Returns the next generation's population, sorted by descending fitness."""
+        ranked = sorted(population, key=lambda g: g.fitness, reverse=True)
+        elites = ranked[:self.elitism_count]
+        offspring_count = max(1, self.population_size - len(elites))
+        parents = [self._tournament_select(ranked) for _ in range(offspring_count)]
+
+        self.residency.preload(self.residency.models_for(parents, solver=False))
+        print(f"[GENERATION ENGINE] Proposing {offspring_count} mutants with {self.workers} workers...")
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            proposals = list(pool.map(get_tracer().propagate(self._propose), parents))
+
+        # Mutators derive IDs from their parent, so siblings would collide; renumber them.
+        self._next_genome_id = max(self._next_genome_id, max(g.genome_id for g in population) + 1)
+        for mutant_genome, _ in proposals:
+            mutant_genome.genome_id = self._next_genome_id
+            self._next_genome_id += 1
+
+        mutants = [mutant_genome for mutant_genome, _ in proposals]
+        self.residency.preload(self.residency.models_for(mutants, mutator=False))
+        # Mutants that route to the same models are submitted together, so their requests
+        # share loaded models instead of forcing Ollama to swap between them.
+        order = sorted(range(len(proposals)), key=lambda i: self.residency.models_for([mutants[i]], mutator=False))
+        print(f"[GENERATION ENGINE] Evaluating {len(proposals)} mutants with {self.workers} workers...")
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            ordered_fitnesses = list(pool.map(get_tracer().propagate(self._evaluate), [proposals[i] for i in order]))
+        fitnesses = [0.0] * len(proposals)
+        for i, fitness in zip(order, ordered_fitnesses):
+            fitnesses[i] = fitness
+        print(f"[MODEL RESIDENCY] {self.residency.report()}")
+        print(f"[MODEL COST] {get_model_cost_store().report()}")
+
+        self.mutation_infos = {}
+        offspring = []
+        for (mutant_genome, mutation_info), fitness in zip(proposals, fitnesses):
+            mutant_genome.fitness = fitness
+            self.mutation_infos[mutant_genome.genome_id] = mutation_info
+            offspring.append(mutant_genome)
+            print(f"Mutant genome #{mutant_genome.genome_id} (parent #{mutant_genome.parent_id}) achieved fitness: {fitness:.4f}")
+
+        self.offspring = offspring
+        return sorted(elites + offspring, key=lambda g: g.fitness, reverse=True)[:self.population_size]
+
+
+def load_population(filepath: str) -> list[Genome]:
+    """
+    Reads a population JSON file (a list of genome objects), used to seed an empty lineage
+    archive, or returns an empty list.
+    """
+    try:
+        with open(filepath, 'r') as f:
+            return [Genome(**data) for data in json.load(f)]
+    except (FileNotFoundError, json.JSONDecodeError, TypeError):
+        return []
@@ -0,0 +1,210 @@
+# dgm_lineage_archive.py
+# An indexed, append-only archive of every genome the DGM has evaluated.
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from dataclasses import asdict, fields
+from dgm_core.dgm_genome import Genome
+from config import settings
+
+_GENOME_FIELDS = {f.name for f in fields(Genome)}
+
+
+class LineageArchive:
+    """
+    Stores every genome with its parent, generation, fitness, mutation info and timestamps
+    in SQLite, indexed on fitness, generation and parent so that top-k, children and
+    ancestor queries stay logarithmic in the archive size. Genomes are never deleted; the
+    current population and the adopted genome are kept as pointers into the archive.
+    Every write is a single transaction, so a crash never leaves a half-written record.
+    """
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or settings.LINEAGE_ARCHIVE_PATH
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS genomes (
+                genome_id INTEGER PRIMARY KEY,
+                parent_id INTEGER,
+                generation INTEGER NOT NULL,
+                fitness REAL NOT NULL,
+                genome TEXT NOT NULL,
+                mutation_info TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_genomes_fitness ON genomes (fitness DESC);
+            CREATE INDEX IF NOT EXISTS idx_genomes_generation ON genomes (generation, fitness DESC);
+            CREATE INDEX IF NOT EXISTS idx_genomes_parent ON genomes (parent_id);
+            CREATE TABLE IF NOT EXISTS population (
+                rank INTEGER PRIMARY KEY,
+                genome_id INTEGER NOT NULL REFERENCES genomes (genome_id)
+            );
+            CREATE TABLE IF NOT EXISTS archive_state (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+
+    # --- Writes ---
+
+    def _upsert(self, genome: Genome, mutation_info: dict | None, now: float):
+        # Re-recording a genome (e.g. an elite re-ranked in a later generation) refreshes its
+        # fitness but keeps its original creation time and mutation info.
+        self._conn.execute(
+            "INSERT INTO genomes (genome_id, parent_id, generation, fitness, genome, mutation_info, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (genome_id) DO UPDATE SET fitness = excluded.fitness, genome = excluded.genome, "
+            "mutation_info = COALESCE(genomes.mutation_info, excluded.mutation_info), updated_at = excluded.updated_at",
+            (genome.genome_id, genome.parent_id, genome.generation, genome.fitness,
+             json.dumps(asdict(genome)), json.dumps(mutation_info) if mutation_info else None, now, now)
+        )
+
+    def record(self, genome: Genome, mutation_info: dict = None):
+        """Adds a genome to the archive, or refreshes the fitness of one already recorded."""
+        with self._lock, self._conn:
+            self._upsert(genome, mutation_info, time.time())
+
+    def record_generation(self, population: list[Genome], mutation_infos: dict = None,
+                          offspring: list[Genome] = None):
+        """
+        Records a new generation and makes `population` the current population, in one
+        transaction. `offspring` lists every mutant evaluated this generation, including
+        those that did not survive selection; `mutation_infos` maps genome_id to the
+        mutation that produced it.
+        """
+        mutation_infos = mutation_infos or {}
+        now = time.time()
+        with self._lock, self._conn:
+            for genome in (offspring or []) + population:
+                self._upsert(genome, mutation_infos.get(genome.genome_id), now)
+            self._conn.execute("DELETE FROM population")
+            self._conn.executemany(
+                "INSERT INTO population (rank, genome_id) VALUES (?, ?)",
+                [(rank, genome.genome_id) for rank, genome in enumerate(population)]
+            )
+
+    def set_current(self, genome: Genome, mutation_info: dict = None):
+        """Records `genome` if needed and marks it as the adopted (current parent) genome."""
+        with self._lock, self._conn:
+            self._upsert(genome, mutation_info, time.time())
+            self._conn.execute(
+                "INSERT OR REPLACE INTO archive_state (name, value) VALUES ('current_genome_id', ?)",
+                (str(genome.genome_id),)
+            )
+
+    # --- Reads ---
+
+    @staticmethod
+    def _to_genome(row) -> Genome:
+        data = json.loads(row[0])
+        return Genome(**{key: value for key, value in data.items() if key in _GENOME_FIELDS})
+
+    def _query(self, sql: str, params=()) -> list[Genome]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._to_genome(row) for row in rows]
+
+    def get(self, genome_id: int) -> Genome | None:
+        genomes = self._query("SELECT genome FROM genomes WHERE genome_id = ?", (genome_id,))
+        return genomes[0] if genomes else None
+
+    def mutation_info(self, genome_id: int) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT mutation_info FROM genomes WHERE genome_id = ?", (genome_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def current(self) -> Genome | None:
+        """Returns the adopted genome, or None if nothing has been adopted yet."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM archive_state WHERE name = 'current_genome_id'").fetchone()
+        return self.get(int(row[0])) if row else None
+
+    def population(self) -> list[Genome]:
+        """Returns the current population in rank order."""
+        return self._query(
+            "SELECT g.genome FROM population p JOIN genomes g ON g.genome_id = p.genome_id ORDER BY p.rank"
+        )
+
+    def top_k(self, k: int, generation: int = None) -> list[Genome]:
+        """Returns the k fittest genomes, overall or within one generation."""
+        if generation is None:
+            return self._query("SELECT genome FROM genomes ORDER BY fitness DESC LIMIT ?", (k,))
+        return self._query(
+            "SELECT genome FROM genomes WHERE generation = ? ORDER BY fitness DESC LIMIT ?", (generation, k)
+        )
+
+    def children(self, genome_id: int) -> list[Genome]:
+        return self._query(
+            "SELECT genome FROM genomes WHERE parent_id = ? AND genome_id != ? ORDER BY genome_id",
+            (genome_id, genome_id)
+        )
+
+    def ancestors(self, genome_id: int) -> list[Genome]:
+        """Returns the chain of parents of a genome, nearest first, ending at the root."""
+        return self._query("""
+            WITH RECURSIVE lineage (genome_id, parent_id, depth) AS (
+                SELECT genome_id, parent_id, 0 FROM genomes WHERE genome_id = ?
+                UNION ALL
+                SELECT g.genome_id, g.parent_id, lineage.depth + 1
+                FROM genomes g JOIN lineage ON g.genome_id = lineage.parent_id
+                WHERE lineage.parent_id != lineage.genome_id AND lineage.depth < 100000
+            )
+            SELECT g.genome FROM lineage JOIN genomes g ON g.genome_id = lineage.genome_id
+            WHERE lineage.depth > 0 ORDER BY lineage.depth
+        """, (genome_id,))
+
+    def max_genome_id(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(genome_id), 0) FROM genomes").fetchone()[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, generations, best = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(MAX(generation), 0), MAX(fitness) FROM genomes"
+            ).fetchone()
+        return {"genomes": count, "generations": generations, "best_fitness": best}
+
+    # --- Migration ---
+
+    def import_legacy(self, genome_filepath: str = None, population_filepath: str = None) -> int:
+        """
+        Imports a dgm_genome.json (as the adopted genome) and a dgm_population.json (as the
+        current population) written by earlier versions. Returns the number of genomes imported.
+        """
+        imported = 0
+        if population_filepath and os.path.exists(population_filepath):
+            from dgm_generation_engine import load_population
+            population = load_population(population_filepath)
+            if population:
+                self.record_generation(population)
+                imported += len(population)
+        if genome_filepath and os.path.exists(genome_filepath):
+            self.set_current(Genome.from_json(genome_filepath))
+            imported += 1
+        return imported
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def load_current_genome(archive_path: str = None, legacy_filepath: str = 'dgm_genome.json') -> Genome:
+    """
+    Returns the adopted genome from the lineage archive, falling back to a legacy genome
+    file (or a default genome) when the archive has none.
+    """
+    if os.path.exists(archive_path or settings.LINEAGE_ARCHIVE_PATH):
+        archive = LineageArchive(archive_path)
+        try:
+            genome = archive.current()
+        finally:
+            archive.close()
+        if genome is not None:
+            return genome
+    return Genome.from_json(legacy_filepath)
@@ -2,18 +2,44 @@
 # Manages the setup and evaluation of DGM mutants.
 
 import os
-import shutil
+import sys
+import json
+import uuid
+import hashlib
 import subprocess
-import random
+from dataclasses import asdict
+from concurrent.futures import ThreadPoolExecutor
 from dgm_core.dgm_genome import Genome
+from dgm_core.evolutionary_solver import EvolutionarySolver
+from dgm_core.fitness import Fitness
+from dgm_core.fitness_cache import FitnessCache
+from config import settings
+from utils.tools import FITNESS_COMPONENTS, build_test_code, score_fitness, extract_code
+from utils.resource_monitor import get_admission_controller
+from utils.tracing import get_tracer
+from utils.venv_cache import VenvCache, VenvLease, requirement_name, normalize_requirement
+
+# Settings a child evaluation in a mutant environment inherits from the parent process, so
+# that it talks to the same Ollama server and shares the same caches.
+_INHERITED_SETTINGS = ("OLLAMA_HOST_URL", "BENCHMARK_FILE", "TASK_RESULT_CACHE_PATH", "SIGNATURE_INDEX_PATH",
+                       "LLM_CACHE_PATH", "COMPLEXITY_ESTIMATOR_PATH", "MODEL_COST_STORE_PATH", "TRACE_DIR")
+_FITNESS_MARKER = "__dgm_fitness__"
 
 class MutantManager:
     """
-    Handles the creation of temporary environments for mutants and runs their evaluation.
+    Provides cached environments for mutants and runs their evaluation.
     """
-    def __init__(self, base_project_dir='.'):
+    def __init__(self, base_project_dir='.', signature_index=None, task_cache: FitnessCache = None,
+                 venv_cache: VenvCache = None, environment: str = None):
         self.base_project_dir = base_project_dir
-        self.temp_mutant_dir = os.path.join(self.base_project_dir, 'mutant_workspace')
+        # Key of the mutant environment this process evaluates in; None for the host environment.
+        self.environment = environment
+        # Shared with the orchestrator so behaviorally identical solutions are scored once.
+        self.signature_index = signature_index
+        self._task_cache = task_cache
+        self._venv_cache = venv_cache
+        self._benchmarks = None
+        self.fitness = None
 
     def evaluate(self, mutant_genome: Genome, mutation_info: dict) -> float:
         """
@@ -22,68 +48,225 @@ class MutantManager:
         print(f"\n[MUTANT MANAGER] Evaluating mutant #{mutant_genome.genome_id}...")
         print(f"[MUTANT MANAGER] Mutation Type: {mutation_info['type']}")
 
-        if mutation_info['type'] == 'ENVIRONMENT_MUTATION':
-            return self._evaluate_in_temp_env(mutant_genome, mutation_info)
-        else: # GENOMIC_MUTATION
-            return self._evaluate_in_place(mutant_genome)
+        with get_tracer().span("evaluation", genome_id=mutant_genome.genome_id,
+                               mutation_type=mutation_info['type']) as span:
+            # Waits while the host (shared with Ollama) is over its CPU, memory or GPU budget.
+            with get_admission_controller().admit("evaluation"):
+                if mutation_info['type'] == 'ENVIRONMENT_MUTATION':
+                    fitness = self._evaluate_in_temp_env(mutant_genome, mutation_info)
+                else: # GENOMIC_MUTATION
+                    fitness = self._evaluate_in_place(mutant_genome)
+            span.set(fitness=fitness)
+            return fitness
+
+    # --- In-place evaluation ---
+
+    @property
+    def task_cache(self) -> FitnessCache:
+        """Per-task evaluation results, opened on first use."""
+        if self._task_cache is None:
+            self._task_cache = FitnessCache(settings.TASK_RESULT_CACHE_PATH)
+        return self._task_cache
+
+    def _load_benchmarks(self) -> list[dict]:
+        if self._benchmarks is None:
+            with open(settings.BENCHMARK_FILE, 'r') as f:
+                self._benchmarks = json.load(f)
+        return self._benchmarks
+
+    @staticmethod
+    def _task_key(model: str, prompt: str, task: dict, environment: str = None) -> str:
+        """
+        The parts of a genome that affect one task's result: the model it routes to and the
+        prompt that model is given, the environment the solution runs in, plus the task's
+        own tests.
+        """
+        spec = {"model": model, "prompt": prompt, "name": task['name'], "test_cases": task['test_cases']}
+        if environment is not None:
+            spec["environment"] = environment
+        return hashlib.sha256(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _score_task_solution(self, solution_code: str, test_code: str) -> tuple[tuple[float, float, float, float], bool]:
+        """Returns the solution's fitness components and whether the sandbox actually ran its tests."""
+        return score_fitness(solution_code, test_code, self.signature_index)
+
+    def _evaluate_task(self, solver: EvolutionarySolver, task: dict) -> tuple[float, bool]:
+        """
+        Routes and solves one benchmark task, returning its weighted fitness and whether the
+        result came from the memo. Only a cache miss calls the solving model; its outcome is
+        fed back to the complexity estimator.
+        """
+        with get_tracer().span("task", task=task['name']) as span:
+            return self._run_task(solver, task, span)
+
+    def _run_task(self, solver: EvolutionarySolver, task: dict, span) -> tuple[float, bool]:
+        description = task['description']
+        complexity, model, rating_model = solver.route(description)
+        span.set(model=model, complexity=complexity)
+        # Every model the genome called for this task is charged, not just the solver.
+        models = [model] if rating_model is None else [rating_model, model]
+        key = self._task_key(model, solver.solve_prompt(description), task, self.environment)
+        scores = self.task_cache.get(key)
+        span.set(memoized=scores is not None)
+        if scores is not None:
+            return self._combine(scores, models), True
+
+        solution = solver.generate_solution(model, description)
+        if solution is None:
+            # A transport failure says nothing about the genome, so it is not memoized.
+            return 0.0, False
+        test_code = build_test_code(task['name'], task['test_cases'])
+        components, conclusive = self._score_task_solution(extract_code(solution), test_code)
+        scores = dict(zip(FITNESS_COMPONENTS, components))
+        if not conclusive:
+            # Neither is a sandbox failure or timeout: it counts for this run only, and is
+            # not memoized or fed back to routing.
+            return self._combine(scores, models), False
+        self.task_cache.put(key, scores)
+        solver.complexity_estimator.record_routing_outcome(
+            description, complexity, solver.complexity_threshold, scores["correctness"] >= 1.0
+        )
+        return self._combine(scores, models), False
+
+    def _combine(self, scores: dict, models: list[str]) -> float:
+        # Model cost is not memoized: a reused task is charged at the models' current measured cost.
+        return self.fitness.combine({**scores, "model_cost": self.fitness.calculate_model_cost(*models)})
 
     def _evaluate_in_place(self, genome: Genome) -> float:
-        """Simulates evaluation for a simple genomic mutation."""
+        """
+        Runs the benchmark suite with the genome's solver policy and returns its mean task
+        fitness. Tasks whose routed model and prompt were evaluated before are served from
+        the memo, so a mutant that moves only the routing threshold re-runs just the tasks
+        whose routing flipped.
+        """
         print("[MUTANT MANAGER] Evaluating genome change in current environment.")
-        return round(random.uniform(0.1, 1.0), 4)
+        try:
+            benchmarks = self._load_benchmarks()
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"[MUTANT MANAGER] Benchmark suite unavailable: {e}")
+            return 0.0
+        if not benchmarks:
+            return 0.0
+
+        if self.fitness is None:
+            self.fitness = Fitness()
+        solver = EvolutionarySolver(genome, settings.OLLAMA_HOST_URL)
+        with ThreadPoolExecutor(max_workers=settings.EVALUATOR_WORKERS) as executor:
+            results = list(executor.map(get_tracer().propagate(lambda task: self._evaluate_task(solver, task)), benchmarks))
+
+        memoized = sum(1 for _, hit in results if hit)
+        fitness = round(sum(score for score, _ in results) / len(results), 4)
+        print(f"[MUTANT MANAGER] Benchmark fitness {fitness} "
+              f"({memoized}/{len(results)} tasks reused from earlier evaluations).")
+        return fitness
+
+    # --- Environment mutations ---
+
+    def _base_requirements(self) -> list[str]:
+        base_req_path = os.path.join(self.base_project_dir, 'requirements.txt')
+        if not os.path.exists(base_req_path):
+            return []
+        with open(base_req_path, 'r') as f:
+            return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+    @property
+    def venv_cache(self) -> VenvCache:
+        """Environments layered over the project's requirements, opened on first use."""
+        if self._venv_cache is None:
+            self._venv_cache = VenvCache(base_requirements=self._base_requirements())
+        return self._venv_cache
 
     def _evaluate_in_temp_env(self, genome: Genome, mutation_info: dict) -> float:
         """
-        Creates a temporary environment, applies environment mutation, and evaluates.
+        Leases a cached environment with the mutant's requirements, checks that the new
+        library is installed in it, and evaluates the genome with the environment's
+        interpreter while holding the lease. Environments are keyed on the resolved
+        requirements, so a library that was tried before reuses its environment instead
+        of installing again.
         """
-        if os.path.exists(self.temp_mutant_dir):
-            shutil.rmtree(self.temp_mutant_dir)
-        os.makedirs(self.temp_mutant_dir)
-        print(f"[MUTANT MANAGER] Created temporary directory: {self.temp_mutant_dir}")
-
+        print(f"[MUTANT MANAGER] Applying environment mutation: {mutation_info['details']}")
         try:
-            # 1. Handle requirements.txt modification
-            print(f"[MUTANT MANAGER] Applying environment mutation: {mutation_info['details']}")
-            self._create_mutant_requirements(mutation_info)
-
-            # 2. Simulate installing dependencies in a virtual environment
-            print("[MUTANT MANAGER] Simulating pip install in mutant's virtual environment...")
-            print("SIMULATION: Dependencies installed successfully.")
-            
-            # 3. Simulate running a benchmark in the new environment
-            print("[MUTANT MANAGER] Simulating benchmark execution in new environment...")
-            fitness = round(random.uniform(0.5, 1.0), 4) # Higher potential fitness for new tools
-            
+            requirements, library = self._mutant_requirements(mutation_info)
+            with self.venv_cache.lease(requirements) as env:
+                action = "Reusing cached" if env.reused else f"Built (installed {', '.join(env.delta) or 'nothing'})"
+                print(f"[MUTANT MANAGER] {action} environment {env.path} in {env.setup_time:.2f}s")
+                self._check_installed(env, library)
+                return self._evaluate_with_interpreter(genome, env)
         except Exception as e:
-            print(f"[MUTANT MANAGER] Evaluation failed in temporary environment: {e}")
-            fitness = 0.0 # Failed evaluation
+            print(f"[MUTANT MANAGER] Evaluation failed in mutant environment: {e}")
+            return 0.0 # Failed evaluation
+
+    def _check_installed(self, env: VenvLease, library: str):
+        """Raises if `library` is not installed in the leased environment."""
+        process = subprocess.run(
+            [env.python, "-c", "import sys, importlib.metadata as m; print(m.version(sys.argv[1]))", library],
+            capture_output=True, text=True, timeout=settings.MUTANT_EXECUTION_TIMEOUT
+        )
+        if process.returncode != 0:
+            raise RuntimeError(f"'{library}' is not installed in {env.path}")
+        print(f"[MUTANT MANAGER] {library} {process.stdout.strip()} available in mutant environment.")
+
+    def _evaluate_with_interpreter(self, genome: Genome, env: VenvLease) -> float:
+        """
+        Runs the benchmark evaluation in a child process of the leased environment's
+        interpreter, so the generated solutions, their tests and the sandbox workers that
+        run them all see the mutant's packages. Task results are memoized per environment.
+
+        Solutions scored in the environment are cached in their own fitness cache next to
+        (not inside) the env, so they neither skew the venv cache's size accounting nor
+        vanish when the env is evicted. The child logs spans to a file of its own, which
+        is merged into this process's span log afterwards: rotating a shared log from two
+        processes would lose spans.
+        """
+        child_settings = {name: getattr(settings, name) for name in _INHERITED_SETTINGS}
+        child_settings["FITNESS_CACHE_PATH"] = os.path.join(self.venv_cache.root, f"{env.key}.fitness.sqlite")
+        child_settings["TRACE_JSONL_PATH"] = os.path.join(settings.TRACE_DIR, f"spans.{env.key[:16]}.{uuid.uuid4().hex}.jsonl")
+        payload = {"genome": asdict(genome), "environment": env.key, "settings": child_settings}
+        try:
+            process = subprocess.run(
+                [env.python, "-m", "dgm_mutant_manager"], input=json.dumps(payload), cwd=settings.PROJECT_ROOT,
+                capture_output=True, text=True, timeout=settings.MUTANT_EXECUTION_TIMEOUT
+            )
         finally:
-            # 4. Clean up the temporary directory
-            print(f"[MUTANT MANAGER] Cleaning up temporary directory: {self.temp_mutant_dir}")
-            shutil.rmtree(self.temp_mutant_dir)
-            
+            get_tracer().import_jsonl(child_settings["TRACE_JSONL_PATH"])
+        fitness = None
+        for line in process.stdout.splitlines():
+            if line.startswith(_FITNESS_MARKER):
+                fitness = float(line[len(_FITNESS_MARKER):])
+            else:
+                print(line)
+        if process.returncode != 0 or fitness is None:
+            output = process.stderr.strip().splitlines()
+            raise RuntimeError(f"evaluation in {env.path} failed: {output[-1] if output else process.returncode}")
         return fitness
 
-    def _create_mutant_requirements(self, mutation_info: dict):
-        """Creates the new requirements.txt for the mutant."""
-        base_req_path = os.path.join(self.base_project_dir, 'requirements.txt')
-        mutant_req_path = os.path.join(self.temp_mutant_dir, 'requirements.txt')
-        
+    def _mutant_requirements(self, mutation_info: dict) -> tuple[list[str], str]:
+        """Returns the mutant's requirements (the base set plus the new library) and the library's name."""
         parts = mutation_info['details'].split("'")
         if len(parts) < 2:
             raise ValueError("Invalid environment mutation detail format.")
-        library_to_add = parts[1]
-
-        existing_reqs = []
-        if os.path.exists(base_req_path):
-            with open(base_req_path, 'r') as f:
-                existing_reqs = [line.strip() for line in f.readlines() if line.strip() and not line.startswith('#')]
-        
-        if library_to_add not in existing_reqs:
-            existing_reqs.append(library_to_add)
-        
-        with open(mutant_req_path, 'w') as f:
-            f.write("# DGM Mutant Dependencies\n")
-            for req in existing_reqs:
-                f.write(f"{req}\n")
-        print(f"[MUTANT MANAGER] Created mutant requirements.txt at {mutant_req_path}")
+        library_to_add = normalize_requirement(parts[1])
+        if library_to_add is None:
+            raise ValueError(f"Invalid library in environment mutation: {parts[1]!r}")
+        return self._base_requirements() + [library_to_add], requirement_name(library_to_add)
+
+
+def _evaluate_in_environment():
+    """
+    Entry point of a child evaluation started by _evaluate_with_interpreter(): reads the
+    genome, environment key and inherited settings from stdin and prints the fitness.
+    """
+    from utils.signature_index import SignatureIndex
+    payload = json.load(sys.stdin)
+    for name, value in payload["settings"].items():
+        setattr(settings, name, value)
+    # The fitness cache and span log paths are this environment's and this child's own;
+    # the Prometheus file is the parent's to write.
+    settings.TRACE_EXPORT_INTERVAL_SECONDS = float("inf")
+    manager = MutantManager(signature_index=SignatureIndex(), environment=payload["environment"])
+    fitness = manager._evaluate_in_place(Genome(**payload["genome"]))
+    print(f"{_FITNESS_MARKER}{fitness}")
+
+
+if __name__ == "__main__":
+    _evaluate_in_environment()
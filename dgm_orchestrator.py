@@ -1,57 +1,96 @@
 # dgm_orchestrator.py
 # The main orchestrator for the Darwin Gödel Machine's evolutionary cycles.
 
-import os
-import random
 from dgm_core.dgm_genome import Genome
-from dgm_core.self_mutator import SelfMutator
-from dgm_core.evolutionary_solver import EvolutionarySolver
 from dgm_mutant_manager import MutantManager
 from dgm_selection_handler import SelectionHandler
+from dgm_generation_engine import GenerationEngine
+from dgm_lineage_archive import LineageArchive
+from dgm_work_queue import QueueMutantEvaluator, open_queue
+from config import settings
+from utils.signature_index import SignatureIndex
+from utils.tracing import get_tracer
 
 class Orchestrator:
     """
     Manages the primary evolutionary loop of the DGM, including meta-evolution.
     """
-    def __init__(self, genome_filepath='dgm_genome.json'):
+    def __init__(self, genome_filepath='dgm_genome.json', population_filepath='dgm_population.json',
+                 archive: LineageArchive = None):
+        # The genome and population files are only read once, to seed an empty archive.
         self.genome_filepath = genome_filepath
-        self.ollama_base_url = "http://ollama:11434"
+        self.population_filepath = population_filepath
+        self.ollama_base_url = settings.OLLAMA_HOST_URL
+        self.archive = archive or LineageArchive()
+        if self.archive.max_genome_id() == 0:
+            imported = self.archive.import_legacy(genome_filepath, population_filepath)
+            if imported:
+                print(f"[ORCHESTRATOR] Imported {imported} genomes from legacy files into {self.archive.db_path}.")
         self.parent_genome = self._load_genome()
-        self.mutant_manager = MutantManager()
-        self.selection_handler = SelectionHandler(genome_filepath)
+        self.population = self.archive.population() or [self.parent_genome]
+        self.signature_index = SignatureIndex()
+        if settings.WORK_QUEUE_URL:
+            # Coordinator mode: evaluations are pulled from the queue by dgm_worker.py processes.
+            print(f"[ORCHESTRATOR] Distributing evaluations via work queue {settings.WORK_QUEUE_URL}")
+            self.mutant_manager = QueueMutantEvaluator(open_queue(settings.WORK_QUEUE_URL))
+        else:
+            self.mutant_manager = MutantManager(signature_index=self.signature_index)
+        self.selection_handler = SelectionHandler(self.archive)
+        self.generation_engine = GenerationEngine(self.mutant_manager, self.ollama_base_url,
+                                                  next_genome_id=self.archive.max_genome_id() + 1)
 
     def _load_genome(self):
         """Loads the current parent genome or initializes a new one."""
         print("[ORCHESTRATOR] Loading Genome...")
-        if os.path.exists(self.genome_filepath):
-            genome = Genome.from_json(self.genome_filepath)
-            print(f"Loaded genome #{genome.genome_id} (Gen: {genome.generation}, Fitness: {genome.fitness:.4f}) from {self.genome_filepath}.")
+        genome = self.archive.current()
+        if genome is not None:
+            print(f"Loaded genome #{genome.genome_id} (Gen: {genome.generation}, Fitness: {genome.fitness:.4f}) from {self.archive.db_path}.")
             return genome
         else:
             genome = Genome()
             genome.genome_id = 1
-            print("No genome file found. Initializing with default genome #1.")
-            genome.to_json(self.genome_filepath)
+            print("No adopted genome in the archive. Initializing with default genome #1.")
+            self.archive.set_current(genome)
             return genome
 
     def run_evolutionary_cycle(self):
         """
-        Executes one complete cycle of mutation, evaluation, and selection.
+        Executes one complete generation: the population's mutants are proposed and
+        evaluated concurrently, then tournament selection and elitism form the next
+        population. The best genome is offered to the selection handler for adoption.
         """
-        print(f"\n--- DGM ORCHESTRATOR: BEGINNING CYCLE FOR GENERATION {self.parent_genome.generation + 1} ---")
-        
-        mutator = SelfMutator(self.parent_genome, self.ollama_base_url)
-        mutant_genome, mutation_info = mutator.propose_mutation()
-        
-        print("\n[EVALUATION] Evaluating mutant genome's performance...")
-        mutant_fitness = self.mutant_manager.evaluate(mutant_genome, mutation_info)
-        mutant_genome.fitness = mutant_fitness
-        print(f"Mutant genome #{mutant_genome.genome_id} achieved fitness: {mutant_fitness:.4f}")
-
-        self.selection_handler.select(self.parent_genome, mutant_genome, mutation_info)
-        
+        tracer = get_tracer()
+        with tracer.span("cycle", generation=self.parent_genome.generation + 1):
+            self._run_cycle(tracer)
+        print(f"[TRACE] {tracer.format_breakdown()}")
+        tracer.export_prometheus()
         print("\n--- CYCLE COMPLETE ---")
 
+    def _run_cycle(self, tracer):
+        print(f"\n--- DGM ORCHESTRATOR: BEGINNING CYCLE FOR GENERATION {self.parent_genome.generation + 1} ---")
+        print(f"[ORCHESTRATOR] Population size: {len(self.population)}")
+
+        print("\n[EVALUATION] Proposing and evaluating the next generation...")
+        self.population = self.generation_engine.run_generation(self.population)
+
+        with tracer.span("selection"):
+            self.archive.record_generation(self.population, self.generation_engine.mutation_infos,
+                                           self.generation_engine.offspring)
+
+            best_genome = self.population[0]
+            mutation_info = self.generation_engine.mutation_infos.get(best_genome.genome_id)
+            if mutation_info is None:
+                print(f"[ORCHESTRATOR] Best genome #{best_genome.genome_id} is an elite from the previous generation.")
+            else:
+                self.selection_handler.select(self.parent_genome, best_genome, mutation_info)
+                if best_genome.fitness > self.parent_genome.fitness:
+                    self.parent_genome = best_genome
+
+        stats = self.signature_index.stats()
+        print(f"[ORCHESTRATOR] Behavioral index: {stats['behaviors']} behaviors, {stats['skipped_evaluations']} duplicate evaluations skipped.")
+        archive_stats = self.archive.stats()
+        print(f"[ORCHESTRATOR] Lineage archive: {archive_stats['genomes']} genomes across {archive_stats['generations']} generations.")
+
 if __name__ == "__main__":
     orchestrator = Orchestrator()
     orchestrator.run_evolutionary_cycle()
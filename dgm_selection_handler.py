@@ -3,13 +3,15 @@
 
 import os
 from dgm_core.dgm_genome import Genome
+from dgm_lineage_archive import LineageArchive
 
 class SelectionHandler:
     """
-    Applies the outcome of an evaluation, updating the master genome or environment.
+    Applies the outcome of an evaluation, updating the adopted genome in the lineage
+    archive or the environment.
     """
-    def __init__(self, genome_filepath='dgm_genome.json', base_project_dir='.'):
-        self.genome_filepath = genome_filepath
+    def __init__(self, archive: LineageArchive = None, base_project_dir='.'):
+        self.archive = archive or LineageArchive()
         self.base_project_dir = base_project_dir
 
     def select(self, parent_genome: Genome, mutant_genome: Genome, mutation_info: dict):
@@ -24,8 +26,8 @@ class SelectionHandler:
             if mutation_info['type'] == 'ENVIRONMENT_MUTATION':
                 self._apply_environment_mutation(mutation_info)
             
-            mutant_genome.to_json(self.genome_filepath)
-            print(f"Saved superior genome #{mutant_genome.genome_id} to {self.genome_filepath}")
+            self.archive.set_current(mutant_genome, mutation_info)
+            print(f"Adopted superior genome #{mutant_genome.genome_id} in {self.archive.db_path}")
         else:
             print(f"FAILURE: Mutant fitness ({mutant_genome.fitness:.4f}) <= Parent fitness ({parent_genome.fitness:.4f})")
             print("Discarding mutant. No changes made to base project.")
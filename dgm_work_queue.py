@@ -0,0 +1,318 @@
+# dgm_work_queue.py
+# A leased job queue for distributing mutant evaluations across worker processes and hosts.
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+import socketserver
+from dataclasses import asdict
+from urllib.parse import urlparse
+from dgm_core.dgm_genome import Genome
+from config import settings
+
+class SQLiteJobQueue:
+    """
+    Job queue stored in SQLite, usable by any number of local processes. A worker leases
+    a job for a fixed time and must complete it or renew the lease before it expires;
+    expired leases return the job to the queue until it runs out of attempts. A job the
+    coordinator stops waiting for is cancelled, and is never leased again.
+
+    submit() and lease() accept caller-chosen ids, so a client that retries either after a
+    lost response gets the original job or lease back instead of a duplicate.
+    """
+    def __init__(self, db_path: str = None, max_attempts: int = None):
+        self.db_path = db_path or settings.WORK_QUEUE_DB_PATH
+        self.max_attempts = max_attempts or settings.WORK_QUEUE_MAX_ATTEMPTS
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                lease_request TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "lease_request" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN lease_request TEXT")
+
+    def submit(self, payload: dict, job_id: str = None) -> str:
+        """Adds a job. Submitting an existing job_id again is a no-op."""
+        job_id = job_id or uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (job_id, payload, status, created_at) VALUES (?, ?, 'pending', ?)",
+                (job_id, json.dumps(payload), time.time())
+            )
+        return job_id
+
+    def lease(self, worker_id: str, lease_seconds: float, request_id: str = None) -> tuple[str, dict] | None:
+        """
+        Atomically claims the oldest runnable job, reclaiming expired leases first. A
+        repeated `request_id` returns the job that request already leased.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if request_id is not None:
+                    row = self._conn.execute(
+                        "SELECT job_id, payload FROM jobs WHERE lease_request = ? AND lease_owner = ? AND status = 'leased'",
+                        (request_id, worker_id)
+                    ).fetchone()
+                    if row is not None:
+                        self._conn.execute("COMMIT")
+                        return row[0], json.loads(row[1])
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'lease expired after final attempt' "
+                    "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                    (now, self.max_attempts)
+                )
+                row = self._conn.execute(
+                    "SELECT job_id, payload FROM jobs WHERE status = 'pending' "
+                    "OR (status = 'leased' AND lease_expires < ?) ORDER BY created_at LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, lease_request = ?, "
+                        "attempts = attempts + 1 WHERE job_id = ?",
+                        (worker_id, now + lease_seconds, request_id, row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return (row[0], json.loads(row[1])) if row else None
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: float) -> bool:
+        """Renews a lease. Returns False if the worker no longer owns the job."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE job_id = ? AND lease_owner = ? AND status = 'leased'",
+                (time.time() + lease_seconds, job_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str, result: dict) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'done', result = ? WHERE job_id = ? AND lease_owner = ? AND status = 'leased'",
+                (json.dumps(result), job_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        """Returns a job to the queue, or marks it failed once its attempts are used up."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ?, lease_owner = NULL, lease_expires = NULL "
+                "WHERE job_id = ? AND lease_owner = ? AND status = 'leased'",
+                (self.max_attempts, error, job_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def cancel(self, job_id: str, reason: str) -> bool:
+        """
+        Withdraws a job that has not finished. A worker still evaluating it loses its lease:
+        heartbeats and completion are refused.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', error = ? WHERE job_id = ? AND status IN ('pending', 'leased')",
+                (reason, job_id)
+            )
+        return cursor.rowcount == 1
+
+    def status(self, job_id: str) -> dict:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, result, error, attempts FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return {"status": "unknown"}
+        return {"status": row[0], "result": json.loads(row[1]) if row[1] else None,
+                "error": row[2], "attempts": row[3]}
+
+
+class _QueueRequestHandler(socketserver.StreamRequestHandler):
+    """Serves one JSON-lines connection: each line is {"op": ..., "args": {...}}."""
+    OPS = ("submit", "lease", "heartbeat", "complete", "fail", "cancel", "status")
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if request.get("op") not in self.OPS:
+                    raise ValueError(f"unknown op: {request.get('op')}")
+                value = getattr(self.server.queue, request["op"])(**request.get("args", {}))
+                response = {"ok": True, "value": value}
+            except Exception as e:
+                response = {"ok": False, "error": str(e)}
+            self.wfile.write((json.dumps(response) + "\n").encode('utf-8'))
+            self.wfile.flush()
+
+
+class JobQueueServer(socketserver.ThreadingTCPServer):
+    """Exposes a SQLiteJobQueue to remote workers over TCP."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, queue: SQLiteJobQueue, host: str = "127.0.0.1", port: int = 0):
+        self.queue = queue
+        super().__init__((host, port), _QueueRequestHandler)
+
+
+class SocketJobQueue:
+    """
+    Client side of JobQueueServer, with the same interface as SQLiteJobQueue. A request
+    whose connection fails is resent once on a new connection; submit and lease carry
+    client-generated ids so that a resend the server already applied is not applied twice.
+    """
+    def __init__(self, host: str, port: int, timeout: float = 30):
+        self.address = (host, port)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sock = None
+        self._file = None
+
+    def _call(self, op: str, **args):
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._sock = socket.create_connection(self.address, timeout=self.timeout)
+                        self._file = self._sock.makefile('rwb')
+                    self._file.write((json.dumps({"op": op, "args": args}) + "\n").encode('utf-8'))
+                    self._file.flush()
+                    line = self._file.readline()
+                    if not line:
+                        raise ConnectionError("job queue server closed the connection")
+                    break
+                except OSError:
+                    self.close()
+                    if attempt == 1:
+                        raise
+        response = json.loads(line)
+        if not response["ok"]:
+            raise RuntimeError(f"Job queue error: {response['error']}")
+        value = response["value"]
+        return tuple(value) if op == "lease" and value else value
+
+    def submit(self, payload: dict, job_id: str = None) -> str:
+        return self._call("submit", payload=payload, job_id=job_id or uuid.uuid4().hex)
+
+    def lease(self, worker_id: str, lease_seconds: float, request_id: str = None):
+        return self._call("lease", worker_id=worker_id, lease_seconds=lease_seconds,
+                          request_id=request_id or uuid.uuid4().hex)
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: float) -> bool:
+        return self._call("heartbeat", job_id=job_id, worker_id=worker_id, lease_seconds=lease_seconds)
+
+    def complete(self, job_id: str, worker_id: str, result: dict) -> bool:
+        return self._call("complete", job_id=job_id, worker_id=worker_id, result=result)
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        return self._call("fail", job_id=job_id, worker_id=worker_id, error=error)
+
+    def cancel(self, job_id: str, reason: str) -> bool:
+        return self._call("cancel", job_id=job_id, reason=reason)
+
+    def status(self, job_id: str) -> dict:
+        return self._call("status", job_id=job_id)
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._file.close()
+                self._sock.close()
+            finally:
+                self._sock = None
+                self._file = None
+
+
+def open_queue(url: str):
+    """
+    Opens a queue from a URL: 'sqlite:///path/to/queue.sqlite' for the local backend or
+    'tcp://host:port' for a remote JobQueueServer.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == "sqlite":
+        return SQLiteJobQueue(parsed.path or None)
+    if parsed.scheme == "tcp":
+        return SocketJobQueue(parsed.hostname, parsed.port)
+    raise ValueError(f"Unsupported work queue URL: {url}")
+
+
+def encode_job(genome: Genome, mutation_info: dict) -> dict:
+    return {"genome": asdict(genome), "mutation_info": mutation_info}
+
+
+def decode_job(payload: dict) -> tuple[Genome, dict]:
+    return Genome(**payload["genome"]), payload["mutation_info"]
+
+
+class QueueMutantEvaluator:
+    """
+    Drop-in replacement for MutantManager on the coordinator: evaluate() pushes the job
+    to the queue and waits for a worker to report the fitness. Each attempt gets
+    `result_timeout` seconds from the moment a worker leases it; time spent waiting in
+    the queue does not count. A job that times out is cancelled so no worker picks it up
+    (or finishes it) later.
+    """
+    def __init__(self, queue, result_timeout: float = None, poll_interval: float = 0.5):
+        self.queue = queue
+        self.result_timeout = result_timeout or settings.MUTANT_EXECUTION_TIMEOUT
+        self.poll_interval = poll_interval
+
+    def evaluate(self, mutant_genome: Genome, mutation_info: dict) -> float:
+        job_id = self.queue.submit(encode_job(mutant_genome, mutation_info))
+        print(f"[WORK QUEUE] Submitted mutant #{mutant_genome.genome_id} as job {job_id}.")
+        deadline, attempt = None, 0
+        while deadline is None or time.monotonic() < deadline:
+            state = self.queue.status(job_id)
+            if state["status"] == "done":
+                return state["result"]["fitness"]
+            if state["status"] in ("failed", "cancelled"):
+                print(f"[WORK QUEUE] Job {job_id} {state['status']} after {state['attempts']} attempts: {state['error']}")
+                return 0.0
+            if state["status"] == "leased" and state["attempts"] != attempt:
+                attempt, deadline = state["attempts"], time.monotonic() + self.result_timeout
+            elif state["status"] == "pending":
+                deadline = None
+            time.sleep(self.poll_interval)
+        self.queue.cancel(job_id, f"coordinator gave up after {self.result_timeout:.0f}s")
+        print(f"[WORK QUEUE] Timed out waiting for job {job_id}; cancelled it.")
+        return 0.0
+
+
+def main():
+    """Serves a SQLite-backed job queue to remote workers."""
+    import argparse
+    parser = argparse.ArgumentParser(description="DGM work queue server.")
+    parser.add_argument('--db', type=str, default=settings.WORK_QUEUE_DB_PATH, help='Path to the SQLite queue database.')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Interface to listen on.')
+    parser.add_argument('--port', type=int, default=settings.WORK_QUEUE_PORT, help='TCP port to listen on.')
+    args = parser.parse_args()
+
+    server = JobQueueServer(SQLiteJobQueue(args.db), args.host, args.port)
+    print(f"[WORK QUEUE] Serving {args.db} on tcp://{args.host}:{server.server_address[1]}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# dgm_worker.py
+# Worker entry point: pulls mutant evaluation jobs from the work queue and reports fitness.
+
+import os
+import socket
+import argparse
+import threading
+from dgm_mutant_manager import MutantManager
+from dgm_work_queue import open_queue, decode_job
+from utils.signature_index import SignatureIndex
+from config import settings
+
+class EvaluationWorker:
+    """
+    Leases (genome, mutation_info) jobs, evaluates them with a local MutantManager and
+    pushes the fitness back. The lease is renewed while the evaluation runs, so a worker
+    that dies simply lets its lease expire and the job is retried elsewhere.
+    """
+    def __init__(self, queue, worker_id: str = None, lease_seconds: float = None, poll_interval: float = 1.0):
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds or settings.WORK_QUEUE_LEASE_SECONDS
+        self.poll_interval = poll_interval
+        self.mutant_manager = MutantManager(signature_index=SignatureIndex())
+        self._stop = threading.Event()
+
+    def _keep_lease(self, job_id: str, done: threading.Event):
+        while not done.wait(self.lease_seconds / 3):
+            try:
+                if not self.queue.heartbeat(job_id, self.worker_id, self.lease_seconds):
+                    print(f"[WORKER {self.worker_id}] Lost lease on job {job_id}.")
+                    return
+            except Exception as e:
+                print(f"[WORKER {self.worker_id}] Heartbeat failed for job {job_id}: {e}")
+
+    def run_once(self) -> bool:
+        """Processes at most one job. Returns False if the queue was empty."""
+        leased = self.queue.lease(self.worker_id, self.lease_seconds)
+        if not leased:
+            return False
+        job_id, payload = leased
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._keep_lease, args=(job_id, done), daemon=True)
+        heartbeat.start()
+        try:
+            genome, mutation_info = decode_job(payload)
+            fitness = self.mutant_manager.evaluate(genome, mutation_info)
+            if self.queue.complete(job_id, self.worker_id, {"fitness": fitness}):
+                print(f"[WORKER {self.worker_id}] Job {job_id} complete: fitness {fitness:.4f}")
+            else:
+                print(f"[WORKER {self.worker_id}] Job {job_id} was cancelled or re-leased; result discarded.")
+        except Exception as e:
+            print(f"[WORKER {self.worker_id}] Job {job_id} failed: {e}")
+            self.queue.fail(job_id, self.worker_id, str(e))
+        finally:
+            done.set()
+            heartbeat.join()
+        return True
+
+    def run(self):
+        """Processes jobs until stop() is called."""
+        print(f"[WORKER {self.worker_id}] Waiting for jobs...")
+        while not self._stop.is_set():
+            if not self.run_once():
+                self._stop.wait(self.poll_interval)
+
+    def stop(self):
+        self._stop.set()
+
+def main():
+    parser = argparse.ArgumentParser(description="DGM evaluation worker.")
+    parser.add_argument('--queue', type=str, default=settings.WORK_QUEUE_URL,
+                        help="Work queue URL, e.g. sqlite:///dgm_cache/work_queue.sqlite or tcp://host:port.")
+    args = parser.parse_args()
+    if not args.queue:
+        parser.error("a work queue URL is required (--queue or DGM_WORK_QUEUE_URL)")
+    EvaluationWorker(open_queue(args.queue)).run()
+
+if __name__ == "__main__":
+    main()
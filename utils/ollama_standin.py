@@ -0,0 +1,361 @@
+# utils/ollama_standin.py
+# A local stand-in for the Ollama HTTP API, for load and latency benchmarking without GPUs.
+#
+# Replay mode serves /api/generate, /api/chat, /api/tags and /api/ps from recorded sessions
+# and scripted fixtures with configurable latency, token rate and error injection. Models
+# are loaded on first use (paying load_latency) and stay resident, up to max_loaded_models.
+# Record mode proxies to a real Ollama and appends every exchange to a session file.
+#
+#   python -m utils.ollama_standin --fixtures fixtures.json --session session.jsonl --port 11434
+#   python -m utils.ollama_standin --record --upstream http://ollama:11434 --session session.jsonl
+
+import re
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+_TOKEN_RE = re.compile(r"\s*\S+|\s+")
+
+
+class LatencyModel:
+    """Samples delays in seconds from a named distribution."""
+    def __init__(self, distribution: str = "fixed", mean: float = 0.0, sigma: float = 0.0,
+                 low: float = 0.0, high: float = 0.0, rng: random.Random = None):
+        self.distribution = distribution
+        self.mean = mean
+        self.sigma = sigma
+        self.low = low
+        self.high = high
+        self.rng = rng or random.Random()
+
+    @classmethod
+    def from_config(cls, config: dict | float | None, rng: random.Random = None) -> "LatencyModel":
+        if config is None:
+            return cls(rng=rng)
+        if isinstance(config, (int, float)):
+            return cls("fixed", mean=float(config), rng=rng)
+        return cls(rng=rng, **config)
+
+    def sample(self) -> float:
+        if self.distribution == "fixed":
+            return self.mean
+        if self.distribution == "uniform":
+            return self.rng.uniform(self.low, self.high)
+        if self.distribution == "exponential":
+            return self.rng.expovariate(1.0 / self.mean) if self.mean > 0 else 0.0
+        if self.distribution == "lognormal":
+            # Parameterized by the desired mean, so configs read in seconds.
+            mu = math.log(self.mean) - self.sigma ** 2 / 2 if self.mean > 0 else 0.0
+            return self.rng.lognormvariate(mu, self.sigma) if self.mean > 0 else 0.0
+        raise ValueError(f"Unknown latency distribution: {self.distribution}")
+
+
+def _prompt_of(endpoint: str, request: dict):
+    return request.get("prompt") if endpoint == "generate" else request.get("messages")
+
+
+def _replay_key(endpoint: str, request: dict) -> str:
+    return json.dumps([endpoint, request.get("model"), _prompt_of(endpoint, request), request.get("format")], sort_keys=True)
+
+
+class ResponseBook:
+    """
+    Resolves a request to response text. Exact matches from recorded sessions win, then
+    the first scripted rule whose model and pattern match, then the fixture default.
+    """
+    def __init__(self, fixtures: dict = None, session_paths: list[str] = None):
+        fixtures = fixtures or {}
+        self.rules = [dict(rule, _pattern=re.compile(rule.get("match", ""), re.DOTALL))
+                      for rule in fixtures.get("rules", [])]
+        self.default_response = fixtures.get("default_response", "")
+        self.models = fixtures.get("models", [])
+        self.recorded = {}
+        for path in session_paths or []:
+            self.load_session(path)
+
+    def load_session(self, path: str):
+        with open(path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.recorded[_replay_key(entry["endpoint"], entry["request"])] = entry["text"]
+                    if entry["request"].get("model") and entry["request"]["model"] not in self.models:
+                        self.models.append(entry["request"]["model"])
+
+    def resolve(self, endpoint: str, request: dict) -> str:
+        key = _replay_key(endpoint, request)
+        if key in self.recorded:
+            return self.recorded[key]
+        prompt = _prompt_of(endpoint, request)
+        prompt_text = prompt if isinstance(prompt, str) else json.dumps(prompt)
+        for rule in self.rules:
+            if rule.get("endpoint", endpoint) != endpoint:
+                continue
+            if rule.get("model", request.get("model")) != request.get("model"):
+                continue
+            if rule["_pattern"].search(prompt_text or ""):
+                return rule["response"]
+        return self.default_response
+
+
+class StandInConfig:
+    """Latency, throughput and fault settings for replay mode."""
+    def __init__(self, first_token_latency=None, load_latency=None, tokens_per_second: float = 50.0,
+                 error_rate: float = 0.0, error_status: int = 500, max_loaded_models: int = 0, seed: int = None):
+        self.rng = random.Random(seed)
+        # 0 keeps every model resident once loaded; otherwise the least recently used is evicted.
+        self.max_loaded_models = max_loaded_models
+        self.first_token_latency = LatencyModel.from_config(first_token_latency, self.rng)
+        self.load_latency = LatencyModel.from_config(load_latency, self.rng)
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    @classmethod
+    def from_fixtures(cls, fixtures: dict, seed: int = None) -> "StandInConfig":
+        return cls(seed=seed, **fixtures.get("timing", {}))
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    # --- Plumbing ---
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, body: dict):
+        data = (json.dumps(body) + "\n").encode('utf-8')
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _read_request(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    # --- Routes ---
+
+    def do_GET(self):
+        if self.path in ("/api/tags", "/api/ps"):
+            endpoint = self.path.rsplit('/', 1)[1]
+            if self.server.recorder:
+                return self._proxy("GET", endpoint, None)
+            names = self.server.book.models if endpoint == "tags" else self.server.resident_models()
+            return self._send_json(200, {"models": [{"name": name, "model": name} for name in names]})
+        self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        endpoint = {"/api/generate": "generate", "/api/chat": "chat"}.get(self.path)
+        if endpoint is None:
+            return self._send_json(404, {"error": "not found"})
+        request = self._read_request()
+        if self.server.recorder:
+            return self._proxy("POST", endpoint, request)
+        self._replay(endpoint, request)
+
+    def _replay(self, endpoint: str, request: dict):
+        config = self.server.config
+        with self.server.stats_lock:
+            self.server.stats["requests"] += 1
+        if config.error_rate and config.rng.random() < config.error_rate:
+            with self.server.stats_lock:
+                self.server.stats["injected_errors"] += 1
+            return self._send_json(config.error_status, {"error": "injected failure"})
+
+        model = request.get("model")
+        if endpoint == "generate" and not request.get("prompt"):
+            return self._load_or_unload(model, request.get("keep_alive"))
+
+        text = self.server.book.resolve(endpoint, request)
+        tokens = _TOKEN_RE.findall(text) or [""]
+        load_delay = self.server.use_model(model)
+        first_token_delay = config.first_token_latency.sample()
+        per_token = 1.0 / config.tokens_per_second if config.tokens_per_second else 0.0
+        prompt = _prompt_of(endpoint, request)
+        stats = {
+            "model": request.get("model"),
+            "done": True,
+            "prompt_eval_count": len(_TOKEN_RE.findall(prompt if isinstance(prompt, str) else json.dumps(prompt or ""))),
+            "eval_count": len(tokens),
+            "load_duration": int(load_delay * 1e9),
+            "eval_duration": int(per_token * len(tokens) * 1e9),
+            "total_duration": int((load_delay + first_token_delay + per_token * len(tokens)) * 1e9),
+        }
+
+        def body(token: str, done: bool) -> dict:
+            if endpoint == "chat":
+                return {"model": request.get("model"), "message": {"role": "assistant", "content": token}, "done": done}
+            return {"model": request.get("model"), "response": token, "done": done}
+
+        time.sleep(load_delay + first_token_delay)
+        if request.get("stream", True):
+            self._start_stream()
+            try:
+                for token in tokens:
+                    self._write_chunk(body(token, False))
+                    time.sleep(per_token)
+                self._write_chunk({**body("", True), **stats})
+                self._end_stream()
+            except (BrokenPipeError, ConnectionResetError):
+                # The client stopped reading early, exactly as Ollama would see it.
+                with self.server.stats_lock:
+                    self.server.stats["client_aborts"] += 1
+                self.close_connection = True
+        else:
+            time.sleep(per_token * len(tokens))
+            self._send_json(200, {**body(text, True), **stats})
+
+    def _load_or_unload(self, model: str, keep_alive):
+        """An empty prompt loads the model, or unloads it when keep_alive is 0, as in Ollama."""
+        if keep_alive in (0, "0", "0s", "0m"):
+            self.server.unload_model(model)
+            return self._send_json(200, {"model": model, "response": "", "done": True, "done_reason": "unload"})
+        load_delay = self.server.use_model(model)
+        time.sleep(load_delay)
+        self._send_json(200, {"model": model, "response": "", "done": True, "done_reason": "load",
+                              "load_duration": int(load_delay * 1e9), "total_duration": int(load_delay * 1e9)})
+
+    def _proxy(self, method: str, endpoint: str, request: dict | None):
+        """Forwards to the upstream Ollama, relays the answer and records the exchange."""
+        import httpx
+        upstream = self.server.recorder["upstream"]
+        url = f"{upstream}/api/{endpoint}"
+        try:
+            if method == "GET":
+                response = httpx.get(url, timeout=30)
+                return self._send_json(response.status_code, response.json())
+            if not request.get("stream", True):
+                response = httpx.post(url, json=request, timeout=600)
+                data = response.json()
+                if response.status_code == 200:
+                    text = data.get("response") if endpoint == "generate" else data.get("message", {}).get("content", "")
+                    self.server.record(endpoint, request, text, data)
+                return self._send_json(response.status_code, data)
+
+            parts = []
+            final = {}
+            with httpx.stream("POST", url, json=request, timeout=600) as response:
+                self._start_stream()
+                for line in response.iter_lines():
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    parts.append(chunk.get("response", "") if endpoint == "generate"
+                                 else chunk.get("message", {}).get("content", ""))
+                    if chunk.get("done"):
+                        final = chunk
+                    self._write_chunk(chunk)
+                self._end_stream()
+            if final:
+                self.server.record(endpoint, request, "".join(parts), final)
+        except httpx.HTTPError as e:
+            self._send_json(502, {"error": f"upstream failure: {e}"})
+
+
+class OllamaStandIn(ThreadingHTTPServer):
+    """The stand-in server. Pass `recorder={'upstream': url, 'session': path}` for record mode."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, book: ResponseBook = None, config: StandInConfig = None,
+                 host: str = "127.0.0.1", port: int = 0, recorder: dict = None):
+        self.book = book or ResponseBook()
+        self.config = config or StandInConfig()
+        self.recorder = recorder
+        self.stats = {"requests": 0, "injected_errors": 0, "client_aborts": 0, "loads": 0, "unloads": 0}
+        self.stats_lock = threading.Lock()
+        self._resident = OrderedDict()
+        self._record_lock = threading.Lock()
+        super().__init__((host, port), _StandInHandler)
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def use_model(self, model: str) -> float:
+        """Marks `model` as used and returns the load delay to simulate (0 if it was resident)."""
+        with self.stats_lock:
+            if model in self._resident:
+                self._resident.move_to_end(model)
+                return 0.0
+            self._resident[model] = True
+            self.stats["loads"] += 1
+            limit = self.config.max_loaded_models
+            while limit and len(self._resident) > limit:
+                self._resident.popitem(last=False)
+                self.stats["unloads"] += 1
+        return self.config.load_latency.sample()
+
+    def unload_model(self, model: str):
+        with self.stats_lock:
+            if self._resident.pop(model, None):
+                self.stats["unloads"] += 1
+
+    def resident_models(self) -> list[str]:
+        with self.stats_lock:
+            return list(self._resident)
+
+    def record(self, endpoint: str, request: dict, text: str, final: dict):
+        entry = {"endpoint": endpoint, "request": request, "text": text,
+                 "metrics": {k: v for k, v in final.items() if k.endswith(("_count", "_duration"))}}
+        with self._record_lock, open(self.recorder["session"], 'a') as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def start_in_thread(self) -> "OllamaStandIn":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record/replay stand-in for the Ollama API.")
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--fixtures', type=str, help='JSON file with rules, default_response, models and timing.')
+    parser.add_argument('--session', type=str, action='append', default=[],
+                        help='Recorded session JSONL to replay (or, with --record, to append to).')
+    parser.add_argument('--record', action='store_true', help='Proxy to --upstream and record every exchange.')
+    parser.add_argument('--upstream', type=str, default='http://ollama:11434')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for latency sampling and error injection.')
+    args = parser.parse_args()
+
+    if args.record:
+        if len(args.session) != 1:
+            parser.error("--record needs exactly one --session file")
+        server = OllamaStandIn(host=args.host, port=args.port,
+                               recorder={"upstream": args.upstream.rstrip('/'), "session": args.session[0]})
+        print(f"Recording {args.upstream} -> {args.session[0]} on {server.url}")
+    else:
+        fixtures = {}
+        if args.fixtures:
+            with open(args.fixtures, 'r') as f:
+                fixtures = json.load(f)
+        server = OllamaStandIn(ResponseBook(fixtures, args.session), StandInConfig.from_fixtures(fixtures, args.seed),
+                               host=args.host, port=args.port)
+        print(f"Replaying {len(server.book.recorded)} recorded exchanges and {len(server.book.rules)} rules on {server.url}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
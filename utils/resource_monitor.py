@@ -0,0 +1,320 @@
+# utils/resource_monitor.py
+# Background sampling of host resources and admission control for evaluations and LLM calls.
+
+import os
+import time
+import shutil
+import logging
+import threading
+import subprocess
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from dataclasses import dataclass, asdict
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ResourceSample:
+    """One reading of the host. GPU fields are None when no GPU reading is available."""
+    timestamp: float
+    cpu_percent: float
+    ram_percent: float
+    ram_available_mb: float
+    swap_in_mb_per_s: float
+    load_per_cpu: float
+    gpu_utilization_percent: float | None = None
+    vram_used_mb: int | None = None
+    vram_total_mb: int | None = None
+
+    @property
+    def vram_percent(self) -> float | None:
+        if not self.vram_total_mb or self.vram_used_mb is None:
+            return None
+        return 100.0 * self.vram_used_mb / self.vram_total_mb
+
+
+class ResourceSampler:
+    """
+    Samples CPU, RAM, swap-in rate, load average and (if nvidia-smi is available) GPU
+    usage on a daemon thread, keeping the most recent readings in a ring buffer. Readers
+    never block: CPU percent is measured between consecutive samples instead of over a
+    blocking interval, and nvidia-smi runs on its own slower cadence.
+    """
+    def __init__(self, interval: float = None, history_size: int = None, gpu_interval: float = None):
+        self.interval = interval or settings.RESOURCE_SAMPLE_INTERVAL
+        self.gpu_interval = gpu_interval or settings.RESOURCE_GPU_SAMPLE_INTERVAL
+        self._samples = deque(maxlen=history_size or settings.RESOURCE_HISTORY_SIZE)
+        self._lock = threading.Lock()
+        self._first_sample = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._psutil = None
+        self._nvidia_smi = shutil.which('nvidia-smi')
+        self._gpu = (None, None, None)
+        self._last_gpu_time = 0.0
+        self._last_swap = None
+        self.sequence = 0
+
+    # --- Sampling ---
+
+    def _read_gpu(self, now: float):
+        if not self._nvidia_smi or now - self._last_gpu_time < self.gpu_interval:
+            return
+        self._last_gpu_time = now
+        try:
+            result = subprocess.run(
+                [self._nvidia_smi, '--query-gpu=utilization.gpu,memory.used,memory.total', '--format=csv,noheader,nounits'],
+                capture_output=True, text=True, check=True, timeout=5
+            )
+            gpu_util, vram_used, vram_total = result.stdout.strip().splitlines()[0].split(', ')
+            self._gpu = (float(gpu_util), int(vram_used), int(vram_total))
+        except Exception:
+            # No usable GPU reading; stop asking rather than spawning a failing process forever.
+            self._nvidia_smi = None
+            self._gpu = (None, None, None)
+
+    def _swap_in_rate(self, now: float) -> float:
+        try:
+            swapped_in = self._psutil.swap_memory().sin
+        except Exception:
+            return 0.0
+        previous, self._last_swap = self._last_swap, (now, swapped_in)
+        if previous is None or now <= previous[0]:
+            return 0.0
+        return max(0.0, (swapped_in - previous[1]) / (now - previous[0]) / (1024 * 1024))
+
+    def sample(self) -> ResourceSample:
+        """Takes one reading and appends it to the history."""
+        psutil = self._psutil
+        now = time.time()
+        memory = psutil.virtual_memory()
+        try:
+            load_per_cpu = os.getloadavg()[0] / (os.cpu_count() or 1)
+        except (AttributeError, OSError):
+            load_per_cpu = 0.0
+        self._read_gpu(now)
+        reading = ResourceSample(
+            timestamp=now,
+            cpu_percent=psutil.cpu_percent(interval=None),
+            ram_percent=memory.percent,
+            ram_available_mb=memory.available / (1024 * 1024),
+            swap_in_mb_per_s=self._swap_in_rate(now),
+            load_per_cpu=load_per_cpu,
+            gpu_utilization_percent=self._gpu[0],
+            vram_used_mb=self._gpu[1],
+            vram_total_mb=self._gpu[2],
+        )
+        with self._lock:
+            self._samples.append(reading)
+            self.sequence += 1
+        self._first_sample.set()
+        return reading
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.warning(f"Resource sampler: reading failed: {e}")
+
+    def start(self) -> "ResourceSampler":
+        """Starts the sampling thread. Without psutil the sampler stays empty."""
+        if self._thread is not None:
+            return self
+        try:
+            import psutil  # Deferred: only processes that monitor resources need it.
+        except ImportError:
+            logger.warning("Resource sampler: psutil is not installed; admission control is disabled.")
+            return self
+        self._psutil = psutil
+        psutil.cpu_percent(interval=None) # Primes the counter the first sample is measured against.
+        self._thread = threading.Thread(target=self._run, name="dgm-resource-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+
+    # --- Reading ---
+
+    def latest(self, wait: float = 0.0) -> ResourceSample | None:
+        """Returns the newest reading, waiting up to `wait` seconds for the first one."""
+        if wait and self._thread is not None:
+            self._first_sample.wait(wait)
+        with self._lock:
+            return self._samples[-1] if self._samples else None
+
+    def history(self, seconds: float = None) -> list[ResourceSample]:
+        """Returns the buffered readings, oldest first, optionally only the last `seconds`."""
+        with self._lock:
+            samples = list(self._samples)
+        if seconds is None:
+            return samples
+        cutoff = time.time() - seconds
+        return [s for s in samples if s.timestamp >= cutoff]
+
+    def mean(self, field: str, count: int) -> float | None:
+        """Averages one numeric field over the newest `count` readings."""
+        with self._lock:
+            values = [getattr(s, field) for s in list(self._samples)[-count:]]
+        values = [v for v in values if v is not None]
+        return sum(values) / len(values) if values else None
+
+
+class AdmissionController:
+    """
+    Holds back new work of a given kind ('evaluation', 'llm', ...) while the host is over
+    budget. CPU and load are averaged over the last few readings; RAM, swap-in rate and
+    VRAM use the newest one. At most `burst` admissions are granted per reading, so a
+    queue of waiting work cannot all start before the next reading shows its effect.
+    After `max_wait` seconds work is admitted anyway, so a host that stays busy for other
+    reasons slows the DGM down instead of stalling it.
+    """
+    def __init__(self, sampler: ResourceSampler, budgets: dict = None, burst: int = None,
+                 max_wait: float = None, window: int = None, enabled: bool = None):
+        self.sampler = sampler
+        self.budgets = budgets or dict(settings.ADMISSION_BUDGETS)
+        self.burst = burst or settings.ADMISSION_BURST
+        self.max_wait = settings.ADMISSION_MAX_WAIT_SECONDS if max_wait is None else max_wait
+        self.window = window or settings.ADMISSION_WINDOW_SAMPLES
+        self.enabled = settings.ADMISSION_CONTROL if enabled is None else enabled
+        self._condition = threading.Condition()
+        self._active = {}
+        self._admitted_sequence = -1
+        self._admitted_in_sequence = 0
+        self.stats = {"admitted": 0, "delayed": 0, "forced": 0, "wait_seconds": 0.0}
+
+    def over_budget(self) -> list[str]:
+        """Returns a description of every budget the host currently exceeds."""
+        latest = self.sampler.latest()
+        if latest is None:
+            return []
+        readings = {
+            "cpu_percent": self.sampler.mean("cpu_percent", self.window),
+            "load_per_cpu": self.sampler.mean("load_per_cpu", self.window),
+            "ram_percent": latest.ram_percent,
+            "swap_in_mb_per_s": latest.swap_in_mb_per_s,
+            "vram_percent": latest.vram_percent,
+        }
+        return [f"{name} {readings[name]:.1f} > {limit}" for name, limit in self.budgets.items()
+                if readings.get(name) is not None and readings[name] > limit]
+
+    def _try_admit(self) -> bool:
+        """Admits one unit of work if the host is under budget and this reading's burst is not spent."""
+        if self.sampler.latest() is None:
+            return True # No readings (yet, or without psutil): nothing to hold work back on.
+        if self.over_budget():
+            return False
+        if self.sampler.sequence != self._admitted_sequence:
+            self._admitted_sequence = self.sampler.sequence
+            self._admitted_in_sequence = 0
+        if self._admitted_in_sequence >= self.burst:
+            return False
+        self._admitted_in_sequence += 1
+        return True
+
+    def _acquire(self, kind: str, blocking: bool = True) -> bool:
+        """Returns True once `kind` is admitted; with blocking=False, returns False instead of waiting."""
+        with self._condition:
+            if not self.enabled or self._try_admit():
+                self._granted(kind)
+                return True
+            if not blocking:
+                return False
+        start = time.monotonic()
+        logger.info(f"Admission control: holding back {kind} ({', '.join(self.over_budget()) or 'burst limit'}).")
+        with self._condition:
+            self.stats["delayed"] += 1
+            while not self._try_admit():
+                waited = time.monotonic() - start
+                if waited >= self.max_wait:
+                    self.stats["forced"] += 1
+                    logger.warning(f"Admission control: admitting {kind} after {waited:.0f}s over budget.")
+                    break
+                self._condition.wait(min(self.sampler.interval, self.max_wait - waited))
+            self.stats["wait_seconds"] += time.monotonic() - start
+            self._granted(kind)
+        return True
+
+    def _granted(self, kind: str):
+        self._active[kind] = self._active.get(kind, 0) + 1
+        self.stats["admitted"] += 1
+
+    def _release(self, kind: str):
+        with self._condition:
+            self._active[kind] -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def admit(self, kind: str):
+        """Blocks until `kind` work may start, and tracks it as active until the block exits."""
+        self._acquire(kind)
+        try:
+            yield
+        finally:
+            self._release(kind)
+
+    @asynccontextmanager
+    async def aadmit(self, kind: str):
+        """Async variant of admit(); waits without blocking the event loop."""
+        import asyncio
+        if not self._acquire(kind, blocking=False):
+            start = time.monotonic()
+            with self._condition:
+                self.stats["delayed"] += 1
+            while time.monotonic() - start < self.max_wait:
+                await asyncio.sleep(self.sampler.interval)
+                if self._acquire(kind, blocking=False):
+                    break
+            else:
+                with self._condition:
+                    self.stats["forced"] += 1
+                    self._granted(kind)
+            with self._condition:
+                self.stats["wait_seconds"] += time.monotonic() - start
+        try:
+            yield
+        finally:
+            self._release(kind)
+
+    def active(self) -> dict:
+        with self._condition:
+            return dict(self._active)
+
+
+_shared_sampler = None
+_shared_controller = None
+_shared_lock = threading.Lock()
+
+
+def get_resource_sampler() -> ResourceSampler:
+    """Returns the process-wide sampler, starting its thread on first use."""
+    global _shared_sampler
+    with _shared_lock:
+        if _shared_sampler is None:
+            _shared_sampler = ResourceSampler().start()
+        return _shared_sampler
+
+
+def get_admission_controller() -> AdmissionController:
+    """Returns the process-wide admission controller, backed by the shared sampler."""
+    global _shared_controller
+    sampler = get_resource_sampler()
+    with _shared_lock:
+        if _shared_controller is None:
+            _shared_controller = AdmissionController(sampler)
+        return _shared_controller
+
+
+def usage_dict(sample: ResourceSample | None) -> dict:
+    """Formats a reading in the shape returned by utils.tools.get_system_usage()."""
+    if sample is None:
+        return {"cpu_percent": "N/A", "ram_percent": "N/A", "gpu_utilization_percent": "N/A",
+                "vram_used_mb": "N/A", "vram_total_mb": "N/A"}
+    usage = {key: ("N/A" if value is None else value) for key, value in asdict(sample).items()}
+    usage.pop("timestamp")
+    return usage
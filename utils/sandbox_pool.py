@@ -0,0 +1,286 @@
+# utils/sandbox_pool.py
+# A pool of pre-started sandbox workers used to execute candidate code without
+# paying interpreter startup on every run.
+
+import os
+import sys
+import time
+import shutil
+import signal
+import atexit
+import tempfile
+import threading
+import selectors
+import traceback
+import multiprocessing
+from dataclasses import dataclass
+from config import settings
+
+# Hard cap on captured output per stream, so a runaway print loop cannot exhaust memory.
+MAX_OUTPUT_BYTES = 1024 * 1024
+
+
+@dataclass
+class SandboxResult:
+    """The outcome of one sandboxed job, shaped like subprocess.CompletedProcess."""
+    returncode: int
+    stdout: str
+    stderr: str
+    duration: float
+    timed_out: bool = False
+
+
+def _apply_limits(limits: dict):
+    """Applies per-job soft rlimits inside the forked job process."""
+    try:
+        import resource
+    except ImportError:
+        return
+    mapping = {
+        'cpu_seconds': resource.RLIMIT_CPU,
+        'memory_bytes': resource.RLIMIT_AS,
+        'file_size_bytes': resource.RLIMIT_FSIZE,
+    }
+    for key, rlimit in mapping.items():
+        value = limits.get(key)
+        if value is None:
+            continue
+        try:
+            _, hard = resource.getrlimit(rlimit)
+            if hard != resource.RLIM_INFINITY:
+                value = min(value, hard)
+            resource.setrlimit(rlimit, (value, hard))
+        except (ValueError, OSError):
+            pass
+
+
+def _exec_in_child(code: str, limits: dict, workdir: str, out_fd: int, err_fd: int):
+    """Body of the forked job process. Never returns."""
+    exit_code = 0
+    try:
+        os.dup2(out_fd, 1)
+        os.dup2(err_fd, 2)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.chdir(workdir)
+        _apply_limits(limits)
+        exec(compile(code, '<candidate>', 'exec'), {'__name__': '__main__', '__builtins__': __builtins__})
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+        os._exit(exit_code)
+
+
+def _read_until_exit(pid: int, out_r: int, err_r: int, timeout: float) -> tuple[bytes, bytes, int, bool]:
+    """Drains the job's stdout/stderr pipes, killing the job if it outlives its deadline."""
+    buffers = {out_r: bytearray(), err_r: bytearray()}
+    sel = selectors.DefaultSelector()
+    for fd in buffers:
+        sel.register(fd, selectors.EVENT_READ)
+    deadline = time.monotonic() + timeout
+    timed_out = False
+
+    while sel.get_map():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            break
+        for key, _ in sel.select(remaining):
+            chunk = os.read(key.fd, 65536)
+            if not chunk:
+                sel.unregister(key.fd)
+                continue
+            buf = buffers[key.fd]
+            if len(buf) < MAX_OUTPUT_BYTES:
+                buf.extend(chunk[:MAX_OUTPUT_BYTES - len(buf)])
+    sel.close()
+
+    _, status = os.waitpid(pid, 0)
+    if os.WIFSIGNALED(status):
+        returncode = -os.WTERMSIG(status)
+    else:
+        returncode = os.WEXITSTATUS(status)
+    return bytes(buffers[out_r]), bytes(buffers[err_r]), returncode, timed_out
+
+
+def _run_job(code: str, timeout: float, limits: dict, workdir: str) -> dict:
+    """Forks a fresh job process from the warm worker and collects its result."""
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    start = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        os.close(out_r)
+        os.close(err_r)
+        _exec_in_child(code, limits, workdir, out_w, err_w)
+    os.close(out_w)
+    os.close(err_w)
+    try:
+        stdout, stderr, returncode, timed_out = _read_until_exit(pid, out_r, err_r, timeout)
+    finally:
+        os.close(out_r)
+        os.close(err_r)
+    duration = time.perf_counter() - start
+    return {
+        'returncode': returncode,
+        'stdout': stdout.decode('utf-8', errors='replace'),
+        'stderr': stderr.decode('utf-8', errors='replace'),
+        'duration': duration,
+        'timed_out': timed_out,
+    }
+
+
+def _worker_main(conn):
+    """Main loop of a warm worker process: receive a job, fork it, send back the result."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    workdir = tempfile.mkdtemp(prefix='dgm_sandbox_')
+    try:
+        while True:
+            try:
+                job = conn.recv()
+            except EOFError:
+                break
+            if job is None:
+                break
+            try:
+                result = _run_job(job['code'], job['timeout'], job['limits'], workdir)
+            except Exception as e:
+                result = {'returncode': -1, 'stdout': '', 'stderr': f"sandbox_error:{e}",
+                          'duration': 0.0, 'timed_out': False}
+            conn.send(result)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+class _Worker:
+    """Handle on one warm worker process owned by the pool."""
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs_run = 0
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1.0)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=1.0)
+        self.conn.close()
+
+
+class SandboxPool:
+    """
+    Keeps a fixed number of pre-started worker processes. Each job is forked from an
+    idle worker, so it starts from a warm interpreter but still runs isolated, under
+    its own rlimits and deadline. Workers are recycled after a number of jobs or a crash.
+    """
+    def __init__(self, size: int = None, max_jobs_per_worker: int = None, memory_limit_mb: int = None):
+        self.size = size or settings.SANDBOX_POOL_SIZE
+        self.max_jobs_per_worker = max_jobs_per_worker or settings.SANDBOX_MAX_JOBS_PER_WORKER
+        self.memory_limit_mb = memory_limit_mb or settings.SANDBOX_MEMORY_LIMIT_MB
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        self._ctx = multiprocessing.get_context(method)
+        self._idle = []
+        self._all = []
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def _spawn_worker(self) -> _Worker:
+        worker = _Worker(self._ctx)
+        self._all.append(worker)
+        return worker
+
+    def _acquire(self) -> _Worker:
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("SandboxPool has been shut down.")
+                if self._idle:
+                    return self._idle.pop()
+                if len(self._all) < self.size:
+                    return self._spawn_worker()
+                self._cond.wait()
+
+    def _release(self, worker: _Worker, healthy: bool):
+        recycle = not healthy or worker.jobs_run >= self.max_jobs_per_worker
+        if recycle:
+            worker.stop()
+        with self._cond:
+            if recycle:
+                self._all.remove(worker)
+            elif not self._closed:
+                self._idle.append(worker)
+            self._cond.notify()
+        if not recycle and self._closed:
+            worker.stop()
+
+    def _limits_for(self, timeout: float) -> dict:
+        return {
+            'cpu_seconds': int(timeout) + 1,
+            'memory_bytes': self.memory_limit_mb * 1024 * 1024,
+            'file_size_bytes': 10 * 1024 * 1024,
+        }
+
+    def run(self, code: str, timeout: float = 5.0) -> SandboxResult:
+        """Executes `code` as a __main__ script in a sandboxed job and returns its result."""
+        worker = self._acquire()
+        healthy = True
+        try:
+            worker.conn.send({'code': code, 'timeout': timeout, 'limits': self._limits_for(timeout)})
+            worker.jobs_run += 1
+            # The worker enforces the deadline itself; the grace period only covers a hung worker.
+            if not worker.conn.poll(timeout + 2.0):
+                healthy = False
+                return SandboxResult(-signal.SIGKILL, '', 'sandbox_error:worker_unresponsive', timeout, True)
+            return SandboxResult(**worker.conn.recv())
+        except (EOFError, OSError, BrokenPipeError) as e:
+            healthy = False
+            return SandboxResult(-1, '', f"sandbox_error:worker_crashed:{e}", 0.0)
+        finally:
+            self._release(worker, healthy)
+
+    def shutdown(self):
+        """Stops all workers. Jobs already running finish first."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for worker in idle:
+            worker.stop()
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_sandbox_pool() -> SandboxPool:
+    """Returns the process-wide sandbox pool, creating it on first use."""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = SandboxPool()
+            atexit.register(_shared_pool.shutdown)
+        return _shared_pool
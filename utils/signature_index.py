@@ -0,0 +1,107 @@
+# utils/signature_index.py
+# Persistent index from behavioral signatures to the solutions that produced them.
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from config import settings
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class SignatureIndex:
+    """
+    Maps (behavioral signature, test spec) to the test outcome already observed for it,
+    together with every solution seen exhibiting that behavior. A candidate whose signature
+    is already indexed does not need its tests run again; everything else about it (speed,
+    complexity, verifiability) is still scored per solution.
+    """
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or settings.SIGNATURE_INDEX_PATH
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS signatures (
+                signature_key TEXT PRIMARY KEY,
+                signature TEXT NOT NULL,
+                test_hash TEXT NOT NULL,
+                scores TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS solutions (
+                signature_key TEXT NOT NULL,
+                solution_hash TEXT NOT NULL,
+                solution_code TEXT NOT NULL,
+                PRIMARY KEY (signature_key, solution_hash)
+            );
+        """)
+
+    @staticmethod
+    def is_indexable(signature: str) -> bool:
+        """Signatures that only report a failure to fingerprint are never indexed."""
+        return bool(signature) and not signature.startswith("signature_")
+
+    @staticmethod
+    def _key(signature: str, test_code: str) -> str:
+        return _sha256(f"{_sha256(test_code)}:outcome:{signature}")
+
+    def lookup(self, signature: str, test_code: str, solution_code: str = None) -> bool | None:
+        """
+        Returns whether this behavior passed the tests, or None if it is novel.
+        A matching solution is remembered under the signature.
+        """
+        if not self.is_indexable(signature):
+            return None
+        key = self._key(signature, test_code)
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT scores FROM signatures WHERE signature_key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE signatures SET hits = hits + 1 WHERE signature_key = ?", (key,))
+            if solution_code is not None:
+                self._add_solution(key, solution_code)
+        return json.loads(row[0])["passed"]
+
+    def record(self, signature: str, test_code: str, solution_code: str, passed: bool):
+        """Stores the test outcome of a newly seen behavior."""
+        if not self.is_indexable(signature):
+            return
+        key = self._key(signature, test_code)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO signatures (signature_key, signature, test_hash, scores, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, signature, _sha256(test_code), json.dumps({"passed": bool(passed)}), time.time())
+            )
+            self._add_solution(key, solution_code)
+
+    def _add_solution(self, key: str, solution_code: str):
+        self._conn.execute(
+            "INSERT OR IGNORE INTO solutions (signature_key, solution_hash, solution_code) VALUES (?, ?, ?)",
+            (key, _sha256(solution_code), solution_code)
+        )
+
+    def solutions_for(self, signature: str, test_code: str) -> list[str]:
+        """Returns every solution seen with this behavior."""
+        key = self._key(signature, test_code)
+        with self._lock:
+            rows = self._conn.execute("SELECT solution_code FROM solutions WHERE signature_key = ?", (key,)).fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self) -> dict:
+        """Returns the number of distinct behaviors, solutions and deduplicated evaluations."""
+        with self._lock:
+            behaviors, hits = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM signatures").fetchone()
+            solutions = self._conn.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+        return {"behaviors": behaviors, "solutions": solutions, "skipped_evaluations": hits}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
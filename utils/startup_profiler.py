@@ -0,0 +1,140 @@
+# utils/startup_profiler.py
+# Reports per-module import cost of the DGM entry points and enforces a startup budget.
+#
+#   python -m utils.startup_profiler                       # profile every entry point
+#   python -m utils.startup_profiler --entry worker --top 25
+#   python -m utils.startup_profiler --check               # fail on budget or deferred-import regressions
+
+import re
+import sys
+import time
+import argparse
+import subprocess
+from statistics import median
+from config import settings
+
+# Modules each process imports at startup, keyed by the role of the process.
+ENTRY_POINTS = {
+    "orchestrator": "dgm_orchestrator",
+    "evaluator": "dgm_evaluator",
+    "worker": "dgm_worker",
+    "work_queue": "dgm_work_queue",
+    "sandbox_worker": "utils.sandbox_pool",
+}
+
+# Heavy dependencies that must only be imported on first use, never at startup.
+DEFERRED_MODULES = ("psutil", "radon", "httpx", "asyncio", "chromadb", "sentence_transformers", "numpy", "torch")
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def _run_python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *flags, "-c", code], cwd=settings.PROJECT_ROOT,
+                          capture_output=True, text=True, check=True)
+
+
+def profile_imports(module: str) -> list[dict]:
+    """
+    Imports `module` in a fresh interpreter under -X importtime and returns one record per
+    module imported on its behalf: name, self and cumulative time in microseconds, and
+    nesting depth. Imports made by interpreter startup itself (site, .pth files) are excluded.
+    """
+    process = _run_python(f"import {module}", "-X", "importtime")
+    records = []
+    for line in process.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            records.append({
+                "name": match.group(4),
+                "self_us": int(match.group(1)),
+                "cumulative_us": int(match.group(2)),
+                "depth": len(match.group(3)) // 2,
+            })
+    # importtime lists modules in post-order: the requested module is the last top-level
+    # record, preceded by its dependencies back to the previous top-level record.
+    start = len(records) - 1
+    while start > 0 and records[start - 1]["depth"] > 0:
+        start -= 1
+    return records[start:]
+
+
+def loaded_deferred_modules(module: str) -> list[str]:
+    """Returns the DEFERRED_MODULES that importing `module` pulls in."""
+    process = _run_python(
+        f"import sys, {module}; print(' '.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    )
+    return process.stdout.split()
+
+
+def measure_startup(module: str, runs: int = 5) -> float:
+    """
+    Median wall-clock milliseconds to import `module` in a fresh interpreter, minus the
+    median cost of starting a bare interpreter.
+    """
+    def timed(code):
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            _run_python(code)
+            samples.append(time.perf_counter() - start)
+        return median(samples)
+
+    return max(0.0, (timed(f"import {module}") - timed("pass")) * 1000)
+
+
+def summarize(records: list[dict], top: int) -> dict:
+    """Groups import cost by top-level package and picks the most expensive modules."""
+    by_package = {}
+    for record in records:
+        package = record["name"].split('.')[0]
+        by_package[package] = by_package.get(package, 0) + record["self_us"]
+    return {
+        "total_us": sum(r["self_us"] for r in records),
+        "packages": sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top],
+        "modules": sorted(records, key=lambda r: r["self_us"], reverse=True)[:top],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DGM startup import profiler.")
+    parser.add_argument('--entry', action='append', choices=sorted(ENTRY_POINTS), help='Profile only these entry points.')
+    parser.add_argument('--top', type=int, default=10, help='Number of packages and modules to list.')
+    parser.add_argument('--runs', type=int, default=5, help='Interpreter launches per startup measurement.')
+    parser.add_argument('--check', action='store_true',
+                        help='Exit non-zero if an entry point exceeds the budget or imports a deferred module.')
+    parser.add_argument('--budget-ms', type=float, default=settings.STARTUP_IMPORT_BUDGET_MS,
+                        help='Allowed import time per entry point, in milliseconds.')
+    args = parser.parse_args()
+
+    failures = []
+    for entry in args.entry or ENTRY_POINTS:
+        module = ENTRY_POINTS[entry]
+        summary = summarize(profile_imports(module), args.top)
+        startup_ms = measure_startup(module, args.runs)
+        deferred = loaded_deferred_modules(module)
+
+        print(f"\n=== {entry} ({module}) ===")
+        print(f"  startup: {startup_ms:.1f} ms wall, {summary['total_us'] / 1000:.1f} ms in imports "
+              f"(budget {args.budget_ms:.0f} ms)")
+        print("  by package (self time):")
+        for package, self_us in summary["packages"]:
+            print(f"    {package:<32}{self_us / 1000:>8.1f} ms")
+        print("  slowest modules (self time):")
+        for record in summary["modules"]:
+            print(f"    {record['name']:<48}{record['self_us'] / 1000:>8.1f} ms")
+        if deferred:
+            print(f"  WARNING: imports deferred dependencies at startup: {', '.join(deferred)}")
+            failures.append(f"{entry} imports {', '.join(deferred)} at startup")
+        if startup_ms > args.budget_ms:
+            failures.append(f"{entry} takes {startup_ms:.1f} ms to import (budget {args.budget_ms:.0f} ms)")
+
+    if args.check:
+        if failures:
+            print("\nSTARTUP CHECK FAILED:")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+        print("\nStartup check passed.")
+
+if __name__ == "__main__":
+    main()
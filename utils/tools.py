@@ -1,79 +1,180 @@
 # utils/tools.py
 # This module provides stateless utility functions for fitness evaluation and monitoring.
 
-import subprocess
-import time
 import ast
-import psutil
-from radon.complexity import cc_visit
 from dgm_core.verifier import Verifier
+from dgm_core.fitness import Fitness
+from dgm_core.code_artifact import CodeArtifact, first_called_name
+from dgm_core.fitness_cache import get_fitness_cache
+from dgm_core.code_extraction import extract_code
+from utils.sandbox_pool import get_sandbox_pool
+from utils.resource_monitor import get_resource_sampler, usage_dict
 
 def get_system_usage() -> dict:
-    # ... [The get_system_usage function remains the same, code omitted for brevity]
-    usage = { "cpu_percent": psutil.cpu_percent(interval=1), "ram_percent": psutil.virtual_memory().percent, "gpu_utilization_percent": "N/A", "vram_used_mb": "N/A", "vram_total_mb": "N/A" }
+    """
+    Returns the latest CPU, RAM, load and GPU reading from the background resource sampler.
+    Only the first call in a process waits, for the sampler's first reading.
+    """
+    sampler = get_resource_sampler()
+    return usage_dict(sampler.latest(wait=sampler.interval * 2))
+
+
+def build_test_code(func_name: str, test_cases: list[dict]) -> str:
+    """Turns benchmark test cases into assertion-based test code for evaluate_fitness."""
+    return "\n".join(
+        f"assert {func_name}(*{case['input']!r}) == {case['expected_output']!r}" for case in test_cases
+    )
+
+
+def probe_inputs_from_tests(test_code: str, func_name: str) -> list[list] | None:
+    """
+    Extracts the argument list of every `assert func(...) == expected` in the test code,
+    in order. Returns None if any call to `func_name` has arguments that are not literals.
+    """
     try:
-        result = subprocess.run(['nvidia-smi', '--query-gpu=utilization.gpu,memory.used,memory.total', '--format=csv,noheader,nounits'], capture_output=True, text=True, check=True)
-        gpu_util, vram_used, vram_total = result.stdout.strip().split(', ')
-        usage.update({"gpu_utilization_percent": float(gpu_util), "vram_used_mb": int(vram_used), "vram_total_mb": int(vram_total)})
-    except Exception:
-        pass
-    return usage
+        tree = ast.parse(test_code)
+    except (SyntaxError, ValueError):
+        return None
+    inputs = []
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == func_name):
+            continue
+        if node.keywords:
+            return None
+        try:
+            if len(node.args) == 1 and isinstance(node.args[0], ast.Starred):
+                inputs.append(list(ast.literal_eval(node.args[0].value)))
+            else:
+                inputs.append([ast.literal_eval(arg) for arg in node.args])
+        except (ValueError, TypeError, SyntaxError):
+            return None
+    return inputs
 
 
-def get_behavioral_signature(solution_code: str, test_code: str) -> str:
-    # ... [The get_behavioral_signature function remains the same, code omitted for brevity]
+# Calls the candidate on every test input in one sandboxed process, in test order, and
+# prints one marked line with a digest of each result (or the exception type raised).
+_SIGNATURE_MARKER = "__dgm_signature__"
+_SIGNATURE_PROBE_SCRIPT = """import hashlib as _probe_hashlib
+{solution_code}
+_probe_outputs = []
+for _probe_args in {inputs!r}:
     try:
-        tree = ast.parse(test_code); func_name = None
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Call) and hasattr(node.func, 'id'):
-                func_name = node.func.id; break
-        if not func_name: return "signature_error:could_not_find_func_name"
-        inputs = [-1, 0, 1, 10, "test", [1,2,3]]; outputs = []
-        for i in inputs:
-            input_val = f"'{i}'" if isinstance(i, str) else str(i)
-            exec_script = f"import sys\n{solution_code}\ntry:\n    result = {func_name}({input_val})\n    print(str(result)[:50])\nexcept Exception as e:\n    print(f\"error:{{type(e).__name__}}\")"
-            process = subprocess.run(['python3', '-c', exec_script], capture_output=True, text=True, timeout=2.0)
-            outputs.append(process.stdout.strip() or process.stderr.strip())
-        return "|".join(outputs)
+        _probe_result = {func_name}(*_probe_args)
+        _probe_outputs.append(_probe_hashlib.sha256(repr(_probe_result).encode()).hexdigest()[:16])
+    except Exception as e:
+        _probe_outputs.append(f"error:{{type(e).__name__}}")
+print({marker!r} + "|".join(_probe_outputs))
+"""
+
+
+def run_behavioral_probe(solution_code: str, test_code: str) -> tuple[str, float]:
+    """
+    Builds a behavioral fingerprint by calling the solution's function with each of the
+    tests' own inputs, in a single sandbox run. Two solutions with the same signature
+    return equal-looking results on every test input, so they share a test outcome.
+    Returns the signature and the run's duration; signatures starting with
+    "signature_" mean no fingerprint could be taken.
+    """
+    try:
+        func_name = first_called_name(test_code)
+        if not func_name: return "signature_error:could_not_find_func_name", 0.0
+        inputs = probe_inputs_from_tests(test_code, func_name)
+        if not inputs: return "signature_error:no_literal_test_inputs", 0.0
+        exec_script = _SIGNATURE_PROBE_SCRIPT.format(
+            solution_code=solution_code, inputs=inputs, func_name=func_name, marker=_SIGNATURE_MARKER
+        )
+        process = get_sandbox_pool().run(exec_script, timeout=5.0)
+        if process.timed_out:
+            return "signature_error:timeout", process.duration
+        signatures = [line for line in process.stdout.splitlines() if line.startswith(_SIGNATURE_MARKER)]
+        if process.returncode != 0 or not signatures:
+            # The solution failed outside the calls, e.g. at import; behavior is unknown.
+            return "signature_error:no_output", process.duration
+        return f"{func_name}:{signatures[-1][len(_SIGNATURE_MARKER):]}", process.duration
     except Exception:
-        return "signature_generation_error"
+        return "signature_generation_error", 0.0
+
+
+def get_behavioral_signature(solution_code: str, test_code: str) -> str:
+    return run_behavioral_probe(solution_code, test_code)[0]
+
+
+FITNESS_COMPONENTS = ("correctness", "efficiency", "simplicity", "verifiability")
 
 
 def evaluate_fitness(solution_code: str, test_code: str) -> tuple[float, float, float, float]:
     """
     Evaluates fitness based on correctness, efficiency, simplicity, and verifiability.
+    Results are served from the content-addressed fitness cache when the same normalized
+    solution has already been scored against the same tests.
     """
-    verifier = Verifier()
-    correctness_score, efficiency_score, simplicity_score = 0.0, 0.0, 0.0
-    
-    # Run formal verification first
-    verifiability_score = verifier.analyze_code(solution_code)
+    return score_fitness(solution_code, test_code)[0]
 
-    full_code = f"{solution_code}\n\n{test_code}"
-    try:
-        start_time = time.monotonic()
-        process = subprocess.run(
-            ['python3', '-c', full_code],
-            capture_output=True, text=True, timeout=5.0
-        )
-        end_time = time.monotonic()
-        execution_time = end_time - start_time
-
-        if process.returncode == 0:
-            correctness_score = 1.0
-            efficiency_score = max(0.0, 1.0 - (execution_time / 5.0))
-            try:
-                complexity_blocks = cc_visit(solution_code)
-                total_complexity = sum(block.complexity for block in complexity_blocks)
-                avg_complexity = (total_complexity / len(complexity_blocks)) if complexity_blocks else 1
-                simplicity_score = 1.0 / avg_complexity
-            except Exception:
-                simplicity_score = 0.5
-        # If tests fail, all other scores are zeroed out
-        else:
-            return (0.0, 0.0, 0.0, verifiability_score)
 
+def evaluate_fitness_deduplicated(solution_code: str, test_code: str, signature_index) -> tuple[float, float, float, float]:
+    """
+    Evaluates fitness like evaluate_fitness(), but when a previously evaluated solution
+    had the same behavioral signature under the same tests, reuses its test outcome
+    instead of running the tests. Efficiency (from the probe run's duration), simplicity
+    and verifiability are always scored for this solution.
+    """
+    return score_fitness(solution_code, test_code, signature_index)[0]
+
+
+def score_fitness(solution_code: str, test_code: str, signature_index=None) -> tuple[tuple[float, float, float, float], bool]:
+    """
+    Scores a solution as evaluate_fitness() does, or as evaluate_fitness_deduplicated()
+    does when a signature index is given, and also returns whether the scores are
+    conclusive. They are not when the sandbox could not run the tests to completion (the
+    pool failed, a worker crashed, or the run timed out, possibly because the host was
+    busy). Inconclusive scores are returned but never cached or indexed.
+    """
+    artifact = CodeArtifact(solution_code)
+    cache = get_fitness_cache()
+    cache_key = cache.make_key(artifact, test_code)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return tuple(cached[name] for name in FITNESS_COMPONENTS), True
+
+    passed = None
+    if signature_index is not None:
+        signature, probe_time = run_behavioral_probe(solution_code, test_code)
+        passed = signature_index.lookup(signature, test_code, solution_code)
+    if passed is None:
+        scores, conclusive = _score_solution(artifact, test_code)
+        if signature_index is not None and conclusive:
+            signature_index.record(signature, test_code, solution_code, scores[0] >= 1.0)
+    else:
+        scores, conclusive = _score_outcome(artifact, passed, probe_time), True
+    if conclusive:
+        cache.put(cache_key, dict(zip(FITNESS_COMPONENTS, scores)))
+    return scores, conclusive
+
+
+def _score_solution(artifact: CodeArtifact, test_code: str) -> tuple[tuple[float, float, float, float], bool]:
+    """
+    Runs the tests in a warm sandbox worker, so the measured time excludes interpreter
+    startup, and scores the outcome. Also returns whether the tests ran to completion.
+    """
+    try:
+        process = get_sandbox_pool().run(f"{artifact.source}\n\n{test_code}", timeout=5.0)
     except Exception:
+        return _score_outcome(artifact, False, 0.0), False
+    conclusive = not process.timed_out and not process.stderr.startswith("sandbox_error:")
+    return _score_outcome(artifact, process.returncode == 0, process.duration), conclusive
+
+
+def _score_outcome(artifact: CodeArtifact, passed: bool, execution_time: float) -> tuple[float, float, float, float]:
+    """
+    Scores one solution given whether it passed the tests and how long they took: runs
+    verification and radon complexity analysis, which share the artifact's single parse.
+    Efficiency and simplicity use Fitness's definitions.
+    """
+    # Run formal verification first
+    verifiability_score = Verifier().analyze(artifact).get("verifiability_score", 0.0)
+
+    # If tests fail, all other scores are zeroed out
+    if not passed:
         return (0.0, 0.0, 0.0, verifiability_score)
 
-    return (correctness_score, efficiency_score, simplicity_score, verifiability_score)
+    return (1.0, Fitness.calculate_efficiency(execution_time), Fitness.calculate_simplicity(artifact), verifiability_score)
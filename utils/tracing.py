@@ -0,0 +1,316 @@
+# utils/tracing.py
+# Lightweight nested spans for the DGM's phases, with rolling latency histograms and
+# JSONL / Prometheus text-file export.
+#
+#   with get_tracer().span("evaluation", genome_id=7) as span:
+#       ...
+#       span.set(fitness=0.8)
+
+import os
+import json
+import time
+import uuid
+import bisect
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Ollama response fields recorded on LLM spans: token counts and nanosecond durations.
+OLLAMA_METRIC_FIELDS = ("prompt_eval_count", "eval_count", "prompt_eval_duration", "eval_duration",
+                        "load_duration", "total_duration")
+
+_current_span = contextvars.ContextVar("dgm_current_span", default=None)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    start_time: float
+    attributes: dict = field(default_factory=dict)
+    duration: float = 0.0
+    status: str = "ok"
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+class LatencyHistogram:
+    """
+    Cumulative bucket counts (for Prometheus) plus a rolling window of recent durations
+    (for percentiles that reflect current load rather than the whole run).
+    """
+    def __init__(self, buckets: tuple, window: int):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        self.recent.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class Tracer:
+    """
+    Records nested spans. The current span is tracked in a context variable, so nesting
+    follows the call stack and asyncio tasks; use propagate() to carry it into thread
+    pools. Every finished span is appended to a JSONL file, feeds a latency histogram
+    keyed by span name (and model, for LLM calls), and adds to its root span's per-phase
+    breakdown. The Prometheus text file is rewritten at most every `export_interval`
+    seconds, and on export_prometheus().
+    """
+    def __init__(self, jsonl_path: str = None, prometheus_path: str = None, enabled: bool = None):
+        self.enabled = settings.TRACING_ENABLED if enabled is None else enabled
+        self.jsonl_path = jsonl_path or settings.TRACE_JSONL_PATH
+        self.prometheus_path = prometheus_path or settings.TRACE_PROMETHEUS_PATH
+        self.export_interval = settings.TRACE_EXPORT_INTERVAL_SECONDS
+        self._lock = threading.Lock()
+        self._jsonl = None
+        self._last_export = 0.0
+        self.histograms: dict[tuple[str, str], LatencyHistogram] = {}
+        self.llm_totals: dict[tuple[str, str], float] = {}
+        self._breakdowns: dict[str, dict] = {}
+        self.last_breakdown: dict = {}
+
+    # --- Spans ---
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Opens a span as a child of the current one; yields it so attributes can be added."""
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent else None,
+            start_time=time.time(),
+            attributes=attributes,
+        )
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.attributes.setdefault("error", f"{type(e).__name__}: {e}"[:200])
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            _current_span.reset(token)
+            if self.enabled:
+                try:
+                    self._finish(span)
+                except Exception as e:
+                    # Tracing must never fail the work it observes.
+                    logger.warning(f"Tracer: could not record span {name!r}: {e}")
+
+    @staticmethod
+    def current() -> Span | None:
+        return _current_span.get()
+
+    @staticmethod
+    def propagate(fn):
+        """Wraps `fn` so that, run on another thread, its spans nest under the current span."""
+        parent = _current_span.get()
+
+        def run(*args, **kwargs):
+            token = _current_span.set(parent)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _current_span.reset(token)
+        return run
+
+    @staticmethod
+    def record_llm_response(span: Span, response_data: dict | None):
+        """Copies Ollama's token counts and durations from a response onto an LLM span."""
+        if not response_data:
+            return
+        span.set(**{key: response_data[key] for key in OLLAMA_METRIC_FIELDS if response_data.get(key) is not None})
+
+    # --- Aggregation ---
+
+    def _finish(self, span: Span):
+        model = span.attributes.get("model", "")
+        with self._lock:
+            key = (span.name, model)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram(settings.TRACE_HISTOGRAM_BUCKETS,
+                                                                    settings.TRACE_HISTOGRAM_WINDOW)
+            histogram.observe(span.duration)
+            if span.name == "llm_call" and not span.attributes.get("cached"):
+                for metric in OLLAMA_METRIC_FIELDS:
+                    value = span.attributes.get(metric)
+                    if value is not None:
+                        self.llm_totals[(model, metric)] = self.llm_totals.get((model, metric), 0) + value
+
+            if span.parent_id is None:
+                breakdown = self._breakdowns.pop(span.trace_id, {})
+                self.last_breakdown = {"name": span.name, "seconds": span.duration, "phases": breakdown}
+            else:
+                phase = self._breakdowns.setdefault(span.trace_id, {}).setdefault(span.name, [0, 0.0])
+                phase[0] += 1
+                phase[1] += span.duration
+
+            self._write_jsonl(span)
+            # Claim the export under the lock, so concurrent spans do not all write the file.
+            now = time.monotonic()
+            due = now - self._last_export >= self.export_interval
+            if due:
+                self._last_export = now
+        if due:
+            self.export_prometheus()
+
+    def _write_jsonl(self, span: Span):
+        record = asdict(span)
+        record["duration"] = round(span.duration, 6)
+        self._append_jsonl(json.dumps(record, default=str) + "\n")
+
+    def import_jsonl(self, path: str):
+        """
+        Appends the spans another process logged to its own JSONL file at `path` to this
+        tracer's log, then deletes that file. A missing file is ignored.
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                lines = [line if line.endswith("\n") else line + "\n" for line in f if line.strip()]
+        except FileNotFoundError:
+            return
+        if self.enabled and lines:
+            with self._lock:
+                self._append_jsonl("".join(lines))
+        os.remove(path)
+
+    def _append_jsonl(self, text: str):
+        if self._jsonl is None:
+            os.makedirs(os.path.dirname(self.jsonl_path) or '.', exist_ok=True)
+            self._jsonl = open(self.jsonl_path, 'a', encoding='utf-8')
+        self._jsonl.write(text)
+        self._jsonl.flush()
+        if self._jsonl.tell() > settings.TRACE_JSONL_MAX_BYTES:
+            # Keep one rotated file, so the span log stays bounded under sustained load.
+            self._jsonl.close()
+            os.replace(self.jsonl_path, f"{self.jsonl_path}.1")
+            self._jsonl = None
+
+    # --- Reporting ---
+
+    def format_breakdown(self, breakdown: dict = None) -> str:
+        """Summarizes where a finished root span's time went, by phase (nested phases overlap)."""
+        breakdown = breakdown or self.last_breakdown
+        if not breakdown:
+            return "no trace recorded"
+        phases = sorted(breakdown["phases"].items(), key=lambda item: item[1][1], reverse=True)
+        parts = [f"{name} {seconds:.2f}s x{count}" for name, (count, seconds) in phases]
+        return f"{breakdown['name']} {breakdown['seconds']:.2f}s" + (f" | {', '.join(parts)}" if parts else "")
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP dgm_span_duration_seconds Duration of DGM phases.",
+            "# TYPE dgm_span_duration_seconds histogram",
+        ]
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            llm_totals = sorted(self.llm_totals.items())
+            for (name, model), histogram in histograms:
+                labels = {"span": name, **({"model": model} if model else {})}
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"dgm_span_duration_seconds_bucket{_labels(**labels, le=bound)} {cumulative}")
+                lines.append(f"dgm_span_duration_seconds_bucket{_labels(**labels, le='+Inf')} {histogram.count}")
+                lines.append(f"dgm_span_duration_seconds_sum{_labels(**labels)} {histogram.total:.6f}")
+                lines.append(f"dgm_span_duration_seconds_count{_labels(**labels)} {histogram.count}")
+            lines += [
+                "# HELP dgm_span_duration_recent_seconds Percentiles of recent span durations.",
+                "# TYPE dgm_span_duration_recent_seconds gauge",
+            ]
+            for (name, model), histogram in histograms:
+                labels = {"span": name, **({"model": model} if model else {})}
+                for q in (0.5, 0.9, 0.99):
+                    value = histogram.percentile(q)
+                    if value is not None:
+                        lines.append(f"dgm_span_duration_recent_seconds{_labels(**labels, quantile=q)} {value:.6f}")
+        lines += [
+            "# HELP dgm_llm_tokens_total Tokens processed by Ollama, by model and phase.",
+            "# TYPE dgm_llm_tokens_total counter",
+        ]
+        lines += [f"dgm_llm_tokens_total{_labels(model=model, kind=metric[:-len('_count')])} {value}"
+                  for (model, metric), value in llm_totals if metric.endswith("_count")]
+        lines += [
+            "# HELP dgm_llm_seconds_total Time Ollama reported spending, by model and phase.",
+            "# TYPE dgm_llm_seconds_total counter",
+        ]
+        lines += [f"dgm_llm_seconds_total{_labels(model=model, kind=metric[:-len('_duration')])} {value / 1e9:.6f}"
+                  for (model, metric), value in llm_totals if metric.endswith("_duration")]
+        return "\n".join(lines) + "\n"
+
+    def export_prometheus(self):
+        """
+        Atomically rewrites the Prometheus text file (node_exporter textfile format).
+        Failures are logged rather than raised.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._last_export = time.monotonic()
+        text = self.render_prometheus()
+        tmp_path = f"{self.prometheus_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.prometheus_path) or '.', exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, self.prometheus_path)
+        except OSError as e:
+            logger.warning(f"Tracer: could not export {self.prometheus_path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def close(self):
+        self.export_prometheus()
+        with self._lock:
+            if self._jsonl is not None:
+                self._jsonl.close()
+                self._jsonl = None
+
+
+_shared_tracer = None
+_shared_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Returns the process-wide tracer, creating it on first use."""
+    global _shared_tracer
+    with _shared_tracer_lock:
+        if _shared_tracer is None:
+            _shared_tracer = Tracer()
+        return _shared_tracer
@@ -0,0 +1,284 @@
+# utils/venv_cache.py
+# A content-keyed cache of virtual environments for evaluating environment mutations.
+
+import os
+import re
+import sys
+import json
+import time
+import fcntl
+import shutil
+import hashlib
+import subprocess
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from config import settings
+
+_REQUIREMENT_RE = re.compile(r"^([A-Za-z0-9][A-Za-z0-9._-]*)(.*)$")
+_METADATA_NAME = ".dgm_env.json"
+_BASE_LINK_NAME = "_dgm_base_env.pth"
+
+
+def normalize_requirement(line: str) -> str | None:
+    """
+    Canonicalizes one requirements.txt line (PEP 503 name, no whitespace), or returns None
+    for blank lines, comments and pip options.
+    """
+    line = line.split('#', 1)[0].strip()
+    if not line or line.startswith('-'):
+        return None
+    match = _REQUIREMENT_RE.match(line)
+    if not match:
+        return None
+    name = re.sub(r"[-_.]+", "-", match.group(1)).lower()
+    return name + re.sub(r"\s+", "", match.group(2))
+
+
+def requirement_name(requirement: str) -> str:
+    return re.split(r"[\[<>=!~;@ ]", requirement, 1)[0]
+
+
+def resolve_requirements(lines: list[str]) -> list[str]:
+    """
+    Returns the canonical, sorted requirement set. When a package is listed twice, the
+    later line wins, so a mutant's pin overrides the base one.
+    """
+    by_name = {}
+    for line in lines:
+        requirement = normalize_requirement(line)
+        if requirement:
+            by_name[requirement_name(requirement)] = requirement
+    return sorted(by_name.values())
+
+
+def requirements_hash(requirements: list[str], *context: str) -> str:
+    payload = json.dumps({"requirements": resolve_requirements(requirements), "context": context})
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+@dataclass
+class VenvLease:
+    """A cached environment held for the duration of one evaluation."""
+    key: str
+    path: str
+    python: str
+    requirements: list[str]
+    delta: list[str]
+    reused: bool
+    setup_time: float
+
+
+class VenvCache:
+    """
+    Keeps one virtual environment per resolved requirements set. A single base env holds
+    the project's requirements; each cached env is a pip-less venv that links the base
+    env's site-packages through a .pth file and installs only the packages the base lacks,
+    from a local wheelhouse with no network access.
+
+    Environments are leased under shared file locks, so any number of evaluations (in any
+    process) can use the same env while it is protected from eviction. Builds take the
+    env's lock exclusively. When the cache exceeds `max_bytes`, the least recently leased
+    environments that nobody holds are deleted.
+    """
+    def __init__(self, root: str = None, base_requirements: list[str] = None, wheelhouse: str = None,
+                 max_bytes: int = None, timeout: float = None):
+        self.root = root or settings.VENV_CACHE_DIR
+        self.base_requirements = resolve_requirements(base_requirements or [])
+        self.wheelhouse = wheelhouse or settings.WHEELHOUSE_DIR
+        self.max_bytes = max_bytes or settings.VENV_CACHE_MAX_BYTES
+        self.timeout = timeout or settings.MUTANT_EXECUTION_TIMEOUT
+        self.base_key = requirements_hash(self.base_requirements, sys.version, sys.executable)
+        self.base_path = os.path.join(self.root, f"base-{self.base_key[:16]}")
+        self._lock_dir = os.path.join(self.root, "locks")
+        self._counter_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self._lock_dir, exist_ok=True)
+
+    # --- Locking ---
+
+    @contextmanager
+    def _file_lock(self, name: str, mode: int):
+        # Lock files are never deleted, so a waiter can never end up holding a stale inode.
+        fd = os.open(os.path.join(self._lock_dir, f"{name}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, mode)
+            yield fd
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _is_complete(path: str) -> bool:
+        return os.path.exists(os.path.join(path, _METADATA_NAME))
+
+    # --- Building ---
+
+    def _run(self, *args: str):
+        process = subprocess.run(args, capture_output=True, text=True, timeout=self.timeout)
+        if process.returncode != 0:
+            output = (process.stderr or process.stdout).strip().splitlines()
+            raise RuntimeError(f"'{' '.join(args[:4])} ...' failed: {output[-1] if output else process.returncode}")
+
+    @staticmethod
+    def _python(path: str) -> str:
+        return os.path.join(path, "Scripts" if os.name == "nt" else "bin", "python")
+
+    def _pip_install(self, python: str, requirements: list[str]):
+        if requirements:
+            os.makedirs(self.wheelhouse, exist_ok=True)
+            self._run(python, "-m", "pip", "install", "--quiet", "--disable-pip-version-check",
+                      "--no-index", "--find-links", self.wheelhouse, *requirements)
+
+    def _site_packages(self, python: str) -> str:
+        process = subprocess.run([python, "-c", "import sysconfig; print(sysconfig.get_paths()['purelib'])"],
+                                 capture_output=True, text=True, check=True, timeout=self.timeout)
+        return process.stdout.strip()
+
+    def _write_metadata(self, path: str, metadata: dict):
+        metadata["size_bytes"] = directory_size(path)
+        tmp_path = os.path.join(path, f"{_METADATA_NAME}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(metadata, f, indent=2)
+        os.replace(tmp_path, os.path.join(path, _METADATA_NAME))
+
+    def _ensure_base(self):
+        """Builds the shared base env once: the running interpreter's packages plus the base requirements."""
+        if self._is_complete(self.base_path):
+            return
+        with self._file_lock(os.path.basename(self.base_path), fcntl.LOCK_EX):
+            if self._is_complete(self.base_path):
+                return
+            start = time.monotonic()
+            shutil.rmtree(self.base_path, ignore_errors=True)
+            self._run(sys.executable, "-m", "venv", "--system-site-packages", self.base_path)
+            self._pip_install(self._python(self.base_path), self.base_requirements)
+            self._write_metadata(self.base_path, {
+                "key": self.base_key, "requirements": self.base_requirements,
+                "build_seconds": round(time.monotonic() - start, 3),
+            })
+
+    def _build(self, key: str, path: str, requirements: list[str], delta: list[str]):
+        """Creates a venv layered over the base env and installs the delta into it."""
+        start = time.monotonic()
+        shutil.rmtree(path, ignore_errors=True)
+        try:
+            self._run(sys.executable, "-m", "venv", "--without-pip", "--system-site-packages", path)
+            python = self._python(path)
+            with open(os.path.join(self._site_packages(python), _BASE_LINK_NAME), 'w') as f:
+                f.write(self._site_packages(self._python(self.base_path)) + "\n")
+            self._pip_install(python, delta)
+            with open(os.path.join(path, "requirements.txt"), 'w') as f:
+                f.write("# DGM Mutant Dependencies\n")
+                f.writelines(f"{requirement}\n" for requirement in requirements)
+            self._write_metadata(path, {
+                "key": key, "requirements": requirements, "delta": delta,
+                "build_seconds": round(time.monotonic() - start, 3),
+            })
+        except Exception:
+            # A failed build is not cached; the next lease retries it from scratch.
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+
+    # --- Leasing ---
+
+    @contextmanager
+    def lease(self, requirements: list[str]):
+        """
+        Yields a VenvLease for the environment matching `requirements`, building it first
+        if no cached env matches. The env cannot be evicted until the context exits.
+        """
+        start = time.monotonic()
+        requirements = resolve_requirements(requirements)
+        base = set(self.base_requirements)
+        delta = [requirement for requirement in requirements if requirement not in base]
+        key = requirements_hash(requirements, self.base_key)
+        name = f"env-{key[:16]}"
+        path = os.path.join(self.root, name)
+        self._ensure_base()
+
+        reused = True
+        with self._file_lock(name, fcntl.LOCK_SH) as fd:
+            while not self._is_complete(path):
+                # flock cannot upgrade atomically, so re-check after taking the lock exclusively.
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                if not self._is_complete(path):
+                    reused = False
+                    self._build(key, path, requirements, delta)
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                fcntl.flock(fd, fcntl.LOCK_SH)
+            os.utime(os.path.join(path, _METADATA_NAME))
+            with self._counter_lock:
+                if reused:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            yield VenvLease(key=key, path=path, python=self._python(path), requirements=requirements,
+                            delta=delta, reused=reused, setup_time=time.monotonic() - start)
+        if not reused:
+            self.evict()
+
+    # --- Eviction ---
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        """Returns (last leased, size, path) for every complete cached env, oldest first."""
+        entries = []
+        for name in os.listdir(self.root):
+            metadata_path = os.path.join(self.root, name, _METADATA_NAME)
+            if not name.startswith("env-") or not os.path.exists(metadata_path):
+                continue
+            try:
+                with open(metadata_path, 'r') as f:
+                    size = json.load(f).get("size_bytes", 0)
+                entries.append((os.path.getmtime(metadata_path), size, os.path.join(self.root, name)))
+            except (OSError, json.JSONDecodeError):
+                continue
+        return sorted(entries)
+
+    def _base_size(self) -> int:
+        try:
+            with open(os.path.join(self.base_path, _METADATA_NAME), 'r') as f:
+                return json.load(f).get("size_bytes", 0)
+        except (OSError, json.JSONDecodeError):
+            return 0
+
+    def evict(self) -> list[str]:
+        """
+        Deletes least recently leased envs until the cache fits in `max_bytes`. Envs that
+        are leased (or being built) are skipped. Returns the evicted paths.
+        """
+        entries = self._entries()
+        total = self._base_size() + sum(size for _, size, _ in entries)
+        evicted = []
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                with self._file_lock(os.path.basename(path), fcntl.LOCK_EX | fcntl.LOCK_NB):
+                    shutil.rmtree(path, ignore_errors=True)
+            except BlockingIOError:
+                continue
+            total -= size
+            evicted.append(path)
+        return evicted
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {
+            "envs": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }